@@ -1,11 +1,14 @@
 import datetime
 import traceback
 import warnings
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.mail import EmailMultiAlternatives
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.http import QueryDict
 from django.template import loader
 from django.utils.timezone import now
@@ -14,12 +17,19 @@ from scorched.response import SolrResponse
 
 from cl.alerts.api_serializers import SearchAlertSerializerModel
 from cl.alerts.models import Alert, RealTimeQueue
+from cl.alerts.utils import (
+    AlertPercolator,
+    AlertRunCheckpoint,
+    build_alert_query_dict,
+    make_ids_filter,
+)
 from cl.api.models import Webhook, WebhookEvent, WebhookEventType
 from cl.api.utils import send_webhook_event
 from cl.lib import search_utils
 from cl.lib.command_utils import VerboseCommand, logger
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.lib.search_utils import regroup_snippets
+from cl.lib.utils import chunks
 from cl.search.api_serializers import SearchResultSerializer
 from cl.search.api_utils import SolrObject
 from cl.search.forms import SearchForm
@@ -31,38 +41,6 @@ from cl.stats.utils import tally_stat
 MAX_RT_ITEM_QUERY = 1000
 
 
-class InvalidDateError(Exception):
-    pass
-
-
-def get_cut_off_date(rate, d=datetime.date.today()):
-    """Given a rate of dly, wly or mly and a date, returns the date after which
-    new results should be considered a hit for an cl.
-    """
-    cut_off_date = None
-    if rate == Alert.REAL_TIME:
-        # use a couple days ago to limit results without risk of leaving out
-        # important items (this will be filtered further later).
-        cut_off_date = d - datetime.timedelta(days=10)
-    elif rate == Alert.DAILY:
-        cut_off_date = d
-    elif rate == Alert.WEEKLY:
-        cut_off_date = d - datetime.timedelta(days=7)
-    elif rate == Alert.MONTHLY:
-        if datetime.date.today().day > 28:
-            raise InvalidDateError(
-                "Monthly alerts cannot be run on the 29th, 30th or 31st."
-            )
-
-        # Get the first of the month of the previous month regardless of the
-        # current date
-        early_last_month = d - datetime.timedelta(days=28)
-        cut_off_date = datetime.datetime(
-            early_last_month.year, early_last_month.month, 1
-        )
-    return cut_off_date
-
-
 def send_alert(user_profile, hits):
     subject = "New hits for your alerts"
 
@@ -87,22 +65,23 @@ class Command(VerboseCommand):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.sis = {
-            SEARCH_TYPES.OPINION: ExtraSolrInterface(
-                settings.SOLR_OPINION_URL, mode="r"
+            SEARCH_TYPES.OPINION: get_shared_solr_interface(
+                settings.SOLR_OPINION_URL
             ),
-            SEARCH_TYPES.ORAL_ARGUMENT: ExtraSolrInterface(
-                settings.SOLR_AUDIO_URL, mode="r"
+            SEARCH_TYPES.ORAL_ARGUMENT: get_shared_solr_interface(
+                settings.SOLR_AUDIO_URL
             ),
-            SEARCH_TYPES.RECAP: ExtraSolrInterface(
-                settings.SOLR_RECAP_URL, mode="r"
+            SEARCH_TYPES.RECAP: get_shared_solr_interface(
+                settings.SOLR_RECAP_URL
             ),
         }
         self.options = {}
         self.valid_ids = {}
-
-    def __del__(self):
-        for si in self.sis.values():
-            si.conn.http_connection.close()
+        # The results of the distinct alert queries that were run, by query,
+        # and how many of the alerts left to send use each query. Results are
+        # dropped once no alert left to send needs them.
+        self.query_results = {}
+        self.pending_queries: Counter = Counter()
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -111,145 +90,354 @@ class Command(VerboseCommand):
             choices=Alert.ALL_FREQUENCIES,
             help=f"The rate to send emails ({', '.join(Alert.ALL_FREQUENCIES)})",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of alert queries to send to Solr at once.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="The number of users to load and run alerts for at a time.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            default=False,
+            help="Start over instead of resuming an interrupted run at this "
+            "rate.",
+        )
 
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
         self.options = options
-        if options["rate"] == Alert.REAL_TIME:
+        rate = options["rate"]
+        checkpoint = AlertRunCheckpoint(rate)
+        if options["restart"]:
+            checkpoint.finish()
+
+        run_id = f"{rate}:{datetime.date.today().isoformat()}"
+        if rate == Alert.REAL_TIME:
             self.remove_stale_rt_items()
-            self.valid_ids = self.get_new_ids()
+            run = checkpoint.get_unfinished_run()
+            if run and run.get("valid_ids") is not None:
+                # Finish the interrupted run with the items it was sending
+                # alerts for. Newer items are handled by the next run.
+                logger.info("Resuming interrupted run %s.", run["run_id"])
+                run_id = run["run_id"]
+                self.valid_ids = run["valid_ids"]
+            else:
+                run_id = f"{rate}:{now().isoformat()}"
+                self.valid_ids = self.get_new_ids()
 
-        self.send_emails_and_webhooks(options["rate"])
-        if options["rate"] == Alert.REAL_TIME:
+        done_user_ids = checkpoint.start(
+            run_id, self.valid_ids if rate == Alert.REAL_TIME else None
+        )
+        if done_user_ids:
+            logger.info(
+                "Skipping %s users whose alerts were already sent by run %s.",
+                len(done_user_ids),
+                run_id,
+            )
+        self.send_emails_and_webhooks(rate, checkpoint, done_user_ids)
+        if rate == Alert.REAL_TIME:
             self.clean_rt_queue()
+        checkpoint.finish()
+
+    def prepare_query(
+        self, query: str, rate: str
+    ) -> Tuple[QueryDict, Optional[Dict]]:
+        """Build the Solr parameters for an alert's query.
 
-    def run_query(self, alert, rate):
-        results = []
-        cd = {}
-        logger.info(f"Now running the query: {alert.query}\n")
+        This uses the DB, so it has to be done in the main thread.
+
+        :param query: The query string of the alert.
+        :param rate: The rate the alert is being run at.
+        :return: A tuple of the QueryDict of the alert and the parameters to
+        send to Solr, or None if the query can't have any results.
+        """
+        logger.info(f"Now running the query: {query}\n")
 
         # Make a dict from the query string.
-        qd = QueryDict(alert.query.encode(), mutable=True)
-        try:
-            del qd["filed_before"]
-        except KeyError:
-            pass
-        qd["order_by"] = "score desc"
-        cut_off_date = get_cut_off_date(rate)
+        qd = build_alert_query_dict(query, rate)
         # Default to 'o', if not available, according to the front end.
         query_type = qd.get("type", SEARCH_TYPES.OPINION)
-        if query_type in [SEARCH_TYPES.OPINION, SEARCH_TYPES.RECAP]:
-            qd["filed_after"] = cut_off_date
-        elif query_type == SEARCH_TYPES.ORAL_ARGUMENT:
-            qd["argued_after"] = cut_off_date
         logger.info(f"Data sent to SearchForm is: {qd}\n")
         search_form = SearchForm(qd)
-        if search_form.is_valid():
-            cd = search_form.cleaned_data
-
-            if (
-                rate == Alert.REAL_TIME
-                and len(self.valid_ids[query_type]) == 0
-            ):
-                # Bail out. No results will be found if no valid_ids.
-                return query_type, results
-
-            main_params = search_utils.build_main_query(
-                cd,
-                highlight="text",  # Required to show all field as in Search API
-                facet=False,
+        if not search_form.is_valid():
+            return qd, None
+        cd = search_form.cleaned_data
+
+        if rate == Alert.REAL_TIME and len(self.valid_ids[query_type]) == 0:
+            # Bail out. No results will be found if no valid_ids.
+            return qd, None
+
+        main_params = search_utils.build_main_query(
+            cd,
+            highlight="text",  # Required to show all field as in Search API
+            facet=False,
+        )
+        main_params.update(
+            {
+                "rows": "20",
+                "start": "0",
+                "hl.tag.pre": "<em><strong>",
+                "hl.tag.post": "</strong></em>",
+                "caller": f"cl_send_alerts:{query_type}",
+            }
+        )
+
+        if rate == Alert.REAL_TIME:
+            main_params["fq"].append(
+                make_ids_filter(self.valid_ids[query_type])
             )
-            main_params.update(
-                {
-                    "rows": "20",
-                    "start": "0",
-                    "hl.tag.pre": "<em><strong>",
-                    "hl.tag.post": "</strong></em>",
-                    "caller": f"cl_send_alerts:{query_type}",
-                }
+        return qd, main_params
+
+    def execute_query(self, query_type: str, main_params: Dict):
+        """Send an alert's query to Solr. This is safe to call from a worker
+        thread.
+
+        :param query_type: The search type of the query.
+        :param main_params: The parameters from prepare_query.
+        :return: The results of the query.
+        """
+        # Ignore warnings from this bit of code. Otherwise, it complains
+        # about the query URL being too long and having to POST it instead
+        # of being able to GET it.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = (
+                self.sis[query_type].query().add_extra(**main_params).execute()
             )
+        regroup_snippets(results)
+        return results
 
-            if rate == Alert.REAL_TIME:
-                main_params["fq"].append(
-                    f"id:({' OR '.join([str(i) for i in self.valid_ids[query_type]])})"
-                )
+    def run_queries(
+        self, queries: Iterable[str], rate: str, executor: Executor
+    ) -> None:
+        """Run the alert queries that haven't been run yet, sending them to
+        Solr concurrently, and store their results in self.query_results.
 
-            # Ignore warnings from this bit of code. Otherwise, it complains
-            # about the query URL being too long and having to POST it instead
-            # of being able to GET it.
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                results = (
-                    self.sis[query_type]
-                    .query()
-                    .add_extra(**main_params)
-                    .execute()
-                )
-            regroup_snippets(results)
+        Many alerts share the same query, so every distinct query is only run
+        once per rate, until no alert left to send needs its results. Queries
+        that fail are stored as None.
 
-        logger.info(f"There were {len(results)} results.")
-        return qd, results
+        :param queries: The query strings of the alerts.
+        :param rate: The rate the alerts are being run at.
+        :param executor: The executor to send the Solr queries with.
+        :return: None
+        """
+        futures = {}
+        for query in set(queries):
+            if query in self.query_results:
+                continue
+            try:
+                qd, main_params = self.prepare_query(query, rate)
+            except:
+                traceback.print_exc()
+                self.query_results[query] = None
+                continue
+            if main_params is None:
+                self.query_results[query] = (qd, [])
+                continue
+            query_type = qd.get("type", SEARCH_TYPES.OPINION)
+            future = executor.submit(
+                self.execute_query, query_type, main_params
+            )
+            futures[future] = (query, qd)
+
+        for future in as_completed(futures):
+            query, qd = futures[future]
+            try:
+                results = future.result()
+            except:
+                traceback.print_exc()
+                self.query_results[query] = None
+                continue
+            logger.info(f"There were {len(results)} results for: {query}")
+            self.query_results[query] = (qd, results)
 
-    def send_emails_and_webhooks(self, rate):
+    def send_emails_and_webhooks(
+        self,
+        rate: str,
+        checkpoint: Optional[AlertRunCheckpoint] = None,
+        done_user_ids: Iterable[int] = (),
+    ):
         """Send out an email and webhook events to every user whose alert has a
         new hit for a rate.
+
+        Users are loaded in chunks along with their profiles, alerts and
+        webhooks, and the queries of a chunk are sent to Solr by a pool of
+        threads. Emails and webhooks are sent from the main thread, one user
+        at a time.
+
+        :param rate: The rate to send alerts for.
+        :param checkpoint: If given, every user is marked as done in it once
+        their alerts are sent.
+        :param done_user_ids: The IDs of users to skip because their alerts
+        were already sent.
         """
-        users = User.objects.filter(alerts__rate=rate).distinct()
+        alerts = Alert.objects.filter(rate=rate)
+        if rate == Alert.REAL_TIME:
+            matched_alert_ids = self.match_rt_alerts()
+            if matched_alert_ids is not None:
+                # Only the alerts that matched a new item need to be run.
+                alerts = alerts.filter(pk__in=matched_alert_ids)
+        done_user_ids = set(done_user_ids)
+        user_queries = [
+            (user_id, query)
+            for user_id, query in alerts.values_list("user_id", "query")
+            if user_id not in done_user_ids
+        ]
+        user_ids = sorted({user_id for user_id, _ in user_queries})
+        self.query_results = {}
+        self.pending_queries = Counter(query for _, query in user_queries)
 
         alerts_sent_count = 0
-        for user in users:
-            alerts = user.alerts.filter(rate=rate)
-            logger.info(f"Running alerts for user '{user}': {alerts}")
-
-            not_donated_enough = (
-                user.profile.total_donated_last_year
-                < settings.MIN_DONATION["rt_alerts"]
-            )
-            if not_donated_enough and rate == Alert.REAL_TIME:
-                logger.info(
-                    "User: %s has not donated enough for their %s "
-                    "RT alerts to be sent.\n" % (user, alerts.count())
+        with ThreadPoolExecutor(max_workers=self.options["workers"]) as pool:
+            for user_ids_chunk in chunks(user_ids, self.options["chunk_size"]):
+                users = (
+                    User.objects.filter(pk__in=list(user_ids_chunk))
+                    .select_related("profile")
+                    .prefetch_related(
+                        Prefetch("alerts", alerts, to_attr="alerts_to_run"),
+                        Prefetch(
+                            "webhooks",
+                            Webhook.objects.filter(
+                                event_type=WebhookEventType.SEARCH_ALERT,
+                                enabled=True,
+                            ),
+                            to_attr="search_alert_webhooks",
+                        ),
+                    )
+                    .order_by("pk")
+                )
+                chunk_alerts = [
+                    alert for user in users for alert in user.alerts_to_run
+                ]
+                if rate == Alert.REAL_TIME:
+                    users = [
+                        user for user in users if self.can_get_rt_alerts(user)
+                    ]
+                self.run_queries(
+                    (a.query for user in users for a in user.alerts_to_run),
+                    rate,
+                    pool,
                 )
-                continue
 
-            hits = []
-            for alert in alerts:
+                alerts_to_update = []
                 try:
-                    qd, results = self.run_query(alert, rate)
-                except:
-                    traceback.print_exc()
-                    logger.info(
-                        f"Search for this alert failed: {alert.query}\n"
+                    for user in users:
+                        if self.send_user_alerts(user, alerts_to_update):
+                            alerts_sent_count += 1
+                        if checkpoint is not None:
+                            checkpoint.mark_done(user.pk)
+                finally:
+                    # Save what was sent even if a later user fails, since
+                    # those users won't be sent their alerts again.
+                    Alert.objects.bulk_update(
+                        alerts_to_update, ["date_last_hit", "date_modified"]
                     )
-                    continue
-
-                # hits is a multi-dimensional array. It consists of alerts,
-                # paired with a list of document dicts, of the form:
-                # [[alert1, [{hit1}, {hit2}, {hit3}]], [alert2, ...]]
-                if len(results) > 0:
-                    search_type = qd.get("type", SEARCH_TYPES.OPINION)
-                    hits.append([alert, search_type, results])
-                    alert.query_run = qd.urlencode()
-                    alert.date_last_hit = now()
-                    alert.save()
-
-                    # Send webhook event if the user has a SEARCH_ALERT
-                    # endpoint enabled.
-                    user_webhooks = user.webhooks.filter(
-                        event_type=WebhookEventType.SEARCH_ALERT, enabled=True
-                    )
-                    for user_webhook in user_webhooks:
-                        self.send_search_alert_webhook(
-                            results, user_webhook, search_type, alert
-                        )
-
-            if len(hits) > 0:
-                alerts_sent_count += 1
-                send_alert(user.profile, hits)
+                self.release_queries(chunk_alerts)
 
         tally_stat(f"alerts.sent.{rate}", inc=alerts_sent_count)
         logger.info(f"Sent {alerts_sent_count} {rate} email alerts.")
 
+    def release_queries(self, alerts: Iterable[Alert]) -> None:
+        """Drop the results of the queries of some alerts once no alert left
+        to send needs them.
+
+        :param alerts: The alerts of a chunk of users that was sent.
+        :return: None
+        """
+        for alert in alerts:
+            self.pending_queries[alert.query] -= 1
+            if self.pending_queries[alert.query] <= 0:
+                del self.pending_queries[alert.query]
+                self.query_results.pop(alert.query, None)
+
+    @staticmethod
+    def can_get_rt_alerts(user: User) -> bool:
+        not_donated_enough = (
+            user.profile.total_donated_last_year
+            < settings.MIN_DONATION["rt_alerts"]
+        )
+        if not_donated_enough:
+            logger.info(
+                "User: %s has not donated enough for their %s "
+                "RT alerts to be sent.\n" % (user, len(user.alerts_to_run))
+            )
+        return not not_donated_enough
+
+    def send_user_alerts(
+        self, user: User, alerts_to_update: List[Alert]
+    ) -> bool:
+        """Send the email and webhook events for the alerts of a user, using
+        the results from run_queries.
+
+        :param user: The user, as loaded by send_emails_and_webhooks.
+        :param alerts_to_update: A list to add the alerts with hits to, so
+        that their date_last_hit can be saved in bulk.
+        :return: True if an email was sent, else False.
+        """
+        logger.info(f"Running alerts for user '{user}': {user.alerts_to_run}")
+        hits = []
+        hit_time = now()
+        for alert in user.alerts_to_run:
+            query_result = self.query_results.get(alert.query)
+            if query_result is None:
+                logger.info(f"Search for this alert failed: {alert.query}\n")
+                continue
+            qd, results = query_result
+
+            # hits is a multi-dimensional array. It consists of alerts,
+            # paired with a list of document dicts, of the form:
+            # [[alert1, [{hit1}, {hit2}, {hit3}]], [alert2, ...]]
+            if len(results) > 0:
+                search_type = qd.get("type", SEARCH_TYPES.OPINION)
+                hits.append([alert, search_type, results])
+                alert.query_run = qd.urlencode()
+                alert.date_last_hit = hit_time
+                # bulk_update doesn't set auto_now fields.
+                alert.date_modified = hit_time
+                alerts_to_update.append(alert)
+
+                # Send webhook event if the user has a SEARCH_ALERT
+                # endpoint enabled.
+                for user_webhook in user.search_alert_webhooks:
+                    self.send_search_alert_webhook(
+                        results, user_webhook, search_type, alert
+                    )
+
+        if len(hits) > 0:
+            send_alert(user.profile, hits)
+            return True
+        return False
+
+    def match_rt_alerts(self):
+        """Find the real time alerts that match any of the new items, with a
+        handful of Solr queries for all of them.
+
+        :return: A set of the IDs of the alerts that matched, or None if the
+        matching failed, in which case every alert should be run.
+        """
+        if not any(self.valid_ids.values()):
+            return set()
+        percolator = AlertPercolator(self.sis, Alert.REAL_TIME)
+        try:
+            matched_alert_ids = percolator.match(
+                Alert.objects.filter(rate=Alert.REAL_TIME).only("pk", "query"),
+                self.valid_ids,
+            )
+        except:
+            traceback.print_exc()
+            logger.info("Matching RT alerts failed. Running all of them.")
+            return None
+        logger.info(f"{len(matched_alert_ids)} RT alerts matched new items.")
+        return matched_alert_ids
+
     def clean_rt_queue(self):
         """Clean out any items in the RealTime queue once they've been run or
         if they are stale.
@@ -293,9 +481,7 @@ class Command(VerboseCommand):
                     "caller": f"cl_send_alerts:{item_type}",
                     "rows": MAX_RT_ITEM_QUERY,
                     "fl": "id",
-                    "fq": [
-                        f"id:({' OR '.join([str(i.item_pk) for i in ids])})"
-                    ],
+                    "fq": [make_ids_filter(i.item_pk for i in ids)],
                 }
                 results = (
                     self.sis[item_type]
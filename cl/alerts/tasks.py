@@ -11,7 +11,7 @@ from rest_framework.renderers import JSONRenderer
 
 from cl.alerts.models import DocketAlert
 from cl.api.models import Webhook, WebhookEvent, WebhookEventType
-from cl.api.utils import send_webhook_event
+from cl.api.utils import send_webhook_events
 from cl.celery_init import app
 from cl.corpus_importer.api_serializers import DocketEntrySerializer
 from cl.custom_filters.templatetags.text_filters import best_case_name
@@ -377,6 +377,7 @@ def send_docket_alert_webhooks(
     for de in docket_entries:
         serialized_docket_entries.append(DocketEntrySerializer(de).data)
 
+    webhook_events = []
     for webhook in webhooks:
         post_content = {
             "webhook": {
@@ -399,7 +400,8 @@ def send_docket_alert_webhooks(
             webhook=webhook,
             content=post_content,
         )
-        send_webhook_event(webhook_event, json_bytes)
+        webhook_events.append((webhook_event, json_bytes))
+    send_webhook_events(webhook_events)
 
 
 def send_recap_email_user_not_found(recap_email_recipients: list[str]) -> None:
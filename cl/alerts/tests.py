@@ -1,6 +1,7 @@
-from datetime import timedelta
+from datetime import date, timedelta
 from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.core import mail
@@ -18,11 +19,15 @@ from selenium.webdriver.common.by import By
 from timeout_decorator import timeout_decorator
 
 from cl.alerts.factories import AlertFactory, DocketAlertWithParentsFactory
+from cl.alerts.management.commands.cl_send_alerts import (
+    Command as SendAlertsCommand,
+)
 from cl.alerts.management.commands.handle_old_docket_alerts import (
     build_user_report,
 )
 from cl.alerts.models import SEARCH_TYPES, Alert, DocketAlert, RealTimeQueue
 from cl.alerts.tasks import send_alert_and_webhook
+from cl.alerts.utils import AlertPercolator, AlertRunCheckpoint
 from cl.api.factories import WebhookFactory
 from cl.api.models import (
     WEBHOOK_EVENT_STATUS,
@@ -34,6 +39,7 @@ from cl.audio.factories import AudioWithParentsFactory
 from cl.audio.models import Audio
 from cl.donate.factories import DonationFactory
 from cl.donate.models import Donation
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.lib.test_helpers import EmptySolrTestCase, SimpleUserDataMixin
 from cl.search.factories import DocketFactory, OpinionWithParentsFactory
 from cl.search.models import (
@@ -173,7 +179,7 @@ class DocketAlertTest(TestCase):
         self.assertEqual(len(mail.outbox), 0)
 
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_triggering_docket_webhook(self, mock_post) -> None:
@@ -570,6 +576,8 @@ class SearchAlertsWebhooksTest(EmptySolrTestCase):
         for obj_name, obj_type in obj_types.items():
             ids = obj_type.objects.all().values_list("pk", flat=True)
             add_items_to_solr(ids, obj_name, force_commit=True)
+        for rate in Alert.ALL_FREQUENCIES:
+            AlertRunCheckpoint(rate).finish()
 
     def test_send_search_alert_webhooks(self):
         """Can we send search alert webhooks for Opinions and Oral Arguments
@@ -582,7 +590,7 @@ class SearchAlertsWebhooksTest(EmptySolrTestCase):
         self.assertEqual(len(search_alerts), 6)
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, mock_raw=True
             ),
@@ -677,7 +685,7 @@ class SearchAlertsWebhooksTest(EmptySolrTestCase):
         ]
         for rate, events, results in rates:
             with mock.patch(
-                "cl.api.utils.requests.post",
+                "cl.api.utils.WebhookSession.post",
                 side_effect=lambda *args, **kwargs: MockResponse(
                     200, mock_raw=True
                 ),
@@ -732,6 +740,84 @@ class SearchAlertsWebhooksTest(EmptySolrTestCase):
                     )
             webhook_events.delete()
 
+    def test_resume_interrupted_run(self):
+        """Does an interrupted run skip the users whose alerts were already
+        sent, and forget about them once it finishes?"""
+        checkpoint = AlertRunCheckpoint(Alert.DAILY)
+        checkpoint.start(f"{Alert.DAILY}:{date.today().isoformat()}")
+        checkpoint.mark_done(self.user_profile.user.pk)
+
+        call_command("cl_send_alerts", rate=Alert.DAILY)
+
+        # Only user_profile_2 gets an email, and user_profile's webhook isn't
+        # sent again.
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user_profile_2.user.email])
+        self.assertEqual(WebhookEvent.objects.count(), 0)
+        self.assertIsNone(checkpoint.get_unfinished_run())
+
+    def test_shared_queries_are_run_once(self):
+        """Are queries shared by users in different chunks only run once, and
+        are their results dropped once every alert using them was sent?"""
+        command = SendAlertsCommand()
+        with mock.patch.object(
+            SendAlertsCommand,
+            "execute_query",
+            autospec=True,
+            side_effect=SendAlertsCommand.execute_query,
+        ) as execute_query:
+            call_command(command, rate=Alert.DAILY, chunk_size=1)
+
+        # One query for opinions and one for oral arguments, although both
+        # users have the opinion alert.
+        self.assertEqual(execute_query.call_count, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(command.query_results, {})
+        self.assertEqual(command.pending_queries, {})
+
+    def test_percolator_matches_new_items(self):
+        """Does the percolator find the alerts that match new items, and only
+        those?"""
+        rt_opinion = OpinionWithParentsFactory.create(
+            cluster__precedential_status=PRECEDENTIAL_STATUS.PUBLISHED,
+            cluster__date_filed=now(),
+        )
+        add_items_to_solr([rt_opinion.pk], "search.Opinion", force_commit=True)
+        sis = {
+            SEARCH_TYPES.OPINION: get_shared_solr_interface(
+                settings.SOLR_OPINION_URL
+            ),
+            SEARCH_TYPES.ORAL_ARGUMENT: get_shared_solr_interface(
+                settings.SOLR_AUDIO_URL
+            ),
+        }
+        percolator = AlertPercolator(sis, Alert.REAL_TIME)
+        with mock.patch.object(
+            percolator, "match_batch", wraps=percolator.match_batch
+        ) as match_batch:
+            matched = percolator.match(
+                Alert.objects.all(),
+                {
+                    SEARCH_TYPES.OPINION: [rt_opinion.pk],
+                    SEARCH_TYPES.ORAL_ARGUMENT: [],
+                },
+            )
+        # Every opinion alert has the same query, so they're matched in one
+        # request, and types without new items aren't matched at all.
+        match_batch.assert_called_once()
+        search_type, queries, ids = match_batch.call_args.args
+        self.assertEqual(search_type, SEARCH_TYPES.OPINION)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(ids, [rt_opinion.pk])
+        self.assertEqual(
+            matched,
+            set(
+                Alert.objects.filter(
+                    query="type=o&stat_Precedential=on"
+                ).values_list("pk", flat=True)
+            ),
+        )
+
 
 class DocketAlertAPITests(APITestCase):
     """Check that API CRUD operations are working well for docket alerts."""
@@ -0,0 +1,305 @@
+import datetime
+import json
+import warnings
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.http import QueryDict
+
+from cl.alerts.models import Alert
+from cl.lib import search_utils
+from cl.lib.redis_utils import make_redis_interface
+from cl.search.forms import SearchForm
+from cl.search.models import SEARCH_TYPES
+
+# How long an unfinished run of the alert sender can be resumed for.
+ALERT_CHECKPOINT_TIMEOUT = 60 * 60 * 24 * 7
+
+# The number of alert queries to match in a single Solr request. Each one adds
+# a few parameters to the request, so this keeps the requests to a sane size.
+ALERT_PERCOLATION_BATCH_SIZE = 250
+
+
+class InvalidDateError(Exception):
+    pass
+
+
+def get_cut_off_date(rate, d=datetime.date.today()):
+    """Given a rate of dly, wly or mly and a date, returns the date after which
+    new results should be considered a hit for an cl.
+    """
+    cut_off_date = None
+    if rate == Alert.REAL_TIME:
+        # use a couple days ago to limit results without risk of leaving out
+        # important items (this will be filtered further later).
+        cut_off_date = d - datetime.timedelta(days=10)
+    elif rate == Alert.DAILY:
+        cut_off_date = d
+    elif rate == Alert.WEEKLY:
+        cut_off_date = d - datetime.timedelta(days=7)
+    elif rate == Alert.MONTHLY:
+        if datetime.date.today().day > 28:
+            raise InvalidDateError(
+                "Monthly alerts cannot be run on the 29th, 30th or 31st."
+            )
+
+        # Get the first of the month of the previous month regardless of the
+        # current date
+        early_last_month = d - datetime.timedelta(days=28)
+        cut_off_date = datetime.datetime(
+            early_last_month.year, early_last_month.month, 1
+        )
+    return cut_off_date
+
+
+def build_alert_query_dict(query: str, rate: str) -> QueryDict:
+    """Make the QueryDict to give to the SearchForm for an alert's query.
+
+    :param query: The query string of the alert.
+    :param rate: The rate the alert is being run at.
+    :return: A QueryDict limited to the results that are new for the rate.
+    """
+    qd = QueryDict(query.encode(), mutable=True)
+    try:
+        del qd["filed_before"]
+    except KeyError:
+        pass
+    qd["order_by"] = "score desc"
+    cut_off_date = get_cut_off_date(rate)
+    # Default to 'o', if not available, according to the front end.
+    query_type = qd.get("type", SEARCH_TYPES.OPINION)
+    if query_type in [SEARCH_TYPES.OPINION, SEARCH_TYPES.RECAP]:
+        qd["filed_after"] = cut_off_date
+    elif query_type == SEARCH_TYPES.ORAL_ARGUMENT:
+        qd["argued_after"] = cut_off_date
+    return qd
+
+
+def make_ids_filter(ids: Iterable[int]) -> str:
+    """Make a filter query limiting results to a list of IDs.
+
+    The terms query parser doesn't make a boolean clause per ID, so unlike
+    id:(1 OR 2 OR ...), it can't hit Solr's maxBooleanClauses limit.
+
+    :param ids: The IDs to limit the results to.
+    :return: A filter query.
+    """
+    return f"{{!terms f=id}}{','.join(str(i) for i in ids)}"
+
+
+@dataclass
+class PercolatorQuery:
+    """An alert query, compiled so that it can be matched as a facet query."""
+
+    search_type: str
+    q: str
+    qf: str
+    fq: List[str] = field(default_factory=list)
+
+    def as_params(self, prefix: str) -> Tuple[str, Dict[str, str]]:
+        """Make the facet query for this alert query, and the parameters it
+        refers to.
+
+        The user's query and filters are passed by reference rather than
+        inlined, so that they don't need any escaping.
+
+        :param prefix: A prefix that's unique to this query in the request.
+        :return: A tuple of the facet query and its parameters.
+        """
+        params = {
+            f"{prefix}_must": f"{{!edismax qf=${prefix}_qf v=${prefix}_q}}",
+            f"{prefix}_q": self.q,
+            f"{prefix}_qf": self.qf,
+        }
+        clauses = [f"must=${prefix}_must"]
+        for i, fq in enumerate(self.fq):
+            params[f"{prefix}_fq{i}"] = fq
+            clauses.append(f"filter=${prefix}_fq{i}")
+        return f"{{!bool {' '.join(clauses)}}}", params
+
+
+class AlertPercolator:
+    """Match many alerts against a batch of new documents at once, like a
+    percolator.
+
+    Running every alert against the index, with a filter listing the new
+    documents, takes one Solr request per alert. Instead, every distinct
+    alert query is compiled once into a facet query. A single request per
+    batch of queries then gets Solr to count how many of the new documents
+    each one matches. Only the alerts with matches need to be run for real to
+    get their results and highlighting.
+    """
+
+    def __init__(self, sis, rate: str):
+        """
+        :param sis: A dict mapping search types to Solr interfaces.
+        :param rate: The rate the alerts are being run at.
+        """
+        self.sis = sis
+        self.rate = rate
+        self._compiled: Dict[str, Optional[PercolatorQuery]] = {}
+
+    def compile(self, query: str) -> Optional[PercolatorQuery]:
+        """Compile an alert's query string, reusing earlier compilations of
+        the same query string.
+
+        :param query: The query string of the alert.
+        :return: The compiled query, or None if the query isn't valid.
+        """
+        if query not in self._compiled:
+            self._compiled[query] = self._compile(query)
+        return self._compiled[query]
+
+    def _compile(self, query: str) -> Optional[PercolatorQuery]:
+        qd = build_alert_query_dict(query, self.rate)
+        search_form = SearchForm(qd)
+        if not search_form.is_valid():
+            return None
+        cd = search_form.cleaned_data
+        main_params = search_utils.build_main_query(
+            cd, highlight=False, facet=False, group=False
+        )
+        return PercolatorQuery(
+            search_type=qd.get("type", SEARCH_TYPES.OPINION),
+            q=main_params["q"],
+            qf=main_params.get("qf", ""),
+            # Collapsing only changes which documents are returned, not
+            # whether anything matched.
+            fq=[
+                fq
+                for fq in main_params.get("fq", [])
+                if not fq.startswith("{!collapse")
+            ],
+        )
+
+    def match(
+        self, alerts: Iterable[Alert], ids_by_type: Dict[str, List[int]]
+    ) -> Set[int]:
+        """Find the alerts that match any of the new documents.
+
+        :param alerts: The alerts to match.
+        :param ids_by_type: A dict mapping search types to the IDs of the new
+        documents of that type.
+        :return: The IDs of the alerts that matched at least one document.
+        """
+        alert_ids_by_query: Dict[str, List[int]] = defaultdict(list)
+        for alert in alerts:
+            alert_ids_by_query[alert.query].append(alert.pk)
+
+        queries_by_type: Dict[
+            str, List[Tuple[str, PercolatorQuery]]
+        ] = defaultdict(list)
+        for query in alert_ids_by_query:
+            compiled = self.compile(query)
+            if compiled is None or not ids_by_type.get(compiled.search_type):
+                # Invalid queries and types without new documents can't match.
+                continue
+            queries_by_type[compiled.search_type].append((query, compiled))
+
+        matched: Set[int] = set()
+        for search_type, queries in queries_by_type.items():
+            for i in range(0, len(queries), ALERT_PERCOLATION_BATCH_SIZE):
+                batch = queries[i : i + ALERT_PERCOLATION_BATCH_SIZE]
+                for query in self.match_batch(
+                    search_type, batch, ids_by_type[search_type]
+                ):
+                    matched.update(alert_ids_by_query[query])
+        return matched
+
+    def match_batch(
+        self,
+        search_type: str,
+        queries: List[Tuple[str, PercolatorQuery]],
+        ids: List[int],
+    ) -> List[str]:
+        """Match a batch of compiled queries with a single Solr request.
+
+        :param search_type: The search type of the queries.
+        :param queries: A list of query strings and their compiled queries.
+        :param ids: The IDs of the new documents.
+        :return: The query strings that matched at least one document.
+        """
+        facet_queries = []
+        params = {
+            "q": "*",
+            "rows": 0,
+            "fq": [make_ids_filter(ids)],
+            "facet": "true",
+            "caller": f"cl_send_alerts:percolator:{search_type}",
+        }
+        for n, (_, compiled) in enumerate(queries):
+            facet_query, query_params = compiled.as_params(f"a{n}")
+            facet_queries.append(facet_query)
+            params.update(query_params)
+        params["facet.query"] = facet_queries
+
+        # This is POSTed because of its length. Don't warn about it.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            response = (
+                self.sis[search_type].query().add_extra(**params).execute()
+            )
+        counts = response.facet_counts.facet_queries
+        return [
+            query
+            for (query, _), facet_query in zip(queries, facet_queries)
+            if counts.get(facet_query, 0) > 0
+        ]
+
+
+class AlertRunCheckpoint:
+    """Keep track of the users whose alerts have been sent in a run of
+    cl_send_alerts, so that if the run crashes, running it again picks up
+    where it left off instead of resending or skipping anything.
+
+    The checkpoint is cleared once a run finishes.
+    """
+
+    def __init__(self, rate: str):
+        self.r = make_redis_interface("CACHE")
+        self.key = f"alerts.checkpoint:{rate}"
+        self.users_key = f"{self.key}:users"
+
+    def get_unfinished_run(self) -> Optional[Dict]:
+        """Get the run that was interrupted, if any.
+
+        :return: A dict with the run_id of the run and the valid_ids it was
+        sending alerts for, or None.
+        """
+        run = self.r.get(self.key)
+        return json.loads(run) if run else None
+
+    def start(
+        self, run_id: str, valid_ids: Optional[Dict[str, List[int]]] = None
+    ) -> Set[int]:
+        """Start a run, or resume it if it's the one that was interrupted.
+
+        :param run_id: Identifies the run. A run with another ID that wasn't
+        finished is forgotten.
+        :param valid_ids: For real time runs, the IDs of the new items the
+        run sends alerts for, so that a resumed run can use the same ones.
+        :return: The IDs of the users whose alerts were already sent.
+        """
+        run = self.get_unfinished_run()
+        if run and run["run_id"] == run_id:
+            return {int(pk) for pk in self.r.smembers(self.users_key)}
+
+        pipe = self.r.pipeline()
+        pipe.delete(self.users_key)
+        pipe.set(
+            self.key,
+            json.dumps({"run_id": run_id, "valid_ids": valid_ids}),
+            ex=ALERT_CHECKPOINT_TIMEOUT,
+        )
+        pipe.execute()
+        return set()
+
+    def mark_done(self, user_id: int) -> None:
+        pipe = self.r.pipeline()
+        pipe.sadd(self.users_key, user_id)
+        pipe.expire(self.users_key, ALERT_CHECKPOINT_TIMEOUT)
+        pipe.execute()
+
+    def finish(self) -> None:
+        self.r.delete(self.key, self.users_key)
@@ -6,7 +6,7 @@ from django.db import transaction
 from django.utils.timezone import now
 
 from cl.api.models import WEBHOOK_EVENT_STATUS, Webhook, WebhookEvent
-from cl.api.utils import send_webhook_event
+from cl.api.utils import send_webhook_events
 from cl.lib.command_utils import VerboseCommand
 from cl.lib.redis_utils import make_redis_interface
 from cl.users.tasks import send_webhook_still_disabled_email
@@ -55,8 +55,9 @@ def retry_webhook_events() -> int:
             ],
             date_created__gte=created_date_cut_off,
         ).order_by("date_created")
-        for webhook_event in webhook_events_to_retry:
-            send_webhook_event(webhook_event)
+        send_webhook_events(
+            (webhook_event, None) for webhook_event in webhook_events_to_retry
+        )
     return len(webhook_events_to_retry)
 
 
@@ -1,6 +1,13 @@
 from django.core.paginator import InvalidPage
-from rest_framework.exceptions import NotFound
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class ShallowOnlyPageNumberPagination(PageNumberPagination):
@@ -49,6 +56,75 @@ class ShallowOnlyPageNumberPagination(PageNumberPagination):
         return list(self.page)
 
 
+class KeysetPagination(CursorPagination):
+    """A cursor paginator that walks a table in id or date_modified order.
+
+    Each page is fetched with a WHERE clause on the ordering field, so it
+    costs the same at any depth and there's no COUNT query. Rows inserted
+    while a client pages through the table don't shift the pages.
+
+    Clients ask for the first page with cursor=* and then follow the next
+    links.
+    """
+
+    keyset_fields = ("id", "date_modified")
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        """Use the order_by parameter if it's one of the keyset fields,
+        breaking ties on date_modified with the id.
+        """
+        ordering = request.query_params.get(
+            api_settings.ORDERING_PARAM, self.ordering
+        )
+        field = ordering.lstrip("-")
+        if field not in self.keyset_fields:
+            raise ParseError(
+                f"Cursor pagination can only be ordered by: "
+                f"{', '.join(self.keyset_fields)}."
+            )
+        if field == "id":
+            return (ordering,)
+        direction = "-" if ordering.startswith("-") else ""
+        return ordering, f"{direction}id"
+
+    def decode_cursor(self, request):
+        if request.query_params.get(self.cursor_query_param) == "*":
+            return None
+        return super(KeysetPagination, self).decode_cursor(request)
+
+
+class ShallowOrKeysetPagination(ShallowOnlyPageNumberPagination):
+    """Page number pagination that switches to keyset pagination when the
+    client sends a cursor parameter.
+    """
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param not in request.query_params:
+            self.keyset = None
+            return super(ShallowOrKeysetPagination, self).paginate_queryset(
+                queryset, request, view
+            )
+        self.keyset = KeysetPagination()
+        results = self.keyset.paginate_queryset(queryset, request, view)
+        self.display_page_controls = self.keyset.display_page_controls
+        return results
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super(ShallowOrKeysetPagination, self).get_paginated_response(
+            data
+        )
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+        return super(ShallowOrKeysetPagination, self).to_html()
+
+
 class TinyAdjustablePagination(ShallowOnlyPageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
@@ -62,3 +138,48 @@ class MediumAdjustablePagination(ShallowOnlyPageNumberPagination):
 
 class BigPagination(ShallowOnlyPageNumberPagination):
     page_size = 300
+
+
+class SolrCursorPagination(BasePagination):
+    """A paginator for Solr results that follows cursor marks instead of page
+    numbers, so that clients can page through every result of a search.
+
+    Clients ask for the first page with cursor=* and then follow the next
+    links. Solr only has to find the results after the cursor, so deep pages
+    are as cheap as the first one.
+    """
+
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        :param queryset: A SolrList with a cursor mark.
+        :param request: The request.
+        :return: A list of the results on the page.
+        """
+        self.request = request
+        self.count = len(queryset)
+        self.results = list(queryset)
+        self.next_cursor_mark = queryset.next_cursor_mark
+        if not self.results or self.next_cursor_mark == queryset.cursor_mark:
+            # Solr returns the same cursor mark once there's nothing left.
+            self.next_cursor_mark = None
+        return self.results
+
+    def get_next_link(self):
+        if self.next_cursor_mark is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor_mark
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": None,
+                "results": data,
+            }
+        )
@@ -12,18 +12,26 @@ from django.test.utils import CaptureQueriesContext
 from django.urls import ResolverMatch, reverse
 from rest_framework.exceptions import NotFound
 from rest_framework.request import Request
-from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_400_BAD_REQUEST,
+    HTTP_403_FORBIDDEN,
+)
 from rest_framework.test import APIRequestFactory
 
+from cl.api.factories import WebhookEventWithParentsFactory, WebhookFactory
+from cl.api.models import WEBHOOK_EVENT_STATUS
 from cl.api.pagination import ShallowOnlyPageNumberPagination
+from cl.api.utils import send_webhook_events
 from cl.api.views import coverage_data
 from cl.audio.api_views import AudioViewSet
 from cl.lib.redis_utils import make_redis_interface
 from cl.lib.test_helpers import IndexedSolrTestCase, SimpleUserDataMixin
 from cl.recap.factories import ProcessingQueueFactory
 from cl.search.models import Opinion
-from cl.stats.models import Event
+from cl.stats.models import Event, Stat
 from cl.tests.cases import SimpleTestCase, TestCase, TransactionTestCase
+from cl.tests.utils import MockResponse
 from cl.users.factories import UserFactory, UserProfileWithParentsFactory
 from cl.users.models import UserProfile
 
@@ -223,6 +231,34 @@ class ApiQueryCountTests(TransactionTestCase):
             path = reverse("fast-recapdocument-list", kwargs={"version": "v3"})
             self.client.get(path, {"pacer_doc_id": "17711118263"})
 
+    def test_keyset_pagination(self) -> None:
+        """Can we walk the RECAP endpoints with a cursor, without counting
+        the rows?"""
+        for name in ["docket-list", "docketentry-list", "recapdocument-list"]:
+            path = reverse(name, kwargs={"version": "v3"})
+            expected = [
+                r["id"]
+                for r in self.client.get(path, {"order_by": "id"}).data[
+                    "results"
+                ]
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.get(
+                    path, {"cursor": "*", "order_by": "date_modified"}
+                )
+            self.assertEqual(r.status_code, HTTP_200_OK)
+            self.assertNotIn("count", r.data)
+            for query in ctx.captured_queries:
+                self.assertNotIn("COUNT(*)", query["sql"])
+
+            r = self.client.get(path, {"cursor": "*", "order_by": "id"})
+            self.assertEqual([d["id"] for d in r.data["results"]], expected)
+
+            r = self.client.get(
+                path, {"cursor": "*", "order_by": "date_filed"}
+            )
+            self.assertEqual(r.status_code, HTTP_400_BAD_REQUEST)
+
     def test_recap_api_required_filter(self) -> None:
         path = reverse("fast-recapdocument-list", kwargs={"version": "v3"})
         r = self.client.get(path, {"pacer_doc_id": "17711118263"})
@@ -968,3 +1004,65 @@ class DRFRecapPermissionTest(TestCase):
             r = self.client.get(path)
             self.assertEqual(r.status_code, HTTP_403_FORBIDDEN)
             print("✓")
+
+
+class WebhookDeliveryTest(TestCase):
+    """Check that batches of webhook events are delivered and updated."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.good_webhook = WebhookFactory(
+            url="https://example.com/good/", enabled=True
+        )
+        cls.bad_webhook = WebhookFactory(
+            url="https://example.com/bad/", enabled=True
+        )
+
+    def test_send_webhook_events(self) -> None:
+        """Are the events of every endpoint sent, and updated according to
+        their own response?"""
+        events = [
+            WebhookEventWithParentsFactory(
+                webhook=webhook,
+                content={"n": n},
+                event_status=WEBHOOK_EVENT_STATUS.IN_PROGRESS,
+            )
+            for n, webhook in enumerate(
+                [self.good_webhook] * 5 + [self.bad_webhook] * 3
+            )
+        ]
+
+        def mock_post(url, *args, **kwargs):
+            status = 200 if url == self.good_webhook.url else 500
+            return MockResponse(status, mock_raw=True)
+
+        with mock.patch(
+            "cl.api.utils.WebhookSession.post", side_effect=mock_post
+        ) as post:
+            send_webhook_events(
+                [(event, None) for event in events], max_per_endpoint=2
+            )
+
+        self.assertEqual(post.call_count, len(events))
+        for event in events:
+            event.refresh_from_db()
+            if event.webhook_id == self.good_webhook.pk:
+                self.assertEqual(
+                    event.event_status, WEBHOOK_EVENT_STATUS.SUCCESSFUL
+                )
+                self.assertEqual(event.status_code, 200)
+            else:
+                self.assertEqual(
+                    event.event_status, WEBHOOK_EVENT_STATUS.ENQUEUED_RETRY
+                )
+                self.assertEqual(event.retry_counter, 1)
+        self.bad_webhook.refresh_from_db()
+        self.assertEqual(self.bad_webhook.failure_count, 3)
+        self.assertEqual(
+            sum(
+                Stat.objects.filter(
+                    name__startswith="webhooks.latency."
+                ).values_list("count", flat=True)
+            ),
+            len(events),
+        )
@@ -1,7 +1,14 @@
+import bisect
 import logging
+import os
+import threading
+import time
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Set, Union
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Iterable, List, Set, Union, cast
 
 import requests
 from dateutil import parser
@@ -18,6 +25,7 @@ from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
 from ipware import get_client_ip
 from requests import Response
+from requests.adapters import HTTPAdapter
 from rest_framework import serializers
 from rest_framework.metadata import SimpleMetadata
 from rest_framework.permissions import DjangoModelPermissions
@@ -31,7 +39,7 @@ from cl.api.models import WEBHOOK_EVENT_STATUS, WebhookEvent
 from cl.lib.redis_utils import make_redis_interface
 from cl.lib.string_utils import trunc
 from cl.stats.models import Event
-from cl.stats.utils import MILESTONES_FLAT, get_milestone_range
+from cl.stats.utils import MILESTONES_FLAT, get_milestone_range, tally_stat
 from cl.users.tasks import notify_failing_webhook
 
 BOOLEAN_LOOKUPS = ["exact"]
@@ -650,10 +658,159 @@ def check_webhook_failure_count_and_notify(
     webhook.save(update_fields=update_fields)
 
 
+# The number of webhook events to send at once, and to a single endpoint.
+WEBHOOK_MAX_WORKERS = 16
+WEBHOOK_MAX_PER_ENDPOINT = 4
+
+# The most of a webhook response body to read so that its connection can be
+# reused. Connections with longer responses are closed instead.
+WEBHOOK_MAX_DRAIN_SIZE = 64 * 1024
+
+# The upper bounds of the webhook latency histogram, in milliseconds.
+WEBHOOK_LATENCY_BUCKETS = [100, 250, 500, 1000, 2000]
+
+
+class WebhookSession(requests.Session):
+    """A session to send webhook events with.
+
+    Connections are pooled per host and kept alive between events. Cookies
+    are never stored, since the session is shared by every user's endpoints.
+    """
+
+    def __init__(self):
+        super(WebhookSession, self).__init__()
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=WEBHOOK_MAX_WORKERS,
+            pool_maxsize=WEBHOOK_MAX_WORKERS,
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+
+_webhook_session_lock = threading.Lock()
+_webhook_session: tuple[int, WebhookSession] | None = None
+
+
+def get_webhook_session() -> WebhookSession:
+    """Get the webhook session of this process, creating it if needed.
+
+    Sockets can't be shared between processes, so a forked Celery worker gets
+    its own session.
+    """
+    global _webhook_session
+    with _webhook_session_lock:
+        if _webhook_session is None or _webhook_session[0] != os.getpid():
+            _webhook_session = (os.getpid(), WebhookSession())
+        return _webhook_session[1]
+
+
+@dataclass
+class WebhookDelivery:
+    """The outcome of POSTing a webhook event."""
+
+    status_code: int | None = None
+    data: str = ""
+    error: str = ""
+    latency: float = 0.0
+
+
+def read_webhook_response(response: Response) -> str:
+    """Read the start of a webhook response and release its connection.
+
+    The webhook response is consumed as a stream to avoid blocking the
+    process and overflowing memory on huge responses. We only keep the first
+    4KB. Short responses are read to the end so that their connection can go
+    back to the pool.
+
+    :param response: The streamed response.
+    :return: The first 4KB of the response body.
+    """
+    data = ""
+    size = 0
+    for chunk in response.iter_content(1024 * 4, decode_unicode=True):
+        if not data:
+            data = chunk
+        size += len(chunk)
+        if size > WEBHOOK_MAX_DRAIN_SIZE:
+            break
+    response.close()
+    return data
+
+
+def render_webhook_event(
+    webhook_event: WebhookEvent, content_bytes: bytes | None = None
+) -> bytes:
+    if content_bytes:
+        return content_bytes
+    renderer = JSONRenderer()
+    return renderer.render(
+        webhook_event.content,
+        accepted_media_type="application/json;",
+    )
+
+
+def post_webhook_event(
+    url: str, event_id: str, json_bytes: bytes
+) -> WebhookDelivery:
+    """POST a webhook event. This doesn't touch the DB, so it can be called
+    from worker threads.
+
+    :param url: The URL of the webhook endpoint.
+    :param event_id: The ID of the event, to use as the idempotency key.
+    :param json_bytes: The JSON content to send.
+    :return: The outcome of the request.
+    """
+    headers = {
+        "Content-type": "application/json",
+        "Idempotency-Key": event_id,
+    }
+    t1 = time.monotonic()
+    try:
+        response = get_webhook_session().post(
+            url,
+            data=json_bytes,
+            timeout=(1, 1),
+            stream=True,
+            headers=headers,
+            allow_redirects=False,
+        )
+        delivery = WebhookDelivery(
+            status_code=response.status_code,
+            data=read_webhook_response(response),
+        )
+    except (requests.ConnectionError, requests.Timeout) as exc:
+        error_str = f"{type(exc).__name__}: {exc}"
+        delivery = WebhookDelivery(error=trunc(error_str, 500))
+    delivery.latency = time.monotonic() - t1
+    return delivery
+
+
+def tally_webhook_latencies(deliveries: Iterable[WebhookDelivery]) -> None:
+    """Add the latencies of some webhook deliveries to the daily latency
+    histogram, with one stat per bucket.
+
+    :param deliveries: The deliveries to add.
+    :return: None
+    """
+    counts: Dict[str, int] = defaultdict(int)
+    for delivery in deliveries:
+        ms = delivery.latency * 1000
+        i = bisect.bisect_left(WEBHOOK_LATENCY_BUCKETS, ms)
+        if i < len(WEBHOOK_LATENCY_BUCKETS):
+            bucket = f"le_{WEBHOOK_LATENCY_BUCKETS[i]}ms"
+        else:
+            bucket = f"gt_{WEBHOOK_LATENCY_BUCKETS[-1]}ms"
+        counts[bucket] += 1
+    for bucket, count in counts.items():
+        tally_stat(f"webhooks.latency.{bucket}", inc=count)
+
+
 def update_webhook_event_after_request(
     webhook_event: WebhookEvent,
     response: Response | None = None,
     error: str | None = "",
+    delivery: WebhookDelivery | None = None,
 ) -> None:
     """Update the webhook event after sending the POST request. If the webhook
     event fails, increase the retry counter, next retry date and increase its
@@ -665,25 +822,25 @@ def update_webhook_event_after_request(
     update the WebhookEvent accordingly.
     :param error: Optional, if we don't receive a request Response we'll
     receive an error to log it.
+    :param delivery: Optional, the outcome of the request if it was sent with
+    post_webhook_event. Used instead of the response and the error.
     :return: None
     """
 
     failed_request = False
     data = ""
     status_code = None
-    if response is not None:
-        # The webhook response is consumed as a stream to avoid blocking the
-        # process and overflowing memory on huge responses. We only read and
-        # store the first 4KB
-        for chunk in response.iter_content(1024 * 4, decode_unicode=True):
-            data = chunk
-            break
-        response.close()
+    if delivery is not None:
+        status_code = delivery.status_code
+        data = delivery.data
+        error = delivery.error
+    elif response is not None:
+        data = read_webhook_response(response)
         status_code = response.status_code
-        # If the response status code is not 2xx. It's considered a failed
-        # attempt, and it'll be enqueued for retry.
-        if not 200 <= response.status_code < 300:
-            failed_request = True
+    # If the response status code is not 2xx. It's considered a failed
+    # attempt, and it'll be enqueued for retry.
+    if status_code is not None and not 200 <= status_code < 300:
+        failed_request = True
     webhook_event.status_code = status_code
     webhook_event.response = data
 
@@ -721,29 +878,81 @@ def send_webhook_event(
     :param content_bytes: Optional, the bytes JSON content to send the first time
     the webhook is sent.
     """
-    headers = {
-        "Content-type": "application/json",
-        "Idempotency-Key": str(webhook_event.event_id),
-    }
-    if content_bytes:
-        json_bytes = content_bytes
-    else:
-        renderer = JSONRenderer()
-        json_bytes = renderer.render(
-            webhook_event.content,
-            accepted_media_type="application/json;",
-        )
-    try:
-        response = requests.post(
-            webhook_event.webhook.url,
-            data=json_bytes,
-            timeout=(1, 1),
-            stream=True,
-            headers=headers,
-            allow_redirects=False,
+    delivery = post_webhook_event(
+        webhook_event.webhook.url,
+        str(webhook_event.event_id),
+        render_webhook_event(webhook_event, content_bytes),
+    )
+    update_webhook_event_after_request(webhook_event, delivery=delivery)
+    tally_webhook_latencies([delivery])
+
+
+def _post_webhook_events(
+    events: List[tuple[int, str, str, bytes]]
+) -> List[tuple[int, WebhookDelivery]]:
+    return [
+        (i, post_webhook_event(url, event_id, json_bytes))
+        for i, url, event_id, json_bytes in events
+    ]
+
+
+def send_webhook_events(
+    webhook_events: Iterable[tuple[WebhookEvent, bytes | None]],
+    max_workers: int = WEBHOOK_MAX_WORKERS,
+    max_per_endpoint: int = WEBHOOK_MAX_PER_ENDPOINT,
+) -> None:
+    """Send many webhook events concurrently.
+
+    The requests are sent from a pool of threads, at most max_per_endpoint
+    at a time to any one endpoint, so that a slow endpoint can't hold up the
+    others. Once they're all sent, the events are updated from this thread in
+    their original order, exactly like send_webhook_event does.
+
+    :param webhook_events: Tuples of the WebhookEvents to send and their
+    bytes JSON content, or None to render it from the event.
+    :param max_workers: The number of requests to send at once.
+    :param max_per_endpoint: The number of requests to send at once to a
+    single endpoint.
+    :return: None
+    """
+    # Events of the same webhook share its instance, so that they see each
+    # other's changes to it, like when it gets disabled.
+    webhooks = {}
+    events = []
+    requests_by_url = defaultdict(list)
+    for webhook_event, content_bytes in webhook_events:
+        webhook = webhooks.get(webhook_event.webhook_id)
+        if webhook is None:
+            webhook = webhook_event.webhook
+            webhooks[webhook_event.webhook_id] = webhook
+        webhook_event.webhook = webhook
+        requests_by_url[webhook.url].append(
+            (
+                len(events),
+                webhook.url,
+                str(webhook_event.event_id),
+                render_webhook_event(webhook_event, content_bytes),
+            )
         )
-        update_webhook_event_after_request(webhook_event, response)
-    except (requests.ConnectionError, requests.Timeout) as exc:
-        error_str = f"{type(exc).__name__}: {exc}"
-        trunc(error_str, 500)
-        update_webhook_event_after_request(webhook_event, error=error_str)
+        events.append(webhook_event)
+    if not events:
+        return
+
+    # Each lane of an endpoint's requests is sent in order by one thread.
+    lanes = [
+        url_requests[i::max_per_endpoint]
+        for url_requests in requests_by_url.values()
+        for i in range(min(max_per_endpoint, len(url_requests)))
+    ]
+    deliveries: List[WebhookDelivery | None] = [None] * len(events)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(lanes))) as pool:
+        for lane in pool.map(_post_webhook_events, lanes):
+            for i, delivery in lane:
+                deliveries[i] = delivery
+
+    # Every lane has finished, so every event has its delivery.
+    assert all(delivery is not None for delivery in deliveries)
+    sent = cast(List[WebhookDelivery], deliveries)
+    for webhook_event, delivery in zip(events, sent):
+        update_webhook_event_after_request(webhook_event, delivery=delivery)
+    tally_webhook_latencies(sent)
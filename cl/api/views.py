@@ -8,7 +8,7 @@ from django.template import TemplateDoesNotExist
 from rest_framework import status
 from rest_framework.status import HTTP_400_BAD_REQUEST
 
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.lib.search_utils import (
     build_alert_estimation_query,
     build_court_count_query,
@@ -45,9 +45,8 @@ def annotate_courts_with_counts(courts, court_count_tuples):
 
 def make_court_variable():
     courts = Court.objects.exclude(jurisdiction=Court.TESTING_COURT)
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    si = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     response = si.query().add_extra(**build_court_count_query()).execute()
-    si.conn.http_connection.close()
     court_count_tuples = response.facet_counts.facet_fields["court_exact"]
     courts = annotate_courts_with_counts(courts, court_count_tuples)
     return courts
@@ -129,14 +128,13 @@ def coverage_data(request, version, court):
     else:
         court_str = "all"
     q = request.GET.get("q")
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    si = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     facet_field = "dateFiled"
     response = (
         si.query()
         .add_extra(**build_coverage_query(court_str, q, facet_field))
         .execute()
     )
-    si.conn.http_connection.close()
     counts = response.facet_counts.facet_ranges[facet_field]["counts"]
     counts = strip_zero_years(counts)
 
@@ -188,7 +186,6 @@ def get_result_count(request, version, day_count):
         .add_extra(**build_alert_estimation_query(cd, int(day_count)))
         .execute()
     )
-    si.conn.http_connection.close()
     return JsonResponse({"count": response.result.numFound}, safe=True)
 
 
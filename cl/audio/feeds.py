@@ -3,7 +3,7 @@ from django.templatetags.static import static
 
 from cl.lib import search_utils
 from cl.lib.podcast import iTunesPodcastsFeedGenerator
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.search.feeds import JurisdictionFeed, get_item
 from cl.search.forms import SearchForm
 
@@ -30,7 +30,7 @@ class JurisdictionPodcast(JurisdictionFeed):
         """
         Returns a list of items to publish in this feed.
         """
-        solr = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
+        solr = get_shared_solr_interface(settings.SOLR_AUDIO_URL)
         params = {
             "q": "*",
             "fq": f"court_exact:{obj.pk}",
@@ -40,7 +40,6 @@ class JurisdictionPodcast(JurisdictionFeed):
             "caller": "JurisdictionPodcast",
         }
         items = solr.query().add_extra(**params).execute()
-        solr.conn.http_connection.close()
         return items
 
     def feed_extra_kwargs(self, obj):
@@ -96,7 +95,7 @@ class AllJurisdictionsPodcast(JurisdictionPodcast):
         return None
 
     def items(self, obj):
-        solr = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
+        solr = get_shared_solr_interface(settings.SOLR_AUDIO_URL)
         params = {
             "q": "*",
             "sort": "dateArgued desc",
@@ -105,7 +104,6 @@ class AllJurisdictionsPodcast(JurisdictionPodcast):
             "caller": "AllJurisdictionsPodcast",
         }
         items = solr.query().add_extra(**params).execute()
-        solr.conn.http_connection.close()
         return items
 
 
@@ -119,7 +117,7 @@ class SearchPodcast(JurisdictionPodcast):
         search_form = SearchForm(obj.GET)
         if search_form.is_valid():
             cd = search_form.cleaned_data
-            solr = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
+            solr = get_shared_solr_interface(settings.SOLR_AUDIO_URL)
             main_params = search_utils.build_main_query(
                 cd, highlight=False, facet=False
             )
@@ -132,7 +130,6 @@ class SearchPodcast(JurisdictionPodcast):
                 }
             )
             items = solr.query().add_extra(**main_params).execute()
-            solr.conn.http_connection.close()
             return items
         else:
             return []
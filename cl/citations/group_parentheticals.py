@@ -16,8 +16,11 @@ Implementation-wise, we are doing an approximation of Jaccard similarity
 (https://en.wikipedia.org/wiki/Jaccard_index) between the tokens of every
 parenthetical and every other and group together those parentheticals that
 are above a certain threshold of similarity to each other. To do this
-efficiently, we make use of the datasketch library's implementation of MinHash,
-an algorithm known as a locality-sensitive hashing (LSH) algorithm.
+efficiently, we make use of MinHash, an algorithm known as a
+locality-sensitive hashing (LSH) algorithm. The signatures are computed in
+batch with numpy, using the same permutations and banding parameters as the
+datasketch library, and are stored on each Parenthetical so that regrouping a
+case only has to hash its new parentheticals.
 
 For information about MinHash, here are a couple of good resources:
 https://medium.com/@jonathankoren/near-duplicate-detection-b6694e807f7a
@@ -29,33 +32,43 @@ https://github.com/freelawproject/courtlistener/issues/1931
 https://github.com/freelawproject/courtlistener/pull/1941
 """
 
+
 import re
-from copy import deepcopy
 from dataclasses import dataclass
-from math import ceil, log10
-from typing import Dict, List, Set
+from math import ceil
+from typing import Dict, Iterable, List, Tuple
 
+import numpy as np
 from datasketch import MinHash, MinHashLSH
+from datasketch.hashfunc import sha1_hash32
 from Stemmer import Stemmer
 
 from cl.lib.stop_words import STOP_WORDS
 from cl.search.models import Parenthetical
 
-Graph = Dict[str, List[str]]
-
 GERUND_WORD = re.compile(r"(?:\S+ing)", re.IGNORECASE)
 
 SIMILARITY_THRESHOLD = 0.5
-
-# Initializing the LSH/Minhashes is very slow because it has to generate
-# a ton of random numbers. But we can avoid repeating that work
-# every time we compute groups by simply using python's deepcopy
-# method to clone this reference object. It really seems too stupid
-# to work, but it does, perfectly, and gives us a huge speed-up.
-_EMPTY_SIMILARITY_INDEX = MinHashLSH(
-    threshold=SIMILARITY_THRESHOLD, num_perm=64
+NUM_PERM = 64
+
+# These match the constants datasketch uses, so that our signatures are the
+# same as the ones its MinHash would compute.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Initializing the LSH/Minhashes is very slow because the LSH has to find the
+# best number of bands for the threshold and the MinHash has to generate a ton
+# of random numbers. We do it once and only keep those parameters, since the
+# hashing and the banding themselves are done in batch with numpy.
+_similarity_index = MinHashLSH(
+    threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM
 )
-_EMPTY_MHASH = MinHash(num_perm=64)
+LSH_BANDS, LSH_ROWS = _similarity_index.b, _similarity_index.r
+_PERMUTATION_A, _PERMUTATION_B = MinHash(num_perm=NUM_PERM).permutations
+
+# The number of parentheticals to hash at once, to bound the size of the
+# intermediate token-by-permutation matrix.
+SIGNATURE_BATCH_SIZE = 1000
 
 # We initialize the stemmer once and reuse it because it internally caches
 # frequently seen tokens, giving us a performance benefit if we reuse it.
@@ -92,121 +105,235 @@ def compute_parenthetical_groups(
     if len(parentheticals) == 0:
         return []
 
-    similarity_index = deepcopy(_EMPTY_SIMILARITY_INDEX)
-    parenthetical_objects: Dict[str, Parenthetical] = {}
-    parenthetical_minhashes: Dict[str, MinHash] = {}
+    signatures = get_minhash_signatures(parentheticals)
+    buckets = get_lsh_buckets(signatures)
+    components = [
+        sorted(
+            component,
+            key=lambda i: parentheticals[i].score,
+            reverse=True,
+        )
+        for component in get_components(
+            len(parentheticals), get_lsh_edges(buckets)
+        )
+    ]
+    # Only the candidates for representative need their neighbors counted.
+    candidates = [
+        i
+        for component in components
+        for i in component[: get_representative_search_size(component)]
+    ]
+    neighbor_counts = {
+        str(parentheticals[i].id): count
+        for i, count in get_neighbor_counts(candidates, buckets).items()
+    }
+
+    parenthetical_groups = [
+        get_group_from_component(
+            [parentheticals[i] for i in component],
+            len(parentheticals),
+            neighbor_counts,
+        )
+        for component in components
+    ]
+    return sorted(
+        parenthetical_groups, key=lambda group: group.score, reverse=True
+    )
 
-    for par in parentheticals:
-        mhash = deepcopy(_EMPTY_MHASH)
-        tokens = get_parenthetical_tokens(par.text)
-        mhash.update_batch([gram.encode("utf-8") for gram in tokens])
 
-        par_key = str(par.id)
-        parenthetical_objects[par_key] = par
-        parenthetical_minhashes[par_key] = mhash
-        similarity_index.insert(par_key, mhash)
+def compute_minhash_signatures(texts: List[str]) -> np.ndarray:
+    """
+    Compute the MinHash signature of the tokens of many texts at once.
 
-    similarity_graph = get_similarity_graph(
-        parenthetical_minhashes, similarity_index
-    )
+    Every token of every text is hashed against every permutation in a single
+    matrix operation, and the minimum of each text's rows is its signature.
 
-    parenthetical_groups: List[ComputedParentheticalGroup] = []
-    visited_nodes: Set[str] = set()
-    for node, neighbors in similarity_graph.items():
-        if component := get_graph_component(
-            node, similarity_graph, visited_nodes
-        ):
-            parenthetical_groups.append(
-                get_group_from_component(
-                    component,
-                    parenthetical_objects,
-                    similarity_graph,
-                )
-            )
-    return sorted(
-        parenthetical_groups, key=lambda group: group.score, reverse=True
-    )
+    :param texts: The texts to compute signatures for
+    :return: A matrix with one row of NUM_PERM hash values per text
+    """
+    signatures = np.full((len(texts), NUM_PERM), _MAX_HASH, dtype=np.uint64)
+    for offset in range(0, len(texts), SIGNATURE_BATCH_SIZE):
+        rows: List[int] = []
+        hashes: List[int] = []
+        batch = texts[offset : offset + SIGNATURE_BATCH_SIZE]
+        for i, text in enumerate(batch, start=offset):
+            for token in set(get_parenthetical_tokens(text)):
+                rows.append(i)
+                hashes.append(sha1_hash32(token.encode("utf-8")))
+        if not hashes:
+            continue
+        hash_values = np.array(hashes, dtype=np.uint64)[:, np.newaxis]
+        permuted = np.bitwise_and(
+            (hash_values * _PERMUTATION_A + _PERMUTATION_B) % _MERSENNE_PRIME,
+            _MAX_HASH,
+        )
+        # The rows are in order, so each text's tokens are contiguous.
+        text_rows, starts = np.unique(rows, return_index=True)
+        signatures[text_rows] = np.minimum.reduceat(permuted, starts, axis=0)
+    return signatures.astype(np.uint32)
+
+
+def get_minhash_signatures(parentheticals: List[Parenthetical]) -> np.ndarray:
+    """
+    Get the MinHash signatures of a list of parentheticals, computing the
+    missing ones in batch and setting them on the objects, so that the caller
+    can save them.
+
+    :param parentheticals: A list of parentheticals
+    :return: A matrix with one row of NUM_PERM hash values per parenthetical
+    """
+    if not parentheticals:
+        return np.empty((0, NUM_PERM), dtype=np.uint32)
+    missing = [
+        par for par in parentheticals if getattr(par, "minhash", None) is None
+    ]
+    if missing:
+        signatures = compute_minhash_signatures([par.text for par in missing])
+        for par, signature in zip(missing, signatures):
+            par.minhash = signature.astype("<u4").tobytes()
+    return np.frombuffer(
+        b"".join(bytes(par.minhash) for par in parentheticals), dtype="<u4"
+    ).reshape(-1, NUM_PERM)
+
+
+def get_lsh_buckets(signatures: np.ndarray) -> np.ndarray:
+    """
+    Split the signatures into LSH_BANDS bands and find which bucket each
+    parenthetical falls in for each band. Two parentheticals are candidates
+    for being similar if they share a bucket in any band, which is what
+    datasketch's MinHashLSH.query returns.
+
+    :param signatures: A matrix of MinHash signatures
+    :return: A matrix with a column per band, where each bucket is identified
+    by the index of the first parenthetical in it
+    """
+    buckets = np.empty((len(signatures), LSH_BANDS), dtype=np.int64)
+    for band in range(LSH_BANDS):
+        rows = np.ascontiguousarray(
+            signatures[:, band * LSH_ROWS : (band + 1) * LSH_ROWS]
+        )
+        # Viewing each row as a single opaque value is a lot faster than
+        # finding unique rows.
+        keys = rows.view(np.dtype((np.void, rows.itemsize * LSH_ROWS)))
+        _, first, inverse = np.unique(
+            keys.ravel(), return_index=True, return_inverse=True
+        )
+        buckets[:, band] = first[inverse.ravel()]
+    return buckets
+
+
+def get_lsh_edges(buckets: np.ndarray) -> Iterable[Tuple[int, int]]:
+    """
+    Connect every parenthetical to the first parenthetical of each of its
+    buckets. That's far fewer edges than connecting every pair of similar
+    parentheticals, but gives the same connected components.
+
+    :param buckets: The matrix from get_lsh_buckets
+    :return: An iterable of pairs of parenthetical indexes
+    """
+    nodes, bands = np.nonzero(buckets != np.arange(len(buckets))[:, None])
+    return zip(nodes.tolist(), buckets[nodes, bands].tolist())
 
 
-def get_similarity_graph(
-    parenthetical_minhashes: Dict[str, MinHash], similarity_index: MinHashLSH
-) -> Graph:
+def get_components(
+    num_nodes: int, edges: Iterable[Tuple[int, int]]
+) -> List[List[int]]:
     """
-    From the MinHashLSH index, create a dictionary representation of a graph
-    where the nodes represent parentheticals and the edges represent that
-    two nodes are sufficiently similar to each other to be clustered into
-    the same group.
-
-    :param parenthetical_minhashes: A dictionary mapping parenthetical IDs to
-    the MinHash object corresponding to the parenthetical's text's tokens
-    :param similarity_index: The MinHashLSH data structure containing all of
-    the MinHash's that we can query
-    :return: A dictionary representation of a graph/network where the nodes/keys
-    are parenthetical IDs and the neighbors/values are the other parentheticals
-    above the defined similarity threshold.
+    Find the connected components of a graph with an iterative union-find:
+    https://en.wikipedia.org/wiki/Disjoint-set_data_structure
+
+    :param num_nodes: The number of nodes in the graph, numbered from 0
+    :param edges: An iterable of pairs of connected nodes
+    :return: A list of components, each a list of nodes. Components are
+    ordered by their first node, and the nodes in them are in order.
     """
-    similarity_graph: Graph = {}
-    for par_key, mhash in parenthetical_minhashes.items():
-        similarity_graph[par_key] = similarity_index.query(mhash)
-    return similarity_graph
+    parent = list(range(num_nodes))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            # Path halving keeps the trees flat.
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
 
+    for a, b in edges:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
 
-def get_graph_component(
-    node: str, graph: Graph, visited: Set[str]
-) -> List[str]:
+    components: Dict[int, List[int]] = {}
+    for node in range(num_nodes):
+        components.setdefault(find(node), []).append(node)
+    return list(components.values())
+
+
+def get_neighbor_counts(
+    indexes: List[int], buckets: np.ndarray
+) -> Dict[int, int]:
     """
-    From a given starting node, find the list of nodes connected to it either
-    directly or indirectly. In graph theory terms, this is a "connected
-    component": https://www.geeksforgeeks.org/connected-components-in-an-undirected-graph/
-
-    :param node: The starting node from which to probe the component
-    :param graph: A dictionary encoding the graph with key: node and value:
-    list of neighbors
-    :param visited: A set containing the nodes already visited in the DFS
-    :return: A list of all nodes in param :node's component
+    Count the parentheticals that share a bucket with each of the given
+    parentheticals, including themselves.
+
+    :param indexes: The indexes of the parentheticals to count neighbors for
+    :param buckets: The matrix from get_lsh_buckets
+    :return: A dict mapping each index to its number of neighbors
     """
-    current_cluster = []
-    # Perform a depth-first search to find all nodes in the component
-    if node not in visited:
-        visited.add(node)
-        current_cluster.append(node)
-        for neighbor in graph[node]:
-            current_cluster.extend(
-                get_graph_component(neighbor, graph, visited)
+    # Sort each band by bucket, so that the members of a bucket are a slice.
+    order = np.argsort(buckets, axis=0, kind="stable")
+    sorted_buckets = np.take_along_axis(buckets, order, axis=0)
+    starts = np.empty_like(buckets)
+    ends = np.empty_like(buckets)
+    for band in range(buckets.shape[1]):
+        starts[:, band] = np.searchsorted(
+            sorted_buckets[:, band], buckets[:, band], side="left"
+        )
+        ends[:, band] = np.searchsorted(
+            sorted_buckets[:, band], buckets[:, band], side="right"
+        )
+    alone = (ends - starts).max(axis=1) == 1
+
+    counts: Dict[int, int] = {}
+    # Parentheticals in the same buckets have the same neighbors. This saves a
+    # lot of work when a case is described the same way over and over.
+    counts_by_buckets: Dict[bytes, int] = {}
+    for i in indexes:
+        if alone[i]:
+            counts[i] = 1
+            continue
+        key = buckets[i].tobytes()
+        if key not in counts_by_buckets:
+            members = np.concatenate(
+                [
+                    order[starts[i, band] : ends[i, band], band]
+                    for band in range(buckets.shape[1])
+                ]
             )
-    return current_cluster
+            counts_by_buckets[key] = len(np.unique(members))
+        counts[i] = counts_by_buckets[key]
+    return counts
 
 
 def get_group_from_component(
-    component: List[str],
-    parenthetical_objects: Dict[str, Parenthetical],
-    similarity_graph: Graph,
+    pars_in_group: List[Parenthetical],
+    total_count: int,
+    neighbor_counts: Dict[str, int],
 ) -> ComputedParentheticalGroup:
     """
-    Given a list of parenthetical IDs representing a component, create a
-    ComputedParentheticalGroup containing the corresponding parenthetical objects,
-    the most representative parenthetical from among the component, and
-    sort the parentheticals by their descriptiveness score.
-
-    :param component: A list of parenthetical IDs to turn into a ComputedParentheticalGroup
-    :param parenthetical_objects: A dictionary mapping parenthetical IDs to the
-    corresponding parenthetical objects
-    :param similarity_graph: A dictionary containing similarity relationships
-    between parentheticals
+    Given the parentheticals of a component, create a
+    ComputedParentheticalGroup containing them and the most representative
+    parenthetical from among the component.
+
+    :param pars_in_group: The parentheticals to turn into a ComputedParentheticalGroup, sorted by score, descending
+    :param total_count: The number of parentheticals being grouped
+    :param neighbor_counts: A dictionary mapping parenthetical IDs to their
+    number of neighbors
     :return: A ComputedParentheticalGroup corresponding to the given component
     """
-    pars_in_group = sorted(
-        (parenthetical_objects[par_id] for par_id in component),
-        key=lambda par: par.score,
-        reverse=True,
-    )
     # Score of the top-ranked parenthetical times the proportion of
     # total parentheticals in this group
-    group_score = pars_in_group[0].score * (
-        len(pars_in_group) / len(parenthetical_objects)
-    )
+    group_score = pars_in_group[0].score * (len(pars_in_group) / total_count)
     representative = get_representative_parenthetical(
-        pars_in_group, similarity_graph
+        pars_in_group, neighbor_counts
     )
     parenthetical_group = ComputedParentheticalGroup(
         parentheticals=pars_in_group,
@@ -220,8 +347,13 @@ def get_group_from_component(
 BEST_PARENTHETICAL_SEARCH_THRESHOLD = 0.2
 
 
+def get_representative_search_size(parentheticals: List) -> int:
+    """The number of top-scored parentheticals to pick a representative from"""
+    return ceil(len(parentheticals) * BEST_PARENTHETICAL_SEARCH_THRESHOLD)
+
+
 def get_representative_parenthetical(
-    parentheticals: List[Parenthetical], similarity_graph: Graph
+    parentheticals: List[Parenthetical], neighbor_counts: Dict[str, int]
 ) -> Parenthetical:
     """
     Takes a list of parentheticals sorted by score and returns the parenthetical
@@ -229,17 +361,16 @@ def get_representative_parenthetical(
     (as determined by its number of neighbors)
 
     :param parentheticals: A list of parentheticals sorted by score, descending
-    :param similarity_graph: A dictionary encoding the graph with key: node and value:
-    list of neighbors
+    :param neighbor_counts: A dictionary mapping parenthetical IDs to their
+    number of neighbors. Only the top 20% of parentheticals need to be in it.
     :return: A Parenthetical object of the best parenthetical in the group
     """
-    num_parentheticals_to_consider = ceil(
-        len(parentheticals) * BEST_PARENTHETICAL_SEARCH_THRESHOLD
+    num_parentheticals_to_consider = get_representative_search_size(
+        parentheticals
     )
     return max(
         parentheticals[:num_parentheticals_to_consider],
-        # The number of neighbors each parenthetical has
-        key=lambda par: len(similarity_graph[str(par.id)]),
+        key=lambda par: neighbor_counts[str(par.id)],
     )
 
 
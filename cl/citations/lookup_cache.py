@@ -0,0 +1,180 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from django.conf import settings
+from redis import RedisError
+
+from cl.lib.redis_utils import make_redis_interface
+
+# A lookup is the (volume, reporter, page) of a citation plus the first and
+# last years it could have been filed in and its court ("" for any court).
+CitationLookup = Tuple[Tuple[int, str, str], int, int, str]
+
+STATS_KEY = "citation.lookup.stats"
+
+
+class CitationLookupCache:
+    """A bounded, in-process LRU cache of the opinions that a citation could
+    refer to, with an optional Redis tier shared by every worker.
+
+    The cached values are the candidate opinion IDs *before* self-cites are
+    eliminated, so that one entry can serve every citing opinion. Callers are
+    responsible for removing the citing opinion from the candidates.
+
+    A cached entry misses the opinions added after it was cached, so the
+    cache is only used by bulk runs over the existing corpus, where that
+    doesn't matter, and not when citations are matched as opinions come in.
+    Entries also expire after a TTL so that long-lived workers eventually
+    notice newly added opinions.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: int,
+        redis_timeout: int = 0,
+    ):
+        """
+        :param max_size: The maximum number of lookups to keep in memory.
+        :param ttl: The number of seconds an entry stays valid in memory.
+        :param redis_timeout: The number of seconds an entry stays in Redis.
+        Use 0 to disable the Redis tier.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_timeout = redis_timeout
+        self._data: OrderedDict[
+            Hashable, Tuple[float, List[int]]
+        ] = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def make_redis_key(lookup: CitationLookup) -> str:
+        (volume, reporter, page), start_year, end_year, court = lookup
+        return (
+            f"citation.lookup:{volume}|{reporter}|{page}|"
+            f"{start_year}|{end_year}|{court}"
+        )
+
+    def get_many(
+        self, lookups: Iterable[CitationLookup]
+    ) -> Dict[CitationLookup, List[int]]:
+        """Get the cached candidates for many lookups.
+
+        :param lookups: The lookups to get.
+        :return: A dict of the lookups that were found and their candidates.
+        Misses are left out.
+        """
+        found = {}
+        not_in_memory = []
+        now = time.monotonic()
+        for lookup in set(lookups):
+            entry = self._data.get(lookup)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(lookup)
+                found[lookup] = entry[1]
+                self.hits += 1
+            else:
+                not_in_memory.append(lookup)
+
+        if not_in_memory and self.redis_timeout:
+            try:
+                r = make_redis_interface("CACHE")
+                values = r.mget(
+                    [self.make_redis_key(lookup) for lookup in not_in_memory]
+                )
+            except RedisError:
+                values = [None] * len(not_in_memory)
+            for lookup, value in zip(not_in_memory, values):
+                if value is None:
+                    self.misses += 1
+                    continue
+                found[lookup] = json.loads(value)
+                self._set_local(lookup, found[lookup], now)
+                self.redis_hits += 1
+        else:
+            self.misses += len(not_in_memory)
+        return found
+
+    def set_many(self, candidates: Dict[CitationLookup, List[int]]) -> None:
+        """Cache the candidates of many lookups.
+
+        :param candidates: A dict of lookups and their candidate opinion IDs.
+        :return: None
+        """
+        now = time.monotonic()
+        for lookup, pks in candidates.items():
+            self._set_local(lookup, pks, now)
+
+        if candidates and self.redis_timeout:
+            try:
+                pipe = make_redis_interface("CACHE").pipeline()
+                for lookup, pks in candidates.items():
+                    pipe.set(
+                        self.make_redis_key(lookup),
+                        json.dumps(pks),
+                        ex=self.redis_timeout,
+                    )
+                pipe.execute()
+            except RedisError:
+                pass
+
+    def _set_local(self, lookup: Hashable, pks: List[int], now: float) -> None:
+        self._data[lookup] = (now + self.ttl, pks)
+        self._data.move_to_end(lookup)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = self.redis_hits = self.misses = 0
+
+    def flush_stats(self) -> None:
+        """Add the hit and miss counters of this process to the totals in
+        Redis, so that they can be reported by whoever started the run, and
+        reset them.
+        """
+        if not any([self.hits, self.redis_hits, self.misses]):
+            return
+        try:
+            pipe = make_redis_interface("CACHE").pipeline()
+            pipe.hincrby(STATS_KEY, "hits", self.hits)
+            pipe.hincrby(STATS_KEY, "redis_hits", self.redis_hits)
+            pipe.hincrby(STATS_KEY, "misses", self.misses)
+            pipe.execute()
+        except RedisError:
+            return
+        self.hits = self.redis_hits = self.misses = 0
+
+
+def get_lookup_stats() -> Dict[str, int]:
+    """Get the hit and miss totals flushed by every process.
+
+    :return: A dict with hits, redis_hits and misses keys.
+    """
+    try:
+        stats = make_redis_interface("CACHE").hgetall(STATS_KEY)
+    except RedisError:
+        stats = {}
+    return {k: int(stats.get(k, 0)) for k in ["hits", "redis_hits", "misses"]}
+
+
+def reset_lookup_stats() -> None:
+    try:
+        make_redis_interface("CACHE").delete(STATS_KEY)
+    except RedisError:
+        pass
+
+
+citation_lookup_cache = CitationLookupCache(
+    max_size=settings.CITATION_LOOKUP_CACHE_SIZE,
+    ttl=settings.CITATION_LOOKUP_CACHE_TTL,
+    redis_timeout=settings.CITATION_LOOKUP_REDIS_TIMEOUT,
+)
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.core.management import CommandError, call_command
 from django.core.management.base import CommandParser
 
+from cl.citations.lookup_cache import get_lookup_stats, reset_lookup_stats
 from cl.citations.tasks import (
     find_citations_and_parentheticals_for_opinion_by_pks,
 )
@@ -139,6 +140,8 @@ class Command(VerboseCommand):
         self.count = query.count()
         self.average_per_s = 0.0
         self.timings: List[float] = []
+        reset_lookup_stats()
+        self.lookup_stats = get_lookup_stats()
         opinion_pks = query.values_list("pk", flat=True).iterator()
         self.update_documents(opinion_pks, cast(str, options["queue"]))
         self.add_to_solr(cast(str, options["queue"]))
@@ -152,9 +155,15 @@ class Command(VerboseCommand):
             self.average_per_s = 1000 / (
                 sum(self.timings) / float(len(self.timings))
             )
+            # The workers flush their counters to Redis, so only check them
+            # once in a while.
+            self.lookup_stats = get_lookup_stats()
+        hits = self.lookup_stats["hits"] + self.lookup_stats["redis_hits"]
+        lookups = hits + self.lookup_stats["misses"]
         template = (
             "\rProcessing items in Celery queue: {:.0%} ({}/{}, "
-            "{:.1f}/s, Last id: {})"
+            "{:.1f}/s, Last id: {}, Lookup cache: {} hits, {} from Redis, "
+            "{} misses, {:.0%} hit rate)"
         )
         sys.stdout.write(
             template.format(
@@ -163,6 +172,10 @@ class Command(VerboseCommand):
                 self.count,
                 self.average_per_s,
                 last_pk,
+                self.lookup_stats["hits"],
+                self.lookup_stats["redis_hits"],
+                self.lookup_stats["misses"],
+                hits / lookups if lookups else 0.0,
             )
         )
         sys.stdout.flush()
@@ -186,7 +199,7 @@ class Command(VerboseCommand):
             chunk.append(opinion_pk)
             if processed_count % chunk_size == 0 or last_item:
                 find_citations_and_parentheticals_for_opinion_by_pks.apply_async(
-                    args=(chunk, index_during_subtask),
+                    args=(chunk, index_during_subtask, True),
                     queue=queue_name,
                 )
                 chunk = []
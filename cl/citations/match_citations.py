@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 
+from collections import defaultdict
 from datetime import date, datetime
 from typing import Dict, Iterable, List, Optional, Tuple
 
 from django.conf import settings
+from django.db.models import Q
 from eyecite import resolve_citations
 from eyecite.models import (
     CitationBase,
@@ -18,20 +20,28 @@ from eyecite.test_factories import case_citation
 from eyecite.utils import strip_punct
 from scorched.response import SolrResponse
 
+from cl.citations.lookup_cache import CitationLookup, citation_lookup_cache
 from cl.custom_filters.templatetags.text_filters import best_case_name
-from cl.lib.scorched_utils import ExtraSolrInterface, ExtraSolrSearch
+from cl.lib.scorched_utils import (
+    ExtraSolrInterface,
+    ExtraSolrSearch,
+    get_shared_solr_interface,
+)
 from cl.lib.types import (
     MatchedResourceType,
     ResolvedFullCites,
     SearchParam,
     SupportedCitationType,
 )
-from cl.search.models import Opinion
+from cl.search.models import PRECEDENTIAL_STATUS, Citation, Opinion
 
 DEBUG = True
 
 QUERY_LENGTH = 10
 
+# The number of (volume, reporter, page) lookups to OR together per query.
+CITATION_LOOKUP_BATCH_SIZE = 500
+
 NO_MATCH_RESOURCE = Resource(case_citation(source_text="UNMATCHED_CITATION"))
 
 
@@ -121,6 +131,28 @@ def get_years_from_reporter(
     return start_year, end_year
 
 
+def get_citation_year_range(
+    full_citation: FullCaseCitation,
+) -> Tuple[int, int]:
+    """Get the range of years in which the cited case could have been filed.
+
+    :param full_citation: The citation, with its citing_opinion attribute set.
+    :return: A tuple of the first and last possible years.
+    """
+    if full_citation.year:
+        return full_citation.year, full_citation.year
+
+    start_year, end_year = get_years_from_reporter(full_citation)
+    if (
+        full_citation.citing_opinion is not None
+        and full_citation.citing_opinion.cluster.date_filed
+    ):
+        end_year = min(
+            end_year, full_citation.citing_opinion.cluster.date_filed.year
+        )
+    return start_year, end_year
+
+
 def search_db_for_fullcitation(
     full_citation: FullCaseCitation,
 ) -> SolrResponse:
@@ -132,8 +164,7 @@ def search_db_for_fullcitation(
     if not hasattr(full_citation, "citing_opinion"):
         full_citation.citing_opinion = None
 
-    # TODO: Create shared solr connection for all queries
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    si = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     main_params: SearchParam = {
         "q": "*",
         "fq": [
@@ -145,17 +176,7 @@ def search_db_for_fullcitation(
         # Eliminate self-cites.
         main_params["fq"].append(f"-id:{full_citation.citing_opinion.pk}")
     # Set up filter parameters
-    if full_citation.year:
-        start_year = end_year = full_citation.year
-    else:
-        start_year, end_year = get_years_from_reporter(full_citation)
-        if (
-            full_citation.citing_opinion is not None
-            and full_citation.citing_opinion.cluster.date_filed
-        ):
-            end_year = min(
-                end_year, full_citation.citing_opinion.cluster.date_filed.year
-            )
+    start_year, end_year = get_citation_year_range(full_citation)
     main_params["fq"].append(
         f"dateFiled:{build_date_range(start_year, end_year)}"
     )
@@ -168,7 +189,6 @@ def search_db_for_fullcitation(
         f'citation:("{full_citation.corrected_citation()}")'
     )
     results = si.query().add_extra(**main_params).execute()
-    si.conn.http_connection.close()
     if len(results) == 1:
         return results
     if len(results) > 1:
@@ -233,6 +253,169 @@ def resolve_fullcase_citation(
     return NO_MATCH_RESOURCE
 
 
+def make_citation_key(
+    full_citation: FullCaseCitation,
+) -> Optional[Tuple[int, str, str]]:
+    """Make the (volume, reporter, page) key a citation would have in the
+    Citation table.
+
+    :param full_citation: The citation to look up.
+    :return: The key, or None if the citation can't be in the Citation table.
+    """
+    volume = full_citation.groups.get("volume")
+    page = full_citation.groups.get("page")
+    if not page or not volume or not volume.isdigit():
+        return None
+    if int(volume) > 32767:
+        # Too big for the SmallIntegerField
+        return None
+    return int(volume), full_citation.corrected_reporter(), page
+
+
+def lookup_citation_candidates(
+    lookups: Iterable[CitationLookup],
+) -> Dict[CitationLookup, List[int]]:
+    """Find the opinions that each lookup could refer to in the Citation
+    table, applying the same filters as search_db_for_fullcitation, except for
+    self-cites: precedential status, year range and court.
+
+    :param lookups: The lookups to find candidates for.
+    :return: A dict mapping every lookup to its candidate opinion IDs, which
+    may be empty.
+    """
+    lookups = list(lookups)
+    keys = list({key for key, _, _, _ in lookups})
+    clusters_by_key: Dict[Tuple[int, str, str], List[Dict]] = defaultdict(list)
+    for i in range(0, len(keys), CITATION_LOOKUP_BATCH_SIZE):
+        q = Q()
+        for volume, reporter, page in keys[i : i + CITATION_LOOKUP_BATCH_SIZE]:
+            q |= Q(volume=volume, reporter=reporter, page=page)
+        rows = (
+            Citation.objects.filter(q)
+            .filter(cluster__precedential_status=PRECEDENTIAL_STATUS.PUBLISHED)
+            .values(
+                "volume",
+                "reporter",
+                "page",
+                "cluster_id",
+                "cluster__date_filed",
+                "cluster__docket__court_id",
+            )
+        )
+        for row in rows:
+            key = (row["volume"], row["reporter"], row["page"])
+            clusters_by_key[key].append(row)
+
+    cluster_ids = {
+        row["cluster_id"] for rows in clusters_by_key.values() for row in rows
+    }
+    opinion_ids_by_cluster: Dict[int, List[int]] = defaultdict(list)
+    for pk, cluster_id in Opinion.objects.filter(
+        cluster_id__in=cluster_ids
+    ).values_list("pk", "cluster_id"):
+        opinion_ids_by_cluster[cluster_id].append(pk)
+
+    candidates: Dict[CitationLookup, List[int]] = {}
+    for lookup in lookups:
+        key, start_year, end_year, court_id = lookup
+        pks = []
+        for row in clusters_by_key.get(key, []):
+            date_filed = row["cluster__date_filed"]
+            if date_filed is None:
+                continue
+            if not start_year <= date_filed.year <= end_year:
+                continue
+            if court_id and row["cluster__docket__court_id"] != court_id:
+                continue
+            pks.extend(opinion_ids_by_cluster[row["cluster_id"]])
+        candidates[lookup] = sorted(pks)
+    return candidates
+
+
+def resolve_fullcase_citations(
+    full_citations: List[FullCaseCitation],
+    use_lookup_cache: bool = False,
+) -> Dict[int, MatchedResourceType]:
+    """Resolve many full case citations at once, possibly from many citing
+    opinions.
+
+    Instead of one Solr query per citation, every citation is looked up in
+    the Citation table with a few queries, and the same filters as
+    search_db_for_fullcitation are applied in memory: precedential status,
+    year range, court and self-cites. Citations that match more than one
+    opinion are disambiguated by their case name, using Solr, just like
+    resolve_fullcase_citation does. Citations that can't be in the Citation
+    table fall back to resolve_fullcase_citation.
+
+    During a corpus run, the candidates of each lookup can be memoized in
+    citation_lookup_cache, so that citations that are repeated across the
+    run only hit the DB once.
+
+    :param full_citations: A list of FullCaseCitation objects. If they have a
+    citing_opinion attribute, it's used to eliminate self-cites and to narrow
+    the year range.
+    :param use_lookup_cache: Whether to use citation_lookup_cache. It can
+    miss opinions added since a lookup was cached, so only bulk runs over
+    the existing corpus should use it.
+    :return: A dict mapping the id() of each citation to the Opinion it
+    resolved to, or to NO_MATCH_RESOURCE.
+    """
+    for c in full_citations:
+        if not hasattr(c, "citing_opinion"):
+            c.citing_opinion = None
+
+    lookups_by_citation: Dict[int, CitationLookup] = {}
+    for c in full_citations:
+        key = make_citation_key(c)
+        if key is None:
+            continue
+        start_year, end_year = get_citation_year_range(c)
+        lookups_by_citation[id(c)] = (
+            key,
+            start_year,
+            end_year,
+            c.metadata.court or "",
+        )
+
+    lookups = set(lookups_by_citation.values())
+    if use_lookup_cache:
+        candidates_by_lookup = citation_lookup_cache.get_many(lookups)
+        missing = lookups - candidates_by_lookup.keys()
+        if missing:
+            found = lookup_citation_candidates(missing)
+            citation_lookup_cache.set_many(found)
+            candidates_by_lookup.update(found)
+    else:
+        candidates_by_lookup = lookup_citation_candidates(lookups)
+
+    resolutions: Dict[int, MatchedResourceType] = {}
+    matched_ids: Dict[int, int] = {}
+    for c in full_citations:
+        lookup = lookups_by_citation.get(id(c))
+        if lookup is None:
+            resolutions[id(c)] = resolve_fullcase_citation(c)
+            continue
+
+        candidates = candidates_by_lookup[lookup]
+        if c.citing_opinion is not None:
+            # Eliminate self-cites. The cache is shared by every citing
+            # opinion, so this can't be done before caching.
+            candidates = [pk for pk in candidates if pk != c.citing_opinion.pk]
+
+        if len(candidates) == 1:
+            matched_ids[id(c)] = candidates[0]
+        elif len(candidates) > 1 and c.citing_opinion and c.metadata.defendant:
+            # Refine using the defendant, like search_db_for_fullcitation.
+            resolutions[id(c)] = resolve_fullcase_citation(c)
+        else:
+            resolutions[id(c)] = NO_MATCH_RESOURCE
+
+    opinions = Opinion.objects.in_bulk(set(matched_ids.values()))
+    for citation_id, opinion_id in matched_ids.items():
+        resolutions[citation_id] = opinions.get(opinion_id, NO_MATCH_RESOURCE)
+    return resolutions
+
+
 def resolve_shortcase_citation(
     short_citation: ShortCaseCitation,
     resolved_full_cites: ResolvedFullCites,
@@ -276,17 +459,41 @@ def resolve_supra_citation(
 
 
 def do_resolve_citations(
-    citations: List[CitationBase], citing_opinion: Opinion
+    citations: List[CitationBase],
+    citing_opinion: Opinion,
+    full_citation_resolutions: Optional[Dict[int, MatchedResourceType]] = None,
 ) -> Dict[MatchedResourceType, List[SupportedCitationType]]:
+    """Resolve the citations found in an opinion.
+
+    :param citations: The citations found in the citing opinion.
+    :param citing_opinion: The opinion the citations were found in.
+    :param full_citation_resolutions: The output of resolve_fullcase_citations
+    for the full case citations, if the caller resolved them already, for
+    example for a whole chunk of opinions at once.
+    :return: A dict mapping each resolved resource to its citations.
+    """
     # Set the citing opinion on FullCaseCitation objects for later matching
     for c in citations:
         if type(c) is FullCaseCitation:
             c.citing_opinion = citing_opinion
 
+    if full_citation_resolutions is None:
+        full_citation_resolutions = resolve_fullcase_citations(
+            [c for c in citations if type(c) is FullCaseCitation]
+        )
+
+    def resolve_full_citation(
+        full_citation: FullCaseCitation,
+    ) -> MatchedResourceType:
+        try:
+            return full_citation_resolutions[id(full_citation)]
+        except KeyError:
+            return resolve_fullcase_citation(full_citation)
+
     # Call and return eyecite's resolve_citations() function
     return resolve_citations(
         citations=citations,
-        resolve_full_citation=resolve_fullcase_citation,
+        resolve_full_citation=resolve_full_citation,
         resolve_shortcase_citation=resolve_shortcase_citation,
         resolve_supra_citation=resolve_supra_citation,
     )
@@ -1,8 +1,11 @@
 from django.db import transaction
 from django.db.models import QuerySet
 
-from cl.citations.group_parentheticals import compute_parenthetical_groups
-from cl.search.models import OpinionCluster, ParentheticalGroup
+from cl.citations.group_parentheticals import (
+    compute_parenthetical_groups,
+    get_minhash_signatures,
+)
+from cl.search.models import OpinionCluster, Parenthetical, ParentheticalGroup
 
 
 def get_or_create_parenthetical_groups(
@@ -29,6 +32,14 @@ def create_parenthetical_groups(cluster: OpinionCluster) -> None:
     :param cluster: An OpinionCluster object
     """
     parentheticals = list(cluster.parentheticals)
+    # Parentheticals created before signatures were stored don't have one yet.
+    # Compute those in batch and store them so that they're only hashed once.
+    missing = [par for par in parentheticals if par.minhash is None]
+    if missing:
+        get_minhash_signatures(missing)
+        Parenthetical.objects.bulk_update(
+            missing, ["minhash"], batch_size=1000
+        )
     computed_groups = compute_parenthetical_groups(parentheticals)
     # Delete existing parenthetical groups for this cluster
     cluster.parenthetical_groups.delete()
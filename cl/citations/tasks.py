@@ -1,10 +1,12 @@
+from collections import Counter, defaultdict
 from http.client import ResponseNotReady
 from typing import Dict, List, Set, Tuple
 
 from django.db import transaction
 from django.db.models import F
+from django.utils import timezone
 from eyecite import get_citations
-from eyecite.models import CitationBase
+from eyecite.models import CitationBase, FullCaseCitation
 
 from cl.celery_init import app
 from cl.citations.annotate_citations import (
@@ -15,9 +17,12 @@ from cl.citations.filter_parentheticals import (
     clean_parenthetical_text,
     is_parenthetical_descriptive,
 )
+from cl.citations.group_parentheticals import get_minhash_signatures
+from cl.citations.lookup_cache import citation_lookup_cache
 from cl.citations.match_citations import (
     NO_MATCH_RESOURCE,
     do_resolve_citations,
+    resolve_fullcase_citations,
 )
 from cl.citations.parenthetical_utils import create_parenthetical_groups
 from cl.citations.score_parentheticals import parenthetical_score
@@ -79,14 +84,18 @@ def find_citations_and_parentheticals_for_opinion_by_pks(
     self,
     opinion_pks: List[int],
     index: bool = True,
+    use_lookup_cache: bool = False,
 ) -> None:
     """Find citations and authored parentheticals for search.Opinion objects.
 
     :param opinion_pks: An iterable of search.Opinion PKs
     :param index: Whether to add the item to Solr
+    :param use_lookup_cache: Whether to memoize the citation lookups in this
+    process, for bulk runs like cl_find_citations
     :return: None
     """
     opinions: List[Opinion] = Opinion.objects.filter(pk__in=opinion_pks)
+    citations_by_opinion: List[Tuple[Opinion, List[CitationBase]]] = []
     for opinion in opinions:
         # Memoize parsed versions of the opinion's text
         get_and_clean_opinion_text(opinion)
@@ -98,12 +107,45 @@ def find_citations_and_parentheticals_for_opinion_by_pks(
         if not citations:
             continue
 
+        for c in citations:
+            if type(c) is FullCaseCitation:
+                c.citing_opinion = opinion
+        citations_by_opinion.append((opinion, citations))
+
+    # Look up the full citations of every opinion in the chunk at once.
+    try:
+        full_citation_resolutions = resolve_fullcase_citations(
+            [
+                c
+                for _, citations in citations_by_opinion
+                for c in citations
+                if type(c) is FullCaseCitation
+            ],
+            use_lookup_cache=use_lookup_cache,
+        )
+    except ResponseNotReady as e:
+        # Threading problem in httplib, which is used in the Solr query.
+        raise self.retry(exc=e, countdown=2)
+    finally:
+        if use_lookup_cache:
+            # Report this chunk's cache hits and misses to cl_find_citations.
+            citation_lookup_cache.flush_stats()
+
+    opinions_to_save: List[Opinion] = []
+    resolutions_by_opinion: Dict[
+        int, Dict[Opinion, List[SupportedCitationType]]
+    ] = {}
+    parentheticals: List[Parenthetical] = []
+    clusters_to_update_par_groups_for = set()
+    for opinion, citations in citations_by_opinion:
         # Resolve all those different citation objects to Opinion objects,
         # using a variety of heuristics.
         try:
             citation_resolutions: Dict[
                 MatchedResourceType, List[SupportedCitationType]
-            ] = do_resolve_citations(citations, opinion)
+            ] = do_resolve_citations(
+                citations, opinion, full_citation_resolutions
+            )
         except ResponseNotReady as e:
             # Threading problem in httplib, which is used in the Solr query.
             raise self.retry(exc=e, countdown=2)
@@ -112,24 +154,12 @@ def find_citations_and_parentheticals_for_opinion_by_pks(
         opinion.html_with_citations = create_cited_html(
             opinion, citation_resolutions
         )
+        opinions_to_save.append(opinion)
 
         # Delete the unmatched citations
         citation_resolutions.pop(NO_MATCH_RESOURCE, None)
+        resolutions_by_opinion[opinion.pk] = citation_resolutions
 
-        # Increase the citation count for the cluster of each matched opinion
-        # if that cluster has not already been cited by this opinion. First,
-        # calculate a list of the IDs of every opinion whose cluster will need
-        # updating.
-        all_cited_opinions = opinion.opinions_cited.all().values_list(
-            "pk", flat=True
-        )
-        opinion_ids_to_update = set()
-        for _opinion in citation_resolutions.keys():
-            if _opinion.pk not in all_cited_opinions:
-                opinion_ids_to_update.add(_opinion.pk)
-
-        clusters_to_update_par_groups_for = set()
-        parentheticals: List[Parenthetical] = []
         for _opinion, _citations in citation_resolutions.items():
             # Currently, eyecite has a bug where parallel citations are
             # detected individually. We avoid creating duplicate parentheticals
@@ -155,53 +185,132 @@ def find_citations_and_parentheticals_for_opinion_by_pks(
                         )
                     )
 
-        # Finally, commit these changes to the database in a single
-        # transcation block. Trigger a single Solr update as well, if
-        # required.
-        with transaction.atomic():
-            opinion_clusters_to_update = OpinionCluster.objects.filter(
-                sub_opinions__pk__in=opinion_ids_to_update
-            )
-            opinion_clusters_to_update.update(
-                citation_count=F("citation_count") + 1
-            )
-            if index:
-                add_items_to_solr.delay(
-                    opinion_clusters_to_update.values_list("pk", flat=True),
-                    "search.OpinionCluster",
-                )
-
-            # Nuke existing citations and parentheticals
-            OpinionsCited.objects.filter(citing_opinion_id=opinion.pk).delete()
-            Parenthetical.objects.filter(
-                describing_opinion_id=opinion.pk
-            ).delete()
-
-            # Create the new ones.
-            OpinionsCited.objects.bulk_create(
-                [
-                    OpinionsCited(
-                        citing_opinion_id=opinion.pk,
-                        cited_opinion_id=_opinion.pk,
-                        depth=len(_citations),
-                    )
-                    for _opinion, _citations in citation_resolutions.items()
-                ]
-            )
-
-            Parenthetical.objects.bulk_create(parentheticals)
+    # Store the signatures used to group parentheticals, so that they
+    # aren't computed again every time the cited cluster is regrouped.
+    get_minhash_signatures(parentheticals)
 
-            # Update parenthetical groups for clusters that we have added
-            # parentheticals for from this opinion
-            for cluster_id in clusters_to_update_par_groups_for:
-                create_parenthetical_groups(
-                    OpinionCluster.objects.get(pk=cluster_id)
-                )
-
-            # Save all the changes to the citing opinion (send to solr later)
-            opinion.save(index=False)
+    store_citations_and_parentheticals(
+        opinions_to_save,
+        resolutions_by_opinion,
+        parentheticals,
+        clusters_to_update_par_groups_for,
+        index,
+    )
 
     # If a Solr update was requested, do a single one at the end with all the
     # pks of the passed opinions
     if index:
         add_items_to_solr.delay(opinion_pks, "search.Opinion")
+
+
+def store_citations_and_parentheticals(
+    opinions: List[Opinion],
+    resolutions_by_opinion: Dict[
+        int, Dict[Opinion, List[SupportedCitationType]]
+    ],
+    parentheticals: List[Parenthetical],
+    clusters_to_update_par_groups_for: Set[int],
+    index: bool,
+) -> None:
+    """Save the citations and parentheticals found in a chunk of opinions, in
+    a single transaction and with a handful of queries for the whole chunk.
+
+    The new citations are diffed against the existing OpinionsCited rows of
+    the citing opinions, so that rows that didn't change are left alone.
+
+    :param opinions: The citing opinions, with their new html_with_citations.
+    :param resolutions_by_opinion: A dict mapping the ID of each citing
+    opinion to a dict of the opinions it cites and the citations to them.
+    :param parentheticals: The new parentheticals of the citing opinions.
+    :param clusters_to_update_par_groups_for: The IDs of the clusters whose
+    parenthetical groups need to be recomputed.
+    :param index: Whether to update the cited clusters in Solr.
+    :return: None
+    """
+    citing_pks = [opinion.pk for opinion in opinions]
+    new_depths: Dict[Tuple[int, int], int] = {}
+    cluster_ids_by_opinion: Dict[int, int] = {}
+    for citing_pk, resolutions in resolutions_by_opinion.items():
+        for _opinion, _citations in resolutions.items():
+            new_depths[(citing_pk, _opinion.pk)] = len(_citations)
+            cluster_ids_by_opinion[_opinion.pk] = _opinion.cluster_id
+
+    old_edges: Dict[Tuple[int, int], Tuple[int, int]] = {
+        (citing_id, cited_id): (pk, depth)
+        for pk, citing_id, cited_id, depth in OpinionsCited.objects.filter(
+            citing_opinion_id__in=citing_pks
+        ).values_list("pk", "citing_opinion_id", "cited_opinion_id", "depth")
+    }
+
+    # Increase the citation count of the cluster of each matched opinion by
+    # one for every citing opinion that didn't already cite it. Clusters that
+    # go up by the same amount are updated together.
+    newly_cited_clusters = {
+        (citing_pk, cluster_ids_by_opinion[cited_pk])
+        for citing_pk, cited_pk in new_depths
+        if (citing_pk, cited_pk) not in old_edges
+    }
+    increments = Counter(cluster_id for _, cluster_id in newly_cited_clusters)
+    clusters_by_increment: Dict[int, List[int]] = defaultdict(list)
+    for cluster_id, increment in increments.items():
+        clusters_by_increment[increment].append(cluster_id)
+
+    edges_to_delete = [
+        pk for edge, (pk, _) in old_edges.items() if edge not in new_depths
+    ]
+    edges_to_update = [
+        OpinionsCited(
+            pk=pk,
+            citing_opinion_id=edge[0],
+            cited_opinion_id=edge[1],
+            depth=new_depths[edge],
+        )
+        for edge, (pk, depth) in old_edges.items()
+        if edge in new_depths and new_depths[edge] != depth
+    ]
+    edges_to_create = [
+        OpinionsCited(
+            citing_opinion_id=citing_pk,
+            cited_opinion_id=cited_pk,
+            depth=depth,
+        )
+        for (citing_pk, cited_pk), depth in new_depths.items()
+        if (citing_pk, cited_pk) not in old_edges
+    ]
+
+    with transaction.atomic():
+        for increment, cluster_ids in clusters_by_increment.items():
+            OpinionCluster.objects.filter(pk__in=cluster_ids).update(
+                citation_count=F("citation_count") + increment
+            )
+
+        OpinionsCited.objects.filter(pk__in=edges_to_delete).delete()
+        OpinionsCited.objects.bulk_update(
+            edges_to_update, ["depth"], batch_size=1000
+        )
+        OpinionsCited.objects.bulk_create(edges_to_create, batch_size=1000)
+
+        # Nuke existing parentheticals and create the new ones.
+        Parenthetical.objects.filter(
+            describing_opinion_id__in=citing_pks
+        ).delete()
+        Parenthetical.objects.bulk_create(parentheticals, batch_size=1000)
+
+        # Update parenthetical groups for clusters that we have added
+        # parentheticals for from these opinions
+        for cluster_id in clusters_to_update_par_groups_for:
+            create_parenthetical_groups(
+                OpinionCluster.objects.get(pk=cluster_id)
+            )
+
+        # Save all the changes to the citing opinions (send to solr later).
+        # bulk_update doesn't touch auto_now fields, so do it by hand.
+        now = timezone.now()
+        for opinion in opinions:
+            opinion.date_modified = now
+        Opinion.objects.bulk_update(
+            opinions, ["html_with_citations", "date_modified"], batch_size=100
+        )
+
+    if index and increments:
+        add_items_to_solr.delay(list(increments), "search.OpinionCluster")
@@ -1,8 +1,8 @@
 import itertools
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, timedelta
-from typing import List, Tuple
-from unittest.mock import Mock
+from typing import List, Optional, Tuple
+from unittest.mock import Mock, patch
 
 from django.core.management import call_command
 from django.urls import reverse
@@ -17,6 +17,7 @@ from eyecite.test_factories import (
 )
 from factory import RelatedFactory
 from lxml import etree
+from redis import TimeoutError as RedisTimeoutError
 
 from cl.citations.annotate_citations import (
     create_cited_html,
@@ -29,10 +30,16 @@ from cl.citations.filter_parentheticals import (
 from cl.citations.group_parentheticals import (
     ComputedParentheticalGroup,
     compute_parenthetical_groups,
-    get_graph_component,
+    get_components,
+    get_minhash_signatures,
     get_parenthetical_tokens,
     get_representative_parenthetical,
 )
+from cl.citations.lookup_cache import (
+    CitationLookupCache,
+    citation_lookup_cache,
+    get_lookup_stats,
+)
 from cl.citations.management.commands.cl_add_parallel_citations import (
     identify_parallel_citations,
     make_edge_list,
@@ -41,6 +48,7 @@ from cl.citations.match_citations import (
     NO_MATCH_RESOURCE,
     do_resolve_citations,
     resolve_fullcase_citation,
+    resolve_fullcase_citations,
 )
 from cl.citations.score_parentheticals import parenthetical_score
 from cl.citations.tasks import (
@@ -628,6 +636,53 @@ class CitationObjectTest(IndexedSolrTestCase):
         results = resolve_fullcase_citation(citation)
         self.assertEqual(NO_MATCH_RESOURCE, results)
 
+    def test_batch_citation_resolution(self) -> None:
+        """Does resolving citations in bulk give the same results as
+        resolving them one by one?"""
+        opinion5 = Opinion.objects.get(cluster__pk=self.citation5.cluster_id)
+        citations = get_citations(
+            "Foo v. Bar, 1 U.S. 1. Qwerty v. Uiop, 2 F.3d 2. Lorem v. Ipsum, "
+            "1 U.S. 50. Bush v. Gore, 123 U.S. 123. Nope v. Nope, 1 F. 9."
+        )
+        for c in citations:
+            c.citing_opinion = opinion5
+        batch_resolutions = resolve_fullcase_citations(
+            citations, use_lookup_cache=True
+        )
+        for c in citations:
+            with self.subTest(f"Resolving {c}...", citation=c):
+                self.assertEqual(
+                    batch_resolutions[id(c)], resolve_fullcase_citation(c)
+                )
+        # Bush v. Gore is the citing opinion; self-cites aren't matches.
+        self.assertEqual(
+            batch_resolutions[id(citations[3])], NO_MATCH_RESOURCE
+        )
+
+        # The second time around, the lookups come from the cache, but
+        # self-cites still depend on the citing opinion.
+        opinion1 = Opinion.objects.get(cluster__pk=self.citation1.cluster_id)
+        for c in citations:
+            c.citing_opinion = opinion1
+        hits = citation_lookup_cache.hits
+        batch_resolutions = resolve_fullcase_citations(
+            citations, use_lookup_cache=True
+        )
+        self.assertGreater(citation_lookup_cache.hits, hits)
+        for c in citations:
+            with self.subTest(f"Resolving {c} again...", citation=c):
+                self.assertEqual(
+                    batch_resolutions[id(c)], resolve_fullcase_citation(c)
+                )
+
+    def test_lookup_cache_is_opt_in(self) -> None:
+        """Do citations matched outside of a bulk run skip the lookup
+        cache?"""
+        citations = get_citations("Foo v. Bar, 1 U.S. 1.")
+        resolve_fullcase_citations(citations)
+        self.assertEqual(len(citation_lookup_cache), 0)
+        self.assertEqual(citation_lookup_cache.misses, 0)
+
     def test_citation_increment(self) -> None:
         """Make sure that found citations update the increment on the cited
         opinion's citation count"""
@@ -649,6 +704,40 @@ class CitationObjectTest(IndexedSolrTestCase):
             % (cited.cluster.citation_count, expected_count),
         )
 
+    def test_reprocessing_opinions(self) -> None:
+        """Does finding the citations of the same opinions again leave the
+        citation counts and the OpinionsCited rows alone?"""
+        opinion1 = Opinion.objects.get(cluster__pk=self.citation1.cluster_id)
+        opinion5 = Opinion.objects.get(cluster__pk=self.citation5.cluster_id)
+
+        find_citations_and_parentheticals_for_opinion_by_pks.delay(
+            [opinion1.pk, opinion5.pk]
+        )
+        cited_rows = set(
+            OpinionsCited.objects.values_list(
+                "pk", "citing_opinion_id", "cited_opinion_id", "depth"
+            )
+        )
+        counts = dict(
+            OpinionCluster.objects.values_list("pk", "citation_count")
+        )
+
+        find_citations_and_parentheticals_for_opinion_by_pks.delay(
+            [opinion1.pk, opinion5.pk]
+        )
+        self.assertEqual(
+            set(
+                OpinionsCited.objects.values_list(
+                    "pk", "citing_opinion_id", "cited_opinion_id", "depth"
+                )
+            ),
+            cited_rows,
+        )
+        self.assertEqual(
+            dict(OpinionCluster.objects.values_list("pk", "citation_count")),
+            counts,
+        )
+
     def test_opinionscited_creation(self) -> None:
         """Make sure that found citations are stored in the database as
         OpinionsCited objects with the appropriate references and depth.
@@ -880,6 +969,55 @@ class CitationCommandTest(IndexedSolrTestCase):
         self.call_command_and_test_it(args)
 
 
+class CitationLookupCacheTest(SimpleTestCase):
+    lookup_1 = ((1, "U.S.", "1"), 1750, 2022, "")
+    lookup_2 = ((2, "F.3d", "2"), 1750, 2022, "ca1")
+    lookup_3 = ((3, "F.", "9"), 1795, 1795, "")
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        """Is the least recently used lookup evicted when the cache is
+        full?"""
+        cache = CitationLookupCache(max_size=2, ttl=60)
+        cache.set_many({self.lookup_1: [1], self.lookup_2: [2, 3]})
+        # Use lookup_1 so that lookup_2 becomes the least recently used.
+        self.assertEqual(cache.get_many([self.lookup_1]), {self.lookup_1: [1]})
+        cache.set_many({self.lookup_3: []})
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(
+            cache.get_many([self.lookup_1, self.lookup_2, self.lookup_3]),
+            {self.lookup_1: [1], self.lookup_3: []},
+        )
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_expired_lookups_are_misses(self) -> None:
+        """Are lookups older than the TTL treated as misses?"""
+        cache = CitationLookupCache(max_size=2, ttl=0)
+        cache.set_many({self.lookup_1: [1]})
+        self.assertEqual(cache.get_many([self.lookup_1]), {})
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_redis_errors_fall_back_to_memory(self) -> None:
+        """Does a Redis error other than a connection error leave the
+        in-process tier working, instead of failing the lookup?"""
+        cache = CitationLookupCache(max_size=2, ttl=60, redis_timeout=60)
+        with patch(
+            "cl.citations.lookup_cache.make_redis_interface",
+            side_effect=RedisTimeoutError("Timed out"),
+        ):
+            cache.set_many({self.lookup_1: [1]})
+            self.assertEqual(
+                cache.get_many([self.lookup_1, self.lookup_2]),
+                {self.lookup_1: [1]},
+            )
+            # The stats are kept until they can be flushed.
+            cache.flush_stats()
+            self.assertEqual(
+                get_lookup_stats(), {"hits": 0, "redis_hits": 0, "misses": 0}
+            )
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
 class ParallelCitationTest(SimpleTestCase):
     databases = "__all__"
 
@@ -1226,7 +1364,7 @@ class DescriptionScoreTest(SimpleTestCase):
         return output
 
 
-@dataclass(frozen=True)
+@dataclass
 class DummyParenthetical:
     """
     A simple dummy version of the Parenthetical class that doesn't require
@@ -1237,6 +1375,7 @@ class DummyParenthetical:
     id: int
     text: str
     score: float
+    minhash: Optional[bytes] = field(default=None, compare=False)
 
     def __hash__(self):
         return self.id
@@ -1417,9 +1556,13 @@ class GroupParentheticalsTest(SimpleTestCase):
                 f"Testing that representative connected parenthetical is selected correctly.",
                 i=i,
             ):
+                neighbor_counts = {
+                    node: len(neighbors)
+                    for node, neighbors in simgraph_to_test.items()
+                }
                 self.assertEquals(
                     get_representative_parenthetical(
-                        parentheticals_to_test, simgraph_to_test
+                        parentheticals_to_test, neighbor_counts
                     ),
                     representative,
                     f"Got incorrect result from get_best_parenthetical_of_group for text (expected {representative}): {(parentheticals_to_test, simgraph_to_test)}",
@@ -1474,64 +1617,51 @@ class GroupParentheticalsTest(SimpleTestCase):
                     f"Got incorrect result from get_parnethetical_tokens for text (expected {tokens}): {parenthetical_text}",
                 )
 
-    def test_get_graph_component(self):
+    def test_get_components(self):
         """
-        Tests whether get_graph_component correctly identifies the full
-        "connected component" of a given node in the graph (i.e. a list of
-        itself plus any nodes directly or indirectly connected to it)
+        Tests whether get_components correctly identifies the "connected
+        components" of a graph (i.e. lists of nodes directly or indirectly
+        connected to each other)
         """
         test_pairs = [
-            (("1", {"1": []}, set()), ["1"]),
-            (("1", {"1": ["2"], "2": "1", "3": []}, set()), ["1", "2"]),
+            ((1, []), [[0]]),
+            ((3, [(0, 1), (1, 0)]), [[0, 1], [2]]),
             (
-                (
-                    "1",
-                    {
-                        "1": ["2", "3"],
-                        "2": "1",
-                        "3": ["1"],
-                        "4": ["5"],
-                        "5": ["4"],
-                    },
-                    set(),
-                ),
-                ["1", "2", "3"],
-            ),
-            (
-                (
-                    "2",
-                    {
-                        "1": ["2", "3"],
-                        "2": "1",
-                        "3": ["1"],
-                        "4": ["5"],
-                        "5": ["4"],
-                    },
-                    set(),
-                ),
-                ["1", "2", "3"],
-            ),
-            (
-                (
-                    "3",
-                    {
-                        "1": ["2", "3"],
-                        "2": "1",
-                        "3": ["1"],
-                        "4": ["5"],
-                        "5": ["4"],
-                    },
-                    set(),
-                ),
-                ["1", "2", "3"],
+                (5, [(0, 1), (0, 2), (1, 0), (2, 0), (3, 4), (4, 3)]),
+                [[0, 1, 2], [3, 4]],
             ),
+            ((5, [(4, 0), (3, 4), (1, 2)]), [[0, 3, 4], [1, 2]]),
         ]
         for i, (inputs, output) in enumerate(test_pairs):
             with self.subTest(
                 f"Testing {inputs} connections are recognized correctly.", i=i
             ):
                 self.assertEquals(
-                    sorted(get_graph_component(*inputs)),
-                    sorted(output),
-                    f"Got incorrect result from get_graph_component for inputs (expected {output}): {inputs}",
+                    get_components(*inputs),
+                    output,
+                    f"Got incorrect result from get_components for inputs (expected {output}): {inputs}",
                 )
+
+    def test_stored_signatures_are_reused(self):
+        """
+        Are the MinHash signatures stored on parentheticals used instead of
+        hashing their text again?
+        """
+        texts = [
+            "Holding that a prisoner must show an actual injury",
+            "Holding that a prisoner must show actual injury",
+        ]
+        parentheticals = [
+            DummyParenthetical(id=i, text=text, score=0)
+            for i, text in enumerate(texts)
+        ]
+        signatures = get_minhash_signatures(parentheticals)
+        self.assertEqual(signatures.shape, (2, 64))
+        self.assertTrue(all(par.minhash for par in parentheticals))
+
+        # Scramble the text. If the signatures are reused, nothing changes.
+        for par in parentheticals:
+            par.text = "Completely unrelated words about something else"
+        self.assertTrue(
+            (get_minhash_signatures(parentheticals) == signatures).all()
+        )
@@ -25,8 +25,21 @@ from cl.corpus_importer.management.commands.harvard_opinions import (
 from cl.corpus_importer.tasks import generate_ia_json
 from cl.corpus_importer.utils import get_start_of_quarter
 from cl.lib.pacer import process_docket_data
-from cl.people_db.lookup_utils import extract_judge_last_name
-from cl.people_db.models import Attorney, AttorneyOrganization, Party
+from cl.people_db.factories import PersonFactory, PositionFactory
+from cl.people_db.lookup_utils import (
+    JUDGE_NAME_INDEX_VERSION_CHECK_INTERVAL,
+    extract_judge_last_name,
+    judge_name_index,
+    lookup_judge_by_full_name,
+    lookup_judge_by_full_name_in_db,
+    lookup_judge_by_last_name,
+)
+from cl.people_db.models import (
+    GRANULARITY_DAY,
+    Attorney,
+    AttorneyOrganization,
+    Party,
+)
 from cl.recap.models import UPLOAD_TYPE
 from cl.search.factories import CourtFactory, DocketFactory
 from cl.search.models import (
@@ -57,6 +70,137 @@ class JudgeExtractionTest(SimpleTestCase):
             self.assertEqual(extract_judge_last_name(q), a)
 
 
+class JudgeLookupTest(TestCase):
+    def setUp(self) -> None:
+        self.court = CourtFactory()
+        self.ginsburg = self.make_judge(
+            "Ruth",
+            "Ginsburg",
+            [(date(1993, 8, 10), None)],
+            name_middle="Bader",
+            date_dod=date(2020, 9, 18),
+            date_granularity_dod=GRANULARITY_DAY,
+        )
+        PersonFactory(
+            is_alias_of=self.ginsburg,
+            name_first="Ruth",
+            name_last="Bader",
+            name_suffix="",
+        )
+        self.john_smith = self.make_judge(
+            "John", "Smith", [(date(2000, 1, 1), date(2010, 1, 1))]
+        )
+        self.jane_smith = self.make_judge(
+            "Jane", "Smith", [(date(2005, 1, 1), None)]
+        )
+        # Two positions in the same court count as two matches.
+        self.jones = self.make_judge(
+            "Tom",
+            "Jones",
+            [(date(1990, 1, 1), date(1995, 1, 1)), (date(1999, 1, 1), None)],
+        )
+        judge_name_index.clear()
+
+    def make_judge(self, name_first, name_last, positions, **kwargs):
+        person = PersonFactory(
+            name_first=name_first,
+            name_last=name_last,
+            name_suffix="",
+            **kwargs,
+        )
+        for date_start, date_termination in positions:
+            PositionFactory(
+                person=person,
+                court=self.court,
+                date_start=date_start,
+                date_granularity_start=GRANULARITY_DAY,
+                date_termination=date_termination,
+                date_granularity_termination=(
+                    GRANULARITY_DAY if date_termination else ""
+                ),
+            )
+        return person
+
+    def test_index_matches_db_lookup(self) -> None:
+        """Does the judge name index give the same answers as the DB?"""
+        tests = (
+            ("Ruth Bader Ginsburg", date(2000, 1, 1), self.ginsburg),
+            ("Ruth B. Ginsburg", date(2000, 1, 1), self.ginsburg),
+            ("ruth ginsburg", None, self.ginsburg),
+            ("Ruth Bader", date(2000, 1, 1), self.ginsburg),
+            ("Ruth Bader Ginsburg", date(2022, 1, 1), None),
+            ("Jane Smith", date(2008, 1, 1), self.jane_smith),
+            ("John Smith", date(2008, 1, 1), self.john_smith),
+            ("John Smith", date(2012, 1, 1), self.jane_smith),
+            ("Jim Smith", date(2008, 1, 1), None),
+            ("Tom Jones", None, None),
+            ("Tom Jones", date(2000, 1, 1), self.jones),
+            ("Tom Jones Jr.", None, None),
+            ("Nobody Here", date(2000, 1, 1), None),
+        )
+        for name, event_date, expected in tests:
+            with self.subTest(name=name, event_date=event_date):
+                judge = lookup_judge_by_full_name(
+                    name, self.court.pk, event_date
+                )
+                self.assertEqual(judge, expected)
+                self.assertEqual(
+                    judge,
+                    lookup_judge_by_full_name_in_db(
+                        name, self.court.pk, event_date
+                    ),
+                )
+        self.assertIsNone(
+            lookup_judge_by_last_name("Smith", self.court.pk, date(2008, 1, 1))
+        )
+        self.assertEqual(
+            lookup_judge_by_full_name(
+                "Ruth Ginsburg", self.court.pk, date(2022, 1, 1), False
+            ),
+            self.ginsburg,
+        )
+
+    def test_lookup_only_queries_the_judge(self) -> None:
+        """Once the index is loaded, is a lookup a single query?"""
+        lookup_judge_by_full_name("Jane Smith", self.court.pk)
+        with self.assertNumQueries(1):
+            judge = lookup_judge_by_full_name("John Smith", self.court.pk)
+        self.assertEqual(judge, self.john_smith)
+
+    def test_index_is_invalidated(self) -> None:
+        """Are changes to the positions picked up?"""
+        self.assertIsNone(
+            lookup_judge_by_full_name("Tom Jones", self.court.pk)
+        )
+        self.jones.positions.filter(date_start=date(1990, 1, 1)).delete()
+        self.assertEqual(
+            lookup_judge_by_full_name("Tom Jones", self.court.pk), self.jones
+        )
+
+    def test_version_is_checked_every_few_seconds(self) -> None:
+        """Is the version in Redis only read every few seconds, and are
+        changes made by other processes picked up once it is?"""
+        lookup_judge_by_full_name("Jane Smith", self.court.pk)
+        version = judge_name_index.version
+        with patch.object(
+            judge_name_index,
+            "get_version",
+            wraps=judge_name_index.get_version,
+        ) as get_version:
+            lookup_judge_by_full_name("Jane Smith", self.court.pk)
+            lookup_judge_by_full_name("John Smith", self.court.pk)
+            get_version.assert_not_called()
+
+            # Another process changed a position.
+            judge_name_index.bump_version()
+            judge_name_index.version_checked_at -= (
+                JUDGE_NAME_INDEX_VERSION_CHECK_INTERVAL
+            )
+            lookup_judge_by_full_name("Jane Smith", self.court.pk)
+            get_version.assert_called_once()
+        self.assertNotEqual(judge_name_index.version, version)
+
+
 class CourtMatchingTest(SimpleTestCase):
     """Tests related to converting court strings into court objects."""
 
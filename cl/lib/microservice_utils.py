@@ -1,11 +1,160 @@
+import io
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
 from django.conf import settings
 from django.db import models
+from redis import RedisError
 from requests import Request, Response, Session
 
 from cl.audio.models import Audio
+from cl.lib.redis_utils import make_redis_interface
 from cl.lib.search_utils import clean_up_recap_document_file
 from cl.search.models import Opinion, RECAPDocument
 
+logger = logging.getLogger(__name__)
+
+# The size of the blocks that uploads are read from storage in.
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+class MultipartFileStream:
+    """A multipart/form-data request body that reads its file as it's sent.
+
+    requests builds multipart bodies in memory, which for a big PDF or audio
+    file means holding it, and then a copy of it, in memory. This knows its
+    length ahead of time so that the request still gets a Content-Length.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        file: IO[bytes],
+        data: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param file_name: The name to send the file with.
+        :param file: A binary file object. It's read from the start.
+        :param data: Other form fields to send.
+        """
+        self.boundary = uuid.uuid4().hex
+        head = b""
+        for name, value in (data or {}).items():
+            head += (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode()
+        head += (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; '
+            f'filename="{os.path.basename(file_name)}"\r\n\r\n'
+        ).encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        file.seek(0, os.SEEK_END)
+        self.file_size = file.tell()
+        file.seek(0)
+        self._parts: List[IO[bytes]] = [
+            io.BytesIO(head),
+            file,
+            io.BytesIO(tail),
+        ]
+        self._length = len(head) + self.file_size + len(tail)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while chunk := self.read(UPLOAD_BLOCK_SIZE):
+            yield chunk
+
+
+_session_lock = threading.Lock()
+_session: Optional[Tuple[int, Session]] = None
+
+
+def get_microservice_session() -> Session:
+    """Get the keep-alive session of this process for calling microservices.
+
+    Sockets can't be shared between processes, so a forked Celery worker gets
+    its own session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None or _session[0] != os.getpid():
+            _session = (os.getpid(), Session())
+        return _session[1]
+
+
+def log_microservice_call(
+    service: str, ms: int, bytes_sent: int, bytes_received: int
+) -> None:
+    """Add a call to the daily stats of a microservice in Redis.
+
+    :param service: The service that was called.
+    :param ms: How long the call took, in milliseconds.
+    :param bytes_sent: The size of the request body.
+    :param bytes_received: The size of the response body.
+    :return: None
+    """
+    d = date.today().isoformat()
+    try:
+        pipe = make_redis_interface("STATS").pipeline()
+        pipe.zincrby(f"microservice.d:{d}.counts", 1, service)
+        pipe.zincrby(f"microservice.d:{d}.timings", ms, service)
+        pipe.zincrby(f"microservice.d:{d}.bytes_sent", bytes_sent, service)
+        pipe.zincrby(
+            f"microservice.d:{d}.bytes_received", bytes_received, service
+        )
+        pipe.execute()
+    except RedisError as e:
+        logger.warning("Unable to log microservice stats: %s", e)
+
+
+def get_microservice_stats(service: str, d: date) -> Dict[str, float]:
+    """Get the stats of a microservice for a day.
+
+    :param service: The service to get the stats of.
+    :param d: The day to get the stats of.
+    :return: A dict with the number of calls, their average time in
+    milliseconds and the total bytes sent and received.
+    """
+    d_str = d.isoformat()
+    pipe = make_redis_interface("STATS").pipeline()
+    for stat in ["counts", "timings", "bytes_sent", "bytes_received"]:
+        pipe.zscore(f"microservice.d:{d_str}.{stat}", service)
+    count, timings, bytes_sent, bytes_received = [
+        r or 0 for r in pipe.execute()
+    ]
+    return {
+        "count": count,
+        "avg_ms": timings / count if count else 0,
+        "bytes_sent": bytes_sent,
+        "bytes_received": bytes_received,
+    }
+
 
 def microservice(
     service: str,
@@ -25,6 +174,9 @@ def microservice(
     Because of the various ways our db is setup we have a few different params we use
     in this function.
 
+    Files are streamed to the service from storage rather than read into
+    memory, and the calls share a keep-alive session.
+
     :param service: The service to call
     :param method: The method to use (defaults to POST)
     :param item: The document as a db object
@@ -42,46 +194,62 @@ def microservice(
         method=method,
         url=services[service]["url"],  # type: ignore
     )
+    # The name and the binary file object to upload, if any.
+    upload: Optional[Tuple[str, IO[bytes]]] = None
     # Add file from filepath
     if filepath:
-        with open(filepath, "rb") as f:
-            req.files = {"file": (filepath, f.read())}
+        upload = (filepath, open(filepath, "rb"))
 
     # Handle our documents based on the type of model object
     # Sadly these are not uniform
     if item:
         if type(item) == RECAPDocument:
             try:
-                with item.filepath_local.open(mode="rb") as local_path:
-                    req.files = {
-                        "file": (item.filepath_local.name, local_path.read())
-                    }
+                upload = (
+                    item.filepath_local.name,
+                    item.filepath_local.open(mode="rb"),
+                )
             except FileNotFoundError:
                 # The file is no longer available, clean it up in DB
                 clean_up_recap_document_file(item)
         elif type(item) == Opinion:
-            with item.local_path.open(mode="rb") as local_path:
-                req.files = {"file": (item.local_path.name, local_path.read())}
+            upload = (item.local_path.name, item.local_path.open(mode="rb"))
         elif type(item) == Audio:
-            with item.local_path_original_file.open(mode="rb") as local_path:
-                req.files = {
-                    "file": (
-                        item.local_path_original_file.name,
-                        local_path.read(),
-                    )
-                }
+            upload = (
+                item.local_path_original_file.name,
+                item.local_path_original_file.open(mode="rb"),
+            )
     # Sometimes we will want to pass in a filename and the file bytes
     # to avoid writing them to disk. Filename can often be generic
     # and is used to identify the file extension for our microservices
     if file and file_type:
-        req.files = {"file": (f"dummy.{file_type}", file)}
+        upload = (f"dummy.{file_type}", io.BytesIO(file))
     elif file:
-        req.files = {"file": (f"filename", file)}
+        upload = ("filename", io.BytesIO(file))
 
-    if data:
+    if upload:
+        body = MultipartFileStream(upload[0], upload[1], data)
+        req.data = body
+        req.headers["Content-Type"] = body.content_type
+    elif data:
         req.data = data
 
     if params:
         req.params = params
 
-    return Session().send(req.prepare(), timeout=services[service]["timeout"])  # type: ignore
+    prepared = req.prepare()
+    t1 = time.monotonic()
+    try:
+        response = get_microservice_session().send(
+            prepared, timeout=services[service]["timeout"]  # type: ignore
+        )
+    finally:
+        if upload:
+            upload[1].close()
+    log_microservice_call(
+        service,
+        int((time.monotonic() - t1) * 1000),
+        len(prepared.body or b""),
+        len(response.content),
+    )
+    return response
@@ -1,6 +1,14 @@
+import os
+import threading
+from typing import Dict, Tuple, Type
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 from scorched import SolrInterface
 from scorched.exc import SolrError
 from scorched.search import Options, SolrSearch
+from urllib3.util.retry import Retry
 
 
 class ExtraSolrInterface(SolrInterface):
@@ -8,8 +16,6 @@ class ExtraSolrInterface(SolrInterface):
     class.
     """
 
-    hl_fields = None
-
     def __init__(self, *args, **kwargs):
         super(ExtraSolrInterface, self).__init__(*args, **kwargs)
 
@@ -33,8 +39,9 @@ class ExtraSolrInterface(SolrInterface):
 
         Build a solr MLT query
         """
-        self.hl_fields = hl_fields
+        # Interfaces are shared, so keep the fields on the search itself.
         q = MoreLikeThisHighlightsSolrSearch(self)
+        q.hl_fields = hl_fields
 
         if len(args) + len(kwargs) > 0:
             res = q.query(*args, **kwargs)
@@ -120,6 +127,12 @@ class MoreLikeThisHighlightsSolrSearch(ExtraSolrSearch):
 
     # Limit length of text field
     text_max_length = 500
+    hl_fields = None
+
+    def clone(self):
+        newself = super(MoreLikeThisHighlightsSolrSearch, self).clone()
+        newself.hl_fields = self.hl_fields
+        return newself
 
     def execute(self, constructor=None):
         """
@@ -140,7 +153,7 @@ class MoreLikeThisHighlightsSolrSearch(ExtraSolrSearch):
             doc["solr_highlights"] = {}
 
             # Copy each highlight field
-            for field_name in self.interface.hl_fields:
+            for field_name in self.hl_fields:
                 if field_name in doc:
                     if field_name == "text":  # max text length
                         doc[field_name] = doc[field_name][
@@ -153,3 +166,101 @@ class MoreLikeThisHighlightsSolrSearch(ExtraSolrSearch):
             ret = self.constructor(ret, constructor)
 
         return ret
+
+
+class SolrSession(requests.Session):
+    """A requests session that applies a default timeout to every request.
+
+    Scorched doesn't pass a timeout for most of its requests, so without this a
+    hung Solr core would hang its caller forever.
+    """
+
+    def __init__(self, timeout: float | Tuple[float, float]):
+        super(SolrSession, self).__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super(SolrSession, self).request(*args, **kwargs)
+
+
+_solr_lock = threading.Lock()
+_solr_pid = os.getpid()
+_solr_sessions: Dict[str, SolrSession] = {}
+_solr_interfaces: Dict[
+    Tuple[str, str, Type[SolrInterface]], SolrInterface
+] = {}
+
+
+def _reset_after_fork() -> None:
+    """Forget the connections inherited from a parent process.
+
+    Sockets can't be shared between processes, so a forked Celery worker has
+    to open its own. The parent's sessions are dropped without closing them,
+    since closing them would close the parent's sockets too.
+    """
+    global _solr_pid
+    if _solr_pid != os.getpid():
+        _solr_sessions.clear()
+        _solr_interfaces.clear()
+        _solr_pid = os.getpid()
+
+
+def make_solr_session(url: str) -> SolrSession:
+    """Make a keep-alive session for a Solr core, with the timeout and the
+    retry policy from the settings.
+
+    :param url: The URL of the Solr core.
+    :return: A new session.
+    """
+    session = SolrSession(
+        settings.SOLR_TIMEOUTS.get(url, settings.SOLR_DEFAULT_TIMEOUT)
+    )
+    retries = Retry(
+        total=settings.SOLR_MAX_RETRIES,
+        backoff_factor=settings.SOLR_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        # Solr updates are keyed by ID, so POSTs are safe to retry too.
+        allowed_methods=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_maxsize=settings.SOLR_POOL_MAXSIZE, max_retries=retries
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_shared_solr_interface(
+    url: str,
+    mode: str = "r",
+    interface_class: Type[SolrInterface] | None = None,
+) -> SolrInterface:
+    """Get the shared Solr interface for a core.
+
+    Interfaces are created once per process and reused, along with their
+    keep-alive HTTP sessions, so that callers don't pay for a new connection
+    and a schema request every time they talk to Solr. Since the interfaces
+    are shared, callers must not close their connections.
+
+    :param url: The URL of the Solr core.
+    :param mode: The scorched mode of the interface, "r", "w" or "rw".
+    :param interface_class: The SolrInterface class to use. Defaults to
+    ExtraSolrInterface.
+    :return: A SolrInterface for the core.
+    """
+    interface_class = interface_class or ExtraSolrInterface
+    key = (url, mode, interface_class)
+    with _solr_lock:
+        _reset_after_fork()
+        si = _solr_interfaces.get(key)
+        if si is None:
+            session = _solr_sessions.get(url)
+            if session is None:
+                session = make_solr_session(url)
+                _solr_sessions[url] = session
+            si = interface_class(url, http_connection=session, mode=mode)
+            _solr_interfaces[key] = si
+    return si
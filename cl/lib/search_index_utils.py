@@ -1,4 +1,7 @@
+import hashlib
+import json
 from datetime import date
+from typing import Any, Dict
 
 from cl.lib.date_time import midnight_pst
 
@@ -52,3 +55,21 @@ def normalize_search_dicts(d):
         else:
             new_dict[k] = v
     return new_dict
+
+
+def make_search_fingerprint(d: Dict[str, Any]) -> str:
+    """Make a stable hash of a search dict.
+
+    Sets are sorted and dates are converted to strings so that two dicts with
+    the same values always get the same fingerprint, regardless of the order
+    in which they were built.
+
+    :param d: The dict to hash.
+    :return: A hexadecimal SHA256 hash of the dict.
+    """
+    normalized = {
+        k: sorted(v, key=str) if isinstance(v, set) else v
+        for k, v in d.items()
+    }
+    serialized = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
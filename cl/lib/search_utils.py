@@ -13,7 +13,7 @@ from scorched.response import SolrResponse
 from cl.citations.match_citations import search_db_for_fullcitation
 from cl.citations.utils import get_citation_depth_between_clusters
 from cl.lib.bot_detector import is_bot
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import ExtraSolrInterface, get_shared_solr_interface
 from cl.lib.types import CleanData, SearchParam
 from cl.search.constants import (
     SOLR_OPINION_HL_FIELDS,
@@ -80,13 +80,13 @@ def get_solr_interface(cd: CleanData) -> ExtraSolrInterface:
     """Get the correct solr interface for the query"""
     search_type = cd["type"]
     if search_type == SEARCH_TYPES.OPINION:
-        si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        si = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     elif search_type in [SEARCH_TYPES.RECAP, SEARCH_TYPES.DOCKETS]:
-        si = ExtraSolrInterface(settings.SOLR_RECAP_URL, mode="r")
+        si = get_shared_solr_interface(settings.SOLR_RECAP_URL)
     elif search_type == SEARCH_TYPES.ORAL_ARGUMENT:
-        si = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
+        si = get_shared_solr_interface(settings.SOLR_AUDIO_URL)
     elif search_type == SEARCH_TYPES.PEOPLE:
-        si = ExtraSolrInterface(settings.SOLR_PEOPLE_URL, mode="r")
+        si = get_shared_solr_interface(settings.SOLR_PEOPLE_URL)
     else:
         raise NotImplementedError(f"Unknown search type: {search_type}")
 
@@ -1060,9 +1060,8 @@ def get_citing_clusters_with_cache(
         "caller": "view_opinion",
         "fl": "absolute_url,caseName,dateFiled",
     }
-    conn = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    conn = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     results = conn.query().add_extra(**q).execute()
-    conn.conn.http_connection.close()
     citing_clusters = list(results)
     citing_cluster_count = results.result.numFound
     a_week = 60 * 60 * 24 * 7
@@ -1094,7 +1093,7 @@ def get_related_clusters_with_cache(
         # If it is a bot or lacks sub-opinion IDs, return empty results
         return [], [], url_search_params
 
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    si = get_shared_solr_interface(settings.SOLR_OPINION_URL)
 
     # Use cache if enabled
     mlt_cache_key = f"mlt-cluster:{cluster.pk}"
@@ -1178,7 +1177,6 @@ def get_related_clusters_with_cache(
         cache.set(
             mlt_cache_key, related_clusters, settings.RELATED_CACHE_TIMEOUT
         )
-    si.conn.http_connection.close()
     return related_clusters, sub_opinion_ids, url_search_params
 
 
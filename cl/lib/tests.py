@@ -1,5 +1,7 @@
 import datetime
+import io
 from typing import Tuple, TypedDict, cast
+from unittest import mock
 
 from django.contrib.auth.hashers import make_password
 from django.core.files.base import ContentFile
@@ -9,6 +11,10 @@ from django.urls import reverse
 from rest_framework.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
 
 from cl.lib.filesizes import convert_size_to_bytes
+from cl.lib.microservice_utils import (
+    MultipartFileStream,
+    get_microservice_session,
+)
 from cl.lib.mime_types import lookup_mime_type
 from cl.lib.model_helpers import make_docket_number_core, make_upload_path
 from cl.lib.pacer import (
@@ -20,6 +26,7 @@ from cl.lib.pacer import (
 )
 from cl.lib.privacy_tools import anonymize
 from cl.lib.ratelimiter import parse_rate
+from cl.lib.scorched_utils import SolrSession, get_shared_solr_interface
 from cl.lib.search_utils import make_fq
 from cl.lib.string_utils import normalize_dashes, trunc
 from cl.lib.utils import alphanumeric_sort
@@ -783,6 +790,77 @@ class TestFilesizeConversions(SimpleTestCase):
             print("✓")
 
 
+class TestSharedSolrInterfaces(SimpleTestCase):
+    url = "http://solr.test/solr/core"
+
+    def test_interfaces_are_reused(self) -> None:
+        """Do we reuse interfaces and sessions within a process?"""
+        interface_class = mock.MagicMock()
+        si = get_shared_solr_interface(
+            self.url, interface_class=interface_class
+        )
+        self.assertIs(
+            si,
+            get_shared_solr_interface(
+                self.url, interface_class=interface_class
+            ),
+        )
+        get_shared_solr_interface(
+            self.url, mode="w", interface_class=interface_class
+        )
+        self.assertEqual(interface_class.call_count, 2)
+        sessions = [
+            c.kwargs["http_connection"] for c in interface_class.call_args_list
+        ]
+        self.assertIs(sessions[0], sessions[1])
+        self.assertIsInstance(sessions[0], SolrSession)
+
+    def test_new_interfaces_after_fork(self) -> None:
+        """Does a forked process get its own interfaces?"""
+        interface_class = mock.MagicMock()
+        si = get_shared_solr_interface(
+            self.url, interface_class=interface_class
+        )
+        with mock.patch("cl.lib.scorched_utils.os.getpid", return_value=-1):
+            forked_si = get_shared_solr_interface(
+                self.url, interface_class=interface_class
+            )
+        self.assertIsNot(si, forked_si)
+
+
+class TestMicroserviceUploads(SimpleTestCase):
+    def test_multipart_stream(self) -> None:
+        """Does the streamed body have the length it claims, whether it's
+        read at once or in blocks?
+        """
+        content = b"%PDF-1.4 " + b"x" * 5000
+        body = MultipartFileStream(
+            "/some/dir/file.pdf", io.BytesIO(content), {"ocr": "True"}
+        )
+        data = body.read()
+        self.assertEqual(len(data), len(body))
+        self.assertIn(content, data)
+        self.assertIn(b'name="ocr"\r\n\r\nTrue\r\n', data)
+        self.assertIn(b'name="file"; filename="file.pdf"', data)
+        self.assertTrue(data.endswith(f"--{body.boundary}--\r\n".encode()))
+
+        body = MultipartFileStream("file.pdf", io.BytesIO(content))
+        blocks = []
+        while block := body.read(1000):
+            blocks.append(block)
+        self.assertEqual(sum(len(b) for b in blocks), len(body))
+        self.assertIn(content, b"".join(blocks))
+
+    def test_session_is_reused(self) -> None:
+        """Do we reuse the session within a process, but not after a fork?"""
+        session = get_microservice_session()
+        self.assertIs(session, get_microservice_session())
+        with mock.patch(
+            "cl.lib.microservice_utils.os.getpid", return_value=-1
+        ):
+            self.assertIsNot(session, get_microservice_session())
+
+
 class TestRateLimiters(SimpleTestCase):
     def test_parsing_rates(self) -> None:
         qa_pairs = [
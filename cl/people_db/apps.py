@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PeopleDbConfig(AppConfig):
+    name = "cl.people_db"
+
+    def ready(self):
+        # Implicitly connect a signal handlers decorated with @receiver.
+        from cl.people_db import signals
@@ -1,16 +1,22 @@
 import html
 import operator
 import re
-from datetime import date, timedelta
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from functools import reduce
-from typing import List, Optional, Set, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 from dateutil.relativedelta import relativedelta
+from django.db import models, transaction
 from django.db.models import Q, QuerySet
 from django.utils.html import strip_tags
 from nameparser import HumanName
+from redis import RedisError
 
-from cl.people_db.models import SUFFIX_LOOKUP, Person
+from cl.lib.redis_utils import make_redis_interface
+from cl.people_db.models import SUFFIX_LOOKUP, Person, Position
 
 # list of words that aren't judge names
 NOT_JUDGE_WORDS = [
@@ -238,6 +244,22 @@ NAME_CUTOFF = 3
 # for judges with small names, need an override
 IS_JUDGE = {"wu", "re", "du", "de"}
 
+# How long the judge name index of a process is used before it's reloaded,
+# in case it missed a change, the Redis key whose value changes whenever the
+# people or their positions do, and how many seconds apart that key is read.
+JUDGE_NAME_INDEX_TTL = 60 * 60
+JUDGE_NAME_INDEX_VERSION_KEY = "people.judge_name_index.version"
+JUDGE_NAME_INDEX_VERSION_CHECK_INTERVAL = 5
+
+# The first, middle, last and suffix names of a person or an alias,
+# upper-cased like Postgres does for iexact and istartswith lookups.
+JudgeNames = Tuple[str, str, str, str]
+FIRST, MIDDLE, LAST, SUFFIX = range(4)
+
+# A name check is the part of the name to check, the upper-cased value to
+# check it against, and whether it only needs to start with the value.
+NameCheck = Tuple[int, str, bool]
+
 
 def extract_judge_last_name(text: str) -> List[str]:
     """Find judge last names in a string of text.
@@ -289,13 +311,297 @@ def extract_judge_last_name(text: str) -> List[str]:
     return last_names
 
 
-def lookup_judge_by_full_name(
+def to_db_date(value: Union[date, datetime]) -> date:
+    """Convert a date or a datetime to the date that Django would compare a
+    DateField to.
+    """
+    return models.DateField().to_python(value)
+
+
+class JudgeNameIndex:
+    """An in-memory index of the judges, their aliases and their positions,
+    loaded once per process, to look up judges by name without a DB query.
+
+    The judges are indexed by court and by their upper-cased last name and
+    the ones of their aliases. A lookup narrows them down with the same
+    progressive filters as lookup_judge_by_full_name_in_db, checking the
+    dates in memory.
+
+    The DB lookup joins the positions and the aliases of each person, so a
+    person is counted once for every pair of a matching position and a
+    matching alias (or no alias, if they have none). A lookup counts them
+    the same way, so that the two always agree.
+
+    The index is dropped whenever a person or a position is saved or
+    deleted, in this process right away and in the others through a version
+    in Redis, and reloaded after JUDGE_NAME_INDEX_TTL regardless. The version
+    is read at most every JUDGE_NAME_INDEX_VERSION_CHECK_INTERVAL seconds,
+    so that a lookup doesn't cost a round trip to Redis.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.loaded_at = 0.0
+        self.version_checked_at = 0.0
+        self.version: Optional[str] = None
+        # The names, dates of birth and death and aliases of every person,
+        # the start and termination dates of their positions by court and
+        # person, and the people by court and last name. They're swapped as
+        # a whole, so that readers get a consistent index.
+        self._index: Optional[Tuple[Dict, Dict, Dict]] = None
+
+    @staticmethod
+    def get_version() -> Optional[str]:
+        try:
+            return make_redis_interface("CACHE").get(
+                JUDGE_NAME_INDEX_VERSION_KEY
+            )
+        except RedisError:
+            return None
+
+    @staticmethod
+    def bump_version() -> None:
+        try:
+            make_redis_interface("CACHE").incr(JUDGE_NAME_INDEX_VERSION_KEY)
+        except RedisError:
+            pass
+
+    def invalidate(self) -> None:
+        """Drop the index of this process now, and the one of every process
+        once the current transaction, if any, is committed.
+        """
+        self.clear()
+        transaction.on_commit(self.bump_version)
+
+    @staticmethod
+    def _load() -> Tuple[Dict, Dict, Dict]:
+        positions: Dict[
+            Tuple[str, int], List[Tuple[Optional[date], Optional[date]]]
+        ] = defaultdict(list)
+        rows = (
+            Position.objects.filter(person__isnull=False, court__isnull=False)
+            .order_by()
+            .values_list(
+                "court_id", "person_id", "date_start", "date_termination"
+            )
+            .iterator(chunk_size=10_000)
+        )
+        for court_id, person_id, date_start, date_termination in rows:
+            positions[(court_id, person_id)].append(
+                (date_start, date_termination)
+            )
+
+        name_fields = ["name_first", "name_middle", "name_last", "name_suffix"]
+        person_ids = {person_id for _, person_id in positions}
+        people: Dict[
+            int,
+            Tuple[
+                JudgeNames, Optional[date], Optional[date], List[JudgeNames]
+            ],
+        ] = {}
+        rows = (
+            Person.objects.filter(pk__in=person_ids)
+            .order_by()
+            .values_list("pk", *name_fields, "date_dob", "date_dod")
+            .iterator(chunk_size=10_000)
+        )
+        for pk, first, middle, last, suffix, dob, dod in rows:
+            names = (
+                first.upper(),
+                middle.upper(),
+                last.upper(),
+                suffix.upper(),
+            )
+            people[pk] = (names, dob, dod, [])
+        rows = (
+            Person.objects.filter(is_alias_of__in=person_ids)
+            .order_by()
+            .values_list("is_alias_of_id", *name_fields)
+            .iterator(chunk_size=10_000)
+        )
+        for alias_of_id, first, middle, last, suffix in rows:
+            people[alias_of_id][3].append(
+                (first.upper(), middle.upper(), last.upper(), suffix.upper())
+            )
+
+        by_last_name: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for court_id, person_id in positions:
+            names, _, _, aliases = people[person_id]
+            last_names = {names[LAST]} | {alias[LAST] for alias in aliases}
+            for last_name in last_names:
+                by_last_name[(court_id, last_name)].append(person_id)
+        return people, dict(positions), dict(by_last_name)
+
+    def get_index(self) -> Tuple[Dict, Dict, Dict]:
+        """Get the index, loading it if it's missing or out of date."""
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - self.loaded_at < JUDGE_NAME_INDEX_TTL:
+            if (
+                now - self.version_checked_at
+                < JUDGE_NAME_INDEX_VERSION_CHECK_INTERVAL
+            ):
+                return index
+            version = self.get_version()
+            self.version_checked_at = now
+            if version == self.version:
+                return index
+        else:
+            version = self.get_version()
+        with self._lock:
+            if (
+                self._index is None
+                or version != self.version
+                or time.monotonic() - self.loaded_at >= JUDGE_NAME_INDEX_TTL
+            ):
+                self._index = self._load()
+                self.version = version
+                self.loaded_at = self.version_checked_at = time.monotonic()
+            return self._index
+
+    @staticmethod
+    def _count_rows(
+        names: JudgeNames,
+        aliases: List[JudgeNames],
+        positions: List[Tuple[Optional[date], Optional[date]]],
+        window: Optional[Tuple[date, date]],
+        checks: List[NameCheck],
+    ) -> int:
+        """Count the rows that the DB lookup would get for a person.
+
+        :param names: The names of the person.
+        :param aliases: The names of their aliases.
+        :param positions: The start and termination dates of their positions
+        in the court.
+        :param window: The dates that the positions must start before and
+        end after, if any.
+        :param checks: The name checks that the person or an alias must
+        pass.
+        :return: The number of matching positions times the number of
+        matching aliases.
+        """
+        if window is None:
+            position_count = len(positions)
+        else:
+            start_before, end_after = window
+            position_count = sum(
+                1
+                for date_start, date_termination in positions
+                if (date_start is None or date_start < start_before)
+                and (date_termination is None or date_termination > end_after)
+            )
+        if not position_count:
+            return 0
+
+        def passes(part: JudgeNames, check: NameCheck) -> bool:
+            i, value, prefix = check
+            return part[i].startswith(value) if prefix else part[i] == value
+
+        alias_count = sum(
+            1
+            for alias in aliases or [None]
+            if all(
+                passes(names, check)
+                or (alias is not None and passes(alias, check))
+                for check in checks
+            )
+        )
+        return position_count * alias_count
+
+    def lookup(
+        self,
+        name: HumanName,
+        court_id: str,
+        event_date: Optional[date] = None,
+        require_living_judge: bool = True,
+    ) -> Optional[int]:
+        """Uniquely identify a judge by both name and metadata.
+
+        See lookup_judge_by_full_name for the parameters.
+
+        :return: The ID of the judge, or None.
+        """
+        people, positions, by_last_name = self.get_index()
+
+        candidates = []
+        for pk in by_last_name.get((court_id, name.last.upper()), []):
+            _, dob, dod, _ = people[pk]
+            if require_living_judge and event_date:
+                if dod is not None and dod < to_db_date(
+                    event_date - timedelta(days=365)
+                ):
+                    continue
+                if dob is not None and dob > to_db_date(
+                    event_date + timedelta(days=365)
+                ):
+                    continue
+            candidates.append(pk)
+
+        # The date window and the name checks of each filter set, in order.
+        checks: List[NameCheck] = [(LAST, name.last.upper(), False)]
+        filter_sets = [(None, list(checks))]
+        window = None
+        if event_date is not None:
+            window = (
+                to_db_date(event_date + relativedelta(years=1)),
+                to_db_date(event_date - relativedelta(years=1)),
+            )
+            filter_sets.append((window, list(checks)))
+        if name.first:
+            checks.append((FIRST, name.first.upper(), False))
+            filter_sets.append((window, list(checks)))
+        if name.middle:
+            stripped_middle = name.middle.strip(".,")
+            if len(stripped_middle) == 1:
+                checks.append((MIDDLE, stripped_middle.upper(), True))
+            else:
+                checks.append((MIDDLE, name.middle.upper(), False))
+            filter_sets.append((window, list(checks)))
+        if name.suffix:
+            suffix = SUFFIX_LOOKUP.get(name.suffix.lower())
+            if suffix:
+                checks.append((SUFFIX, suffix.upper(), False))
+                filter_sets.append((window, list(checks)))
+
+        for window, checks in filter_sets:
+            count = 0
+            match = None
+            for pk in candidates:
+                names, _, _, aliases = people[pk]
+                rows = self._count_rows(
+                    names,
+                    aliases,
+                    positions[(court_id, pk)],
+                    window,
+                    checks,
+                )
+                if rows:
+                    count += rows
+                    match = pk
+                if count > 1:
+                    break
+            if count == 0:
+                return None
+            elif count == 1:
+                return match
+        return None
+
+
+judge_name_index = JudgeNameIndex()
+
+
+def lookup_judge_by_full_name_in_db(
     name: Union[HumanName, str],
     court_id: str,
     event_date: Optional[date] = None,
     require_living_judge: bool = True,
 ) -> Optional[Person]:
-    """Uniquely identifies a judge by both name and metadata.
+    """Uniquely identifies a judge by both name and metadata, by querying the
+    DB. This gives the same answers as lookup_judge_by_full_name, which uses
+    an in-memory index instead.
 
     :param name: The judge's name, either as a str of the full name or as
     a HumanName object. Do NOT provide just the last name of the judge. If you
@@ -417,6 +723,53 @@ def lookup_judge_by_full_name(
     return None
 
 
+def lookup_judge_by_full_name(
+    name: Union[HumanName, str],
+    court_id: str,
+    event_date: Optional[date] = None,
+    require_living_judge: bool = True,
+) -> Optional[Person]:
+    """Uniquely identifies a judge by both name and metadata.
+
+    The judge is found with the in-memory judge_name_index, so this only
+    queries the DB to get the judge that was found.
+
+    :param name: The judge's name, either as a str of the full name or as
+    a HumanName object. Do NOT provide just the last name of the judge. If you
+    do, it will be considered the judge's first name. You MUST provide their
+    full name or a HumanName object. To look up a judge by last name, see the
+    look_up_judge_by_last_name function. The str parsing used here is the
+    heuristic approach used by nameparser.HumanName.
+    :param court_id: The court where the judge did something
+    :param event_date: The date when the judge did something
+    :param require_living_judge: Whether to ensure that the judge found was
+    born before the event date and died after it. In order to keep code simple,
+    there's some slop in here to allow for date fields with low granularity
+    (like those with DATE_GRANULARITY = "%Y").
+    :return Either the judge that matched the name in the court at the right
+    time, or None.
+    """
+    if isinstance(name, str):
+        name = HumanName(name)
+
+    pk = judge_name_index.lookup(
+        name, court_id, event_date, require_living_judge
+    )
+    if pk is None:
+        return None
+    person = Person.objects.filter(pk=pk).first()
+    if person is None:
+        # The index is out of date, for instance because it was loaded in a
+        # transaction that was rolled back. Try again with a fresh one.
+        judge_name_index.clear()
+        pk = judge_name_index.lookup(
+            name, court_id, event_date, require_living_judge
+        )
+        if pk is not None:
+            person = Person.objects.filter(pk=pk).first()
+    return person
+
+
 def lookup_judge_by_full_name_and_set_attr(
     item: object,
     target_field: str,
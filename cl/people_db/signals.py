@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cl.people_db.lookup_utils import judge_name_index
+from cl.people_db.models import Person, Position
+
+
+@receiver(post_save, sender=Person, dispatch_uid="person_saved")
+@receiver(post_delete, sender=Person, dispatch_uid="person_deleted")
+@receiver(post_save, sender=Position, dispatch_uid="position_saved")
+@receiver(post_delete, sender=Position, dispatch_uid="position_deleted")
+def invalidate_judge_name_index(sender, **kwargs) -> None:
+    """Drop the judge name index when a person, an alias (which is a person
+    too) or a position changes.
+    """
+    judge_name_index.invalidate()
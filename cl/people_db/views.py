@@ -5,7 +5,7 @@ from django.template.response import TemplateResponse
 from django.urls import reverse
 from judge_pics.search import ImageSizes, portrait
 
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.people_db.models import Person
 from cl.people_db.utils import make_title_str
 
@@ -38,7 +38,7 @@ def view_person(request, pk, slug):
     positions = judicial_positions + other_positions
 
     # Use Solr to get relevant opinions that the person wrote
-    conn = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    conn = get_shared_solr_interface(settings.SOLR_OPINION_URL)
     q = {
         "q": f"author_id:{person.pk} OR panel_ids:{person.pk}",
         "fl": [
@@ -60,9 +60,8 @@ def view_person(request, pk, slug):
         "caller": "view_person",
     }
     authored_opinions = conn.query().add_extra(**q).execute()
-    conn.conn.http_connection.close()
     # Use Solr to get the oral arguments for the judge
-    conn = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
+    conn = get_shared_solr_interface(settings.SOLR_AUDIO_URL)
     q = {
         "q": f"panel_ids:{person.pk}",
         "fl": [
@@ -80,8 +79,7 @@ def view_person(request, pk, slug):
         "caller": "view_person",
     }
     oral_arguments_heard = conn.query().add_extra(**q).execute()
-    conn.conn.http_connection.close()
-    conn = ExtraSolrInterface(settings.SOLR_RECAP_URL, mode="r")
+    conn = get_shared_solr_interface(settings.SOLR_RECAP_URL)
     q = {
         "q": f"assigned_to_id:{person.pk} OR referred_to_id:{person.pk}",
         "fl": [
@@ -103,7 +101,6 @@ def view_person(request, pk, slug):
         "caller": "view_person",
     }
     recap_cases_assigned = conn.query().add_extra(**q).execute()
-    conn.conn.http_connection.close()
     return TemplateResponse(
         request,
         "view_person.html",
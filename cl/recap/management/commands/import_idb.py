@@ -1,10 +1,12 @@
+import io
 import re
-import sys
+import time
 from datetime import date
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
 from dateutil import parser
 from django.core.management import CommandError
+from django.db import connection, models, transaction
 from django.utils.timezone import now
 
 from cl.lib.command_utils import CommandUtils, VerboseCommand, logger
@@ -62,6 +64,165 @@ def create_or_update_row(
     return fjc_row
 
 
+IDB_STAGING_TABLE = "idb_staging"
+
+# How values are escaped in the text format of COPY.
+COPY_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def make_copy_value(value: Any) -> str:
+    """Convert a value to the text format of COPY.
+
+    :param value: A value of a row, as given to create_or_update_row.
+    :return: The value as COPY expects it.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, models.Model):
+        value = value.pk
+    elif isinstance(value, date):
+        value = value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+def bulk_create_or_update_rows(rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Add or update many rows of the IDB at once, matching them to the
+    existing rows the same way create_or_update_row does.
+
+    The rows are copied into a temporary staging table, matched to the
+    existing rows with a single query and then applied with one UPDATE and
+    one INSERT. Rows that can't be matched that way, because they lack a
+    district or share their key with an earlier row of the batch, go through
+    create_or_update_row afterwards, in order.
+
+    :param rows: The values of the rows, as given to create_or_update_row.
+    :return: A dict counting the rows that were added, updated, skipped
+    because they matched too many rows, and done one_by_one.
+    """
+    stats = {"added": 0, "updated": 0, "skipped": 0, "one_by_one": 0}
+    staged = []
+    deferred = []
+    seen_keys = set()
+    for line_number, values in enumerate(rows):
+        district = values.get("district")
+        key = (
+            getattr(district, "pk", district),
+            values["docket_number"],
+            values["origin"],
+            values["date_filed"],
+        )
+        if not district or key in seen_keys:
+            deferred.append(values)
+            continue
+        seen_keys.add(key)
+        staged.append((line_number, values))
+
+    # Inserts need every column, not just the ones in the file.
+    fields = [
+        f
+        for f in FjcIntegratedDatabase._meta.concrete_fields
+        if not f.primary_key
+        and f.name not in ["date_created", "date_modified"]
+    ]
+    update_fields = {name for values in rows for name in values}
+    qn = connection.ops.quote_name
+    table = qn(FjcIntegratedDatabase._meta.db_table)
+    columns = ", ".join(qn(f.column) for f in fields)
+    updates = ", ".join(
+        f"{qn(f.column)} = s.{qn(f.column)}"
+        for f in fields
+        if f.name in update_fields
+    )
+
+    buffer = io.StringIO()
+    for line_number, values in staged:
+        copy_values = [
+            make_copy_value(values.get(f.name, f.get_default()))
+            for f in fields
+        ]
+        copy_values.append(str(line_number))
+        buffer.write("\t".join(copy_values) + "\n")
+    buffer.seek(0)
+
+    right_now = now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {IDB_STAGING_TABLE}")
+        cursor.execute(
+            f"CREATE TEMP TABLE {IDB_STAGING_TABLE} ON COMMIT DROP AS "
+            f"SELECT {columns}, 0 AS line_number, "
+            f"NULL::integer AS match_id, NULL::integer AS match_count "
+            f"FROM {table} WITH NO DATA"
+        )
+        cursor.copy_expert(
+            f"COPY {IDB_STAGING_TABLE} ({columns}, line_number) FROM STDIN",
+            buffer,
+        )
+        cursor.execute(f"ANALYZE {IDB_STAGING_TABLE}")
+
+        # Match on the case first. If that's ambiguous, narrow it down by
+        # defendant, which works better on criminal cases.
+        cursor.execute(
+            f"""
+            UPDATE {IDB_STAGING_TABLE} s
+            SET match_count = CASE WHEN m.n = 1 THEN 1 ELSE m.n_def END,
+                match_id = CASE WHEN m.n = 1 THEN m.id ELSE m.id_def END
+            FROM (
+                SELECT s.line_number,
+                       count(*) AS n,
+                       max(f.id) AS id,
+                       count(*) FILTER (
+                           WHERE f.defendant = s.defendant
+                       ) AS n_def,
+                       max(f.id) FILTER (
+                           WHERE f.defendant = s.defendant
+                       ) AS id_def
+                FROM {IDB_STAGING_TABLE} s
+                JOIN {table} f
+                  ON f.district_id = s.district_id
+                 AND f.docket_number = s.docket_number
+                 AND f.origin IS NOT DISTINCT FROM s.origin
+                 AND f.date_filed IS NOT DISTINCT FROM s.date_filed
+                GROUP BY s.line_number
+            ) m
+            WHERE s.line_number = m.line_number
+            """
+        )
+        cursor.execute(
+            f"UPDATE {table} f SET {updates}, date_modified = %s "
+            f"FROM {IDB_STAGING_TABLE} s "
+            f"WHERE s.match_count = 1 AND f.id = s.match_id",
+            [right_now],
+        )
+        stats["updated"] = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, date_created, date_modified) "
+            f"SELECT {columns}, %s, %s FROM {IDB_STAGING_TABLE} "
+            f"WHERE coalesce(match_count, 0) = 0 ORDER BY line_number",
+            [right_now, right_now],
+        )
+        stats["added"] = cursor.rowcount
+        cursor.execute(
+            f"SELECT line_number, match_count FROM {IDB_STAGING_TABLE} "
+            f"WHERE match_count > 1 ORDER BY line_number"
+        )
+        for line_number, match_count in cursor.fetchall():
+            logger.warning(
+                "Got %s results when looking up row: %s",
+                match_count,
+                rows[line_number],
+            )
+            stats["skipped"] += 1
+
+    for values in deferred:
+        create_or_update_row(values)
+        stats["one_by_one"] += 1
+    return stats
+
+
 class Command(VerboseCommand, CommandUtils):
     help = (
         "Import a tab-separated file as produced by FJC for their IDB. "
@@ -88,6 +249,12 @@ class Command(VerboseCommand, CommandUtils):
             default=-1,
             type=int,
         )
+        parser.add_argument(
+            "--chunk-size",
+            help="The number of rows to load at a time.",
+            default=10_000,
+            type=int,
+        )
 
     def __init__(self, *args, **kwargs):
         super(Command, self).__init__(*args, **kwargs)
@@ -98,6 +265,7 @@ class Command(VerboseCommand, CommandUtils):
         self.date_fields = []
         self.court_fields = []
         self.nullable_fields = None
+        self.courts = {}
 
     @staticmethod
     def ensure_filetype_ok(filetype: int) -> None:
@@ -183,44 +351,81 @@ class Command(VerboseCommand, CommandUtils):
 
         self.ensure_file_ok(options["input_file"])
         self.ensure_filetype_ok(options["filetype"])
+        if options["filetype"] not in [
+            CV_2017,
+            CV_2020,
+            CV_2021,
+            CV_2022,
+            CR_2017,
+        ]:
+            raise NotImplementedError("This file type not implemented.")
         self.filetype = options["filetype"]
         self.build_field_data()
 
         logger.info(f"Importing IDB file at: {options['input_file']}")
+        totals = {"added": 0, "updated": 0, "skipped": 0, "one_by_one": 0}
+        t1 = time.monotonic()
         with open(
             options["input_file"], mode="r", encoding="cp1252", newline="\r\n"
         ) as f:
-            col_headers = f.readline().strip().split("\t")
-            for i, line in enumerate(f):
-                sys.stdout.write(f"\rDoing line: {i}")
-                sys.stdout.flush()
-                if i < options["start_line"]:
-                    continue
-
-                row = self.make_csv_row_dict(line, col_headers)
-                if options["filetype"] == CR_2017 and row["SOURCE"] != "CMECF":
-                    continue
-
-                self.normalize_nulls(row)
-                self.normalize_court_fields(row)
-                self.normalize_booleans(row)
-                self.normalize_dates(row)
-                self.normalize_ints(row)
-                if options["filetype"] not in [
-                    CV_2017,
-                    CV_2020,
-                    CV_2021,
-                    CV_2022,
-                    CR_2017,
-                ]:
-                    raise NotImplementedError(
-                        "This file type not implemented."
-                    )
-                else:
-                    values = self.convert_to_cl_data_model(
-                        row, options["filetype"]
-                    )
-                create_or_update_row(values)
+            for chunk in self.iter_row_chunks(
+                f, options["start_line"], options["chunk_size"]
+            ):
+                stats = bulk_create_or_update_rows(chunk)
+                for k, v in stats.items():
+                    totals[k] += v
+                row_count = sum(totals.values())
+                elapsed = time.monotonic() - t1
+                logger.info(
+                    "Imported %s rows at %0.0f rows/second: %s",
+                    row_count,
+                    row_count / max(elapsed, 0.001),
+                    totals,
+                )
+
+        row_count = sum(totals.values())
+        elapsed = time.monotonic() - t1
+        self.stdout.write(
+            f"Imported {row_count} rows in {elapsed:0.1f} seconds "
+            f"({row_count / max(elapsed, 0.001):0.0f} rows/second).\n"
+            f"Added: {totals['added']}\n"
+            f"Updated: {totals['updated']}\n"
+            f"Skipped, too many matches: {totals['skipped']}\n"
+            f"Done one by one: {totals['one_by_one']}\n"
+        )
+
+    def iter_row_chunks(
+        self, f: TextIO, start_line: int, chunk_size: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Parse and normalize the rows of an IDB file, a chunk at a time.
+
+        :param f: The IDB file, at its start.
+        :param start_line: The line to start on.
+        :param chunk_size: The number of rows in a chunk.
+        :return: Lists of the values of the rows, ready for
+        bulk_create_or_update_rows.
+        """
+        col_headers = f.readline().strip().split("\t")
+        chunk = []
+        for i, line in enumerate(f):
+            if i < start_line:
+                continue
+
+            row = self.make_csv_row_dict(line, col_headers)
+            if self.filetype == CR_2017 and row["SOURCE"] != "CMECF":
+                continue
+
+            self.normalize_nulls(row)
+            self.normalize_court_fields(row)
+            self.normalize_booleans(row)
+            self.normalize_dates(row)
+            self.normalize_ints(row)
+            chunk.append(self.convert_to_cl_data_model(row, self.filetype))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
     def normalize_nulls(self, row):
         """The IDB uses the value -8 to indicate a null value. Fix this
@@ -270,34 +475,35 @@ class Command(VerboseCommand, CommandUtils):
             row["CIRCUIT"] = row["CIRCUIT"][1]
 
         if row["CIRCUIT"]:
-            matches = Court.federal_courts.appellate_courts().filter(
-                fjc_court_id=row["CIRCUIT"],
-            )
-            if matches.count() == 1:
-                row["CIRCUIT"] = matches[0]
-            else:
-                raise Exception(
-                    "Unable to match CIRCUIT column value %s to "
-                    "Court object" % row["CIRCUIT"]
-                )
-
+            row["CIRCUIT"] = self.get_court("CIRCUIT", row["CIRCUIT"])
         if row["DISTRICT"]:
-            if self.filetype == BANKR_2017:
-                matches = Court.federal_courts.bankruptcy_courts().filter(
-                    fjc_court_id=row["DISTRICT"],
-                )
-            else:
-                matches = Court.federal_courts.district_courts().filter(
-                    fjc_court_id=row["DISTRICT"],
-                )
+            row["DISTRICT"] = self.get_court("DISTRICT", row["DISTRICT"])
 
-            if matches.count() == 1:
-                row["DISTRICT"] = matches[0]
-            else:
-                raise Exception(
-                    "Unable to match DISTRICT column value %s to "
-                    "Court object" % row["DISTRICT"]
-                )
+    def get_court(self, column: str, fjc_court_id: str) -> Court:
+        """Get the court of an FJC court ID, remembering it for the next row.
+
+        :param column: The column of the ID, CIRCUIT or DISTRICT.
+        :param fjc_court_id: The FJC ID of the court.
+        :return: The court.
+        """
+        key = (column, fjc_court_id)
+        if key in self.courts:
+            return self.courts[key]
+
+        if column == "CIRCUIT":
+            courts = Court.federal_courts.appellate_courts()
+        elif self.filetype == BANKR_2017:
+            courts = Court.federal_courts.bankruptcy_courts()
+        else:
+            courts = Court.federal_courts.district_courts()
+        matches = list(courts.filter(fjc_court_id=fjc_court_id)[:2])
+        if len(matches) != 1:
+            raise Exception(
+                "Unable to match %s column value %s to Court object"
+                % (column, fjc_court_id)
+            )
+        self.courts[key] = matches[0]
+        return matches[0]
 
     def convert_to_cl_data_model(self, row, source):
         """Convert the CSV dict with it's headers to our data model"""
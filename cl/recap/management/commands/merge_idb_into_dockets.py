@@ -53,6 +53,12 @@ class Command(VerboseCommand, CommandUtils):
             help="After doing this number, stop. This number is not additive "
             "with the offset parameter. Default is to do all of them.",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The number of IDB rows to merge or create per task.",
+        )
         parser.add_argument(
             "--task",
             type=str,
@@ -90,7 +96,7 @@ class Command(VerboseCommand, CommandUtils):
         logger.info("%s items will be merged or created.", idb_rows.count())
         q = options["queue"]
         throttle = CeleryThrottle(queue_name=q)
-        chunk_size = 25
+        chunk_size = options["chunk_size"]
         for i, idb_chunk in enumerate(chunks(idb_rows.iterator(), chunk_size)):
             # Iterate over all items in the IDB and find them in the Docket
             # table. If they're not there, create a new item.
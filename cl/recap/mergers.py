@@ -1,9 +1,10 @@
 # Code for merging PACER content into the DB
 import logging
 import re
+from collections import defaultdict
 from copy import deepcopy
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
@@ -60,6 +61,14 @@ logger = logging.getLogger(__name__)
 
 cnt = CaseNameTweaker()
 
+# Dockets with at least this many parties get their parties and attorneys
+# added in bulk, instead of with several queries per party and attorney.
+PARTY_BULK_THRESHOLD = 50
+
+# Docket reports with at least this many entries have their numbered entries
+# added in bulk, instead of with several queries per entry.
+DOCKET_ENTRY_BULK_THRESHOLD = 100
+
 
 def find_docket_object(
     court_id: str,
@@ -594,25 +603,103 @@ def get_or_make_docket_entry(d, docket_entry):
     return de, de_created
 
 
-def add_docket_entries(d, docket_entries, tags=None):
-    """Update or create the docket entries and documents.
+def update_docket_entry_fields(de, docket_entry):
+    """Update a DocketEntry with the data that was scraped, without saving it.
 
-    :param d: The docket object to add things to and use for lookups.
-    :param docket_entries: A list of dicts containing docket entry data.
-    :param tags: A list of tag objects to apply to the recap documents and
-    docket entries created or updated in this function.
-    :returns tuple of a list of created or existing
-    DocketEntry objects,  a list of RECAPDocument objects created, whether
-    any docket entry was created.
+    :param de: The DocketEntry to update.
+    :param docket_entry: The scraped dict from Juriscraper for the docket
+    entry.
+    :return: None
     """
-    # Remove items without a date filed value.
-    docket_entries = [de for de in docket_entries if de.get("date_filed")]
+    de.description = docket_entry["description"] or de.description
+    date_filed = docket_entry["date_filed"]
+    if isinstance(date_filed, datetime):
+        # For now we do dumb date conversion. This simply returns a date
+        # object with the same year, month, and day, ignoring time and
+        # timezones. Once the DB is upgraded to support timezones, we can
+        # do better.
+        date_filed = date_filed.date()
+
+    de.date_filed = date_filed or de.date_filed
+    de.pacer_sequence_number = (
+        docket_entry.get("pacer_seq_no") or de.pacer_sequence_number
+    )
+    de.recap_sequence_number = docket_entry["recap_sequence_number"]
 
-    rds_created = []
+
+def add_recap_document(d, de, docket_entry, rds_created):
+    """Find the RECAPDocument of a docket entry and update its pacer_doc_id
+    if it's blank. If we can't find it, create it or give up.
+
+    :param d: The docket of the docket entry, for logging.
+    :param de: The DocketEntry the document is on.
+    :param docket_entry: The scraped dict from Juriscraper for the docket
+    entry.
+    :param rds_created: A list to add the RECAPDocument to if it's created.
+    :return: The RECAPDocument, or None if it couldn't be saved.
+    """
+    params = {
+        "docket_entry": de,
+        # Normalize to "" here. Unsure why, but RECAPDocuments have a
+        # char field for this field while DocketEntries have a integer
+        # field.
+        "document_number": docket_entry["document_number"] or "",
+    }
+    if not docket_entry["document_number"] and docket_entry.get(
+        "short_description"
+    ):
+        params["description"] = docket_entry["short_description"]
+
+    if docket_entry.get("attachment_number"):
+        params["document_type"] = RECAPDocument.ATTACHMENT
+        params["attachment_number"] = docket_entry["attachment_number"]
+    else:
+        params["document_type"] = RECAPDocument.PACER_DOCUMENT
+
+    try:
+        rd = RECAPDocument.objects.get(**params)
+    except RECAPDocument.DoesNotExist:
+        try:
+            rd = RECAPDocument.objects.create(
+                pacer_doc_id=docket_entry["pacer_doc_id"],
+                is_available=False,
+                **params,
+            )
+        except ValidationError:
+            # Happens from race conditions.
+            return None
+        rds_created.append(rd)
+    except RECAPDocument.MultipleObjectsReturned:
+        logger.info(
+            "Multiple recap documents found for document entry number'%s' "
+            "while processing '%s'" % (docket_entry["document_number"], d)
+        )
+        return None
+
+    rd.pacer_doc_id = rd.pacer_doc_id or docket_entry["pacer_doc_id"]
+    rd.description = docket_entry.get("short_description") or rd.description
+    try:
+        rd.save()
+    except ValidationError:
+        # Happens from race conditions.
+        return None
+    return rd
+
+
+def add_docket_entries_one_by_one(d, docket_entries):
+    """Update or create docket entries and their documents one at a time.
+
+    :param d: The docket object to add things to and use for lookups.
+    :param docket_entries: A list of dicts containing docket entry data, with
+    their recap_sequence_number.
+    :return: A tuple of the created or existing DocketEntry objects, the
+    RECAPDocument objects created, the DocketEntry objects created and the
+    RECAPDocument objects created or updated.
+    """
     des_returned = []
-    content_updated = False
-    calculate_recap_sequence_numbers(docket_entries)
-    known_filing_dates = [d.date_last_filing]
+    rds_created = []
+    des_created = []
+    rds_returned = []
     for docket_entry in docket_entries:
         response = get_or_make_docket_entry(d, docket_entry)
         if response is None:
@@ -620,91 +707,237 @@ def add_docket_entries(d, docket_entries, tags=None):
         else:
             de, de_created = response[0], response[1]
 
-        de.description = docket_entry["description"] or de.description
-        date_filed = docket_entry["date_filed"]
-        if isinstance(date_filed, datetime):
-            # For now we do dumb date conversion. This simply returns a date
-            # object with the same year, month, and day, ignoring time and
-            # timezones. Once the DB is upgraded to support timezones, we can
-            # do better.
-            date_filed = date_filed.date()
-
-        de.date_filed = date_filed or de.date_filed
-        de.pacer_sequence_number = (
-            docket_entry.get("pacer_seq_no") or de.pacer_sequence_number
-        )
-        de.recap_sequence_number = docket_entry["recap_sequence_number"]
+        update_docket_entry_fields(de, docket_entry)
         de.save()
         des_returned.append(de)
-        if tags:
-            for tag in tags:
-                tag.tag_object(de)
-
         if de_created:
-            content_updated = True
-            known_filing_dates.append(de.date_filed)
+            des_created.append(de)
 
-        # Then make the RECAPDocument object. Try to find it. If we do, update
-        # the pacer_doc_id field if it's blank. If we can't find it, create it
-        # or throw an error.
-        params = {
-            "docket_entry": de,
-            # Normalize to "" here. Unsure why, but RECAPDocuments have a
-            # char field for this field while DocketEntries have a integer
-            # field.
-            "document_number": docket_entry["document_number"] or "",
-        }
-        if not docket_entry["document_number"] and docket_entry.get(
-            "short_description"
-        ):
-            params["description"] = docket_entry["short_description"]
+        # Then make the RECAPDocument object.
+        rd = add_recap_document(d, de, docket_entry, rds_created)
+        if rd is not None:
+            rds_returned.append(rd)
+    return des_returned, rds_created, des_created, rds_returned
 
-        if docket_entry.get("attachment_number"):
-            params["document_type"] = RECAPDocument.ATTACHMENT
-            params["attachment_number"] = docket_entry["attachment_number"]
-        else:
-            params["document_type"] = RECAPDocument.PACER_DOCUMENT
 
+def add_docket_entries_in_bulk(d, docket_entries):
+    """Update or create numbered docket entries and their documents with a
+    handful of bulk queries.
+
+    The docket is locked like get_or_make_docket_entry does, its entries and
+    documents are loaded up front, and the changes are worked out in memory
+    and written with bulk_create and bulk_update. This must be run in a
+    transaction.
+
+    Entries that take more than a lookup by number are left over for
+    add_docket_entries_one_by_one. These are unnumbered entries, numbers that
+    came up earlier in the list, and numbers that have several entries in
+    the DB.
+
+    :param d: The docket object to add things to and use for lookups.
+    :param docket_entries: A list of dicts containing docket entry data, with
+    their recap_sequence_number.
+    :return: A tuple of the created or existing DocketEntry objects, the
+    RECAPDocument objects created, the DocketEntry objects created, the
+    RECAPDocument objects created or updated and the docket entry dicts that
+    are left over.
+    """
+    left_over = []
+    by_number = {}
+    for docket_entry in docket_entries:
         try:
-            rd = RECAPDocument.objects.get(**params)
-        except RECAPDocument.DoesNotExist:
-            try:
-                rd = RECAPDocument.objects.create(
-                    pacer_doc_id=docket_entry["pacer_doc_id"],
-                    is_available=False,
-                    **params,
-                )
-            except ValidationError:
-                # Happens from race conditions.
-                continue
-            rds_created.append(rd)
-        except RECAPDocument.MultipleObjectsReturned:
+            number = int(docket_entry["document_number"])
+            if docket_entry.get("attachment_number"):
+                int(docket_entry["attachment_number"])
+        except (TypeError, ValueError):
+            left_over.append(docket_entry)
+            continue
+        if number in by_number:
+            left_over.append(docket_entry)
+            continue
+        by_number[number] = docket_entry
+
+    # Lock the docket, so that other uploads of it wait for this one instead
+    # of making the same entries.
+    Docket.objects.select_for_update().get(pk=d.pk)
+    existing_des = defaultdict(list)
+    for de in DocketEntry.objects.filter(
+        docket=d, entry_number__in=by_number.keys()
+    ):
+        existing_des[de.entry_number].append(de)
+
+    des_returned = []
+    for number, docket_entry in by_number.items():
+        if len(existing_des[number]) > 1:
+            left_over.append(docket_entry)
+            continue
+        if existing_des[number]:
+            de = existing_des[number][0]
+        else:
+            de = DocketEntry(docket=d, entry_number=number)
+        update_docket_entry_fields(de, docket_entry)
+        des_returned.append((de, docket_entry))
+
+    right_now = now()
+    des_created = [de for de, _ in des_returned if de.pk is None]
+    des_updated = [de for de, _ in des_returned if de.pk is not None]
+    for de in des_updated:
+        de.date_modified = right_now
+    DocketEntry.objects.bulk_create(des_created, batch_size=1000)
+    DocketEntry.objects.bulk_update(
+        des_updated,
+        [
+            "description",
+            "date_filed",
+            "pacer_sequence_number",
+            "recap_sequence_number",
+            "date_modified",
+        ],
+        batch_size=1000,
+    )
+
+    existing_rds = defaultdict(list)
+    for rd in RECAPDocument.objects.filter(docket_entry__in=des_updated):
+        existing_rds[(rd.docket_entry_id, rd.document_number)].append(rd)
+
+    rds_created = []
+    rds_updated = []
+    rds_left_over = []
+    for de, docket_entry in des_returned:
+        document_number = str(docket_entry["document_number"])
+        if docket_entry.get("attachment_number"):
+            document_type = RECAPDocument.ATTACHMENT
+            attachment_number = int(docket_entry["attachment_number"])
+        else:
+            document_type = RECAPDocument.PACER_DOCUMENT
+            attachment_number = None
+        same_number = existing_rds[(de.pk, document_number)]
+        rds = [
+            rd
+            for rd in same_number
+            if rd.document_type == document_type
+            and (
+                attachment_number is None
+                or rd.attachment_number == attachment_number
+            )
+        ]
+        if len(rds) > 1:
             logger.info(
                 "Multiple recap documents found for document entry number'%s' "
                 "while processing '%s'" % (docket_entry["document_number"], d)
             )
             continue
-
-        rd.pacer_doc_id = rd.pacer_doc_id or docket_entry["pacer_doc_id"]
+        elif rds:
+            rd = rds[0]
+            rd.date_modified = right_now
+            rds_updated.append(rd)
+        elif any(
+            rd.attachment_number == attachment_number for rd in same_number
+        ):
+            # A document of another type is in the way. RECAPDocument.save
+            # knows how to sort that out.
+            rds_left_over.append((de, docket_entry))
+            continue
+        else:
+            rd = RECAPDocument(
+                docket_entry=de,
+                document_number=document_number,
+                document_type=document_type,
+                attachment_number=attachment_number,
+                is_available=False,
+            )
+            rds_created.append(rd)
+        rd.pacer_doc_id = rd.pacer_doc_id or docket_entry["pacer_doc_id"] or ""
         rd.description = (
             docket_entry.get("short_description") or rd.description
         )
-        try:
-            rd.save()
-        except ValidationError:
-            # Happens from race conditions.
-            continue
-        if tags:
-            for tag in tags:
-                tag.tag_object(rd)
 
-    known_filing_dates = set(filter(None, known_filing_dates))
+    RECAPDocument.objects.bulk_create(rds_created, batch_size=1000)
+    RECAPDocument.objects.bulk_update(
+        rds_updated,
+        ["pacer_doc_id", "description", "date_modified"],
+        batch_size=1000,
+    )
+    rds_returned = rds_created + rds_updated
+    for de, docket_entry in rds_left_over:
+        rd = add_recap_document(d, de, docket_entry, rds_created)
+        if rd is not None:
+            rds_returned.append(rd)
+
+    return (
+        [de for de, _ in des_returned],
+        rds_created,
+        des_created,
+        rds_returned,
+        left_over,
+    )
+
+
+def add_docket_entries(d, docket_entries, tags=None):
+    """Update or create the docket entries and documents.
+
+    Long lists of entries are mostly done in bulk. The rest are done one at a
+    time.
+
+    :param d: The docket object to add things to and use for lookups.
+    :param docket_entries: A list of dicts containing docket entry data.
+    :param tags: A list of tag objects to apply to the recap documents and
+    docket entries created or updated in this function.
+    :returns tuple of a list of created or existing
+    DocketEntry objects,  a list of RECAPDocument objects created, whether
+    any docket entry was created.
+    """
+    # Remove items without a date filed value.
+    docket_entries = [de for de in docket_entries if de.get("date_filed")]
+
+    calculate_recap_sequence_numbers(docket_entries)
+    des_returned, rds_created, des_created, rds_returned = [], [], [], []
+    if len(docket_entries) >= DOCKET_ENTRY_BULK_THRESHOLD:
+        try:
+            with transaction.atomic():
+                result = add_docket_entries_in_bulk(d, docket_entries)
+        except IntegrityError:
+            # Another process added some of the same documents in the
+            # meantime. Doing the entries one at a time copes with that.
+            logger.info(
+                "Unable to add docket entries in bulk while processing '%s'. "
+                "Adding them one by one.",
+                d,
+            )
+        else:
+            (
+                des_returned,
+                rds_created,
+                des_created,
+                rds_returned,
+                docket_entries,
+            ) = result
+
+    (
+        more_des_returned,
+        more_rds_created,
+        more_des_created,
+        more_rds_returned,
+    ) = add_docket_entries_one_by_one(d, docket_entries)
+    des_returned += more_des_returned
+    rds_created += more_rds_created
+    des_created += more_des_created
+    rds_returned += more_rds_returned
+
+    for tag in tags or []:
+        tag.tag_objects(des_returned + rds_returned)
+
+    known_filing_dates = set(
+        filter(
+            None, [d.date_last_filing] + [de.date_filed for de in des_created]
+        )
+    )
     if known_filing_dates:
         Docket.objects.filter(pk=d.pk).update(
             date_last_filing=max(known_filing_dates)
         )
 
-    return des_returned, rds_created, content_updated
+    return des_returned, rds_created, bool(des_created)
 
 
 def check_json_for_terminated_entities(parties) -> bool:
@@ -891,39 +1124,17 @@ def disassociate_extraneous_entities(
     ).delete()
 
 
-@transaction.atomic
-# Retry on transaction deadlocks; see #814.
-@retry(OperationalError, tries=2, delay=1, backoff=1, logger=logger)
-def add_parties_and_attorneys(d, parties):
-    """Add parties and attorneys from the docket data to the docket.
-
-    :param d: The docket to update
-    :param parties: The parties to update the docket with, with their
-    associated attorney objects. This is typically the
-    docket_data['parties'] field.
-    :return: None
+def add_parties_and_attorneys_one_by_one(d, parties):
+    """Add parties and attorneys to a docket, looking each of them up in turn.
 
+    :param d: The docket to update.
+    :param parties: The parties from Juriscraper, with normalized roles.
+    :return: A tuple of the sets of IDs of the parties and of the attorneys
+    that were created or updated.
     """
-    if not parties:
-        # Exit early if no parties. Some dockets don't have any due to user
-        # preference, and if we don't bail early, we risk deleting everything
-        # we have.
-        return
-
-    # Recall that Python is pass by reference. This means that if we mutate
-    # the parties variable in this function and then retry this function (note
-    # the decorator it has), the second time this function runs, it will not be
-    # run with the initial value of the parties variable, but will instead be
-    # run with the mutated value! That will crash because the mutated variable
-    # no longer has the correct shape as it did when it was first passed.
-    # ∴, make a copy of parties as a first step, so that retries work.
-    local_parties = deepcopy(parties)
-
-    normalize_attorney_roles(local_parties)
-
     updated_parties = set()
     updated_attorneys = set()
-    for party in local_parties:
+    for party in parties:
         ps = Party.objects.filter(
             name=party["name"], party_types__docket=d
         ).distinct()
@@ -1000,6 +1211,275 @@ def add_parties_and_attorneys(d, parties):
         for atty in party.get("attorneys", []):
             updated_attorneys.add(add_attorney(atty, p, d))
 
+    return updated_parties, updated_attorneys
+
+
+def pick_earliest_by_name(objs: Iterable[Any]) -> Dict[str, Any]:
+    """Map names to objects. Where several objects share a name, pick the
+    earliest one, like the lookups of parties and attorneys by name do.
+
+    :param objs: Objects with name and date_created attributes.
+    :return: A dict mapping each name to an object.
+    """
+    by_name: Dict[str, Any] = {}
+    for obj in objs:
+        current = by_name.get(obj.name)
+        if current is None or obj.date_created < current.date_created:
+            by_name[obj.name] = obj
+    return by_name
+
+
+def add_parties_and_attorneys_in_bulk(d, parties):
+    """Add parties and attorneys to a docket with a handful of bulk queries.
+
+    This has the same result as add_parties_and_attorneys_one_by_one. The
+    parties, party types, attorneys and roles already on the docket are
+    loaded up front, the changes are worked out in memory and then they're
+    written with bulk_create, bulk_update and a few deletes.
+
+    :param d: The docket to update.
+    :param parties: The parties from Juriscraper, with normalized roles.
+    :return: A tuple of the sets of IDs of the parties and of the attorneys
+    that were created or updated.
+    """
+    parties_by_name = pick_earliest_by_name(
+        Party.objects.filter(party_types__docket=d).distinct()
+    )
+    existing_pts = {
+        (pt.party_id, pt.name): pt for pt in PartyType.objects.filter(docket=d)
+    }
+    attys_by_name = pick_earliest_by_name(
+        Attorney.objects.filter(roles__docket=d).distinct()
+    )
+
+    # Everything below is keyed by names, since new objects don't have IDs
+    # yet and a name always resolves to the same party or attorney.
+    new_parties: List[Party] = []
+    pts: Dict[Tuple[str, str], PartyType] = {}
+    new_pts: List[PartyType] = []
+    counts: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    complaints: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    new_attys: List[Attorney] = []
+    changed_attys: Dict[str, Attorney] = {}
+    org_infos: Dict[str, Dict[str, str]] = {}
+    associations = set()
+    roles: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for party in parties:
+        p = parties_by_name.get(party["name"])
+        if p is None:
+            p = Party(name=party["name"])
+            parties_by_name[party["name"]] = p
+            new_parties.append(p)
+
+        pt_key = (party["name"], party["type"])
+        pt = pts.get(pt_key)
+        if pt is None and p.pk is not None:
+            pt = existing_pts.get((p.pk, party["type"]))
+        if pt is None:
+            pt = PartyType(docket=d, party=p, name=party["type"])
+            new_pts.append(pt)
+        pts[pt_key] = pt
+        pt.extra_info = party.get("extra_info", "")
+        pt.date_terminated = party.get("date_terminated")
+        criminal_data = party.get("criminal_data")
+        if criminal_data:
+            pt.highest_offense_level_opening = criminal_data[
+                "highest_offense_level_opening"
+            ]
+            pt.highest_offense_level_terminated = criminal_data[
+                "highest_offense_level_terminated"
+            ]
+            if criminal_data["counts"]:
+                counts[pt_key] = criminal_data["counts"]
+            if criminal_data["complaints"]:
+                complaints[pt_key] = criminal_data["complaints"]
+
+        for atty in party.get("attorneys", []):
+            atty_org_info, atty_info = normalize_attorney_contact(
+                atty["contact"], fallback_name=atty["name"]
+            )
+            a = attys_by_name.get(atty["name"])
+            if a is None:
+                a = Attorney(name=atty["name"], contact_raw=atty["contact"])
+                attys_by_name[atty["name"]] = a
+                new_attys.append(a)
+
+            if atty["contact"]:
+                if atty_org_info:
+                    lookup_key = atty_org_info["lookup_key"]
+                    org_infos.setdefault(lookup_key, atty_org_info)
+                    associations.add((atty["name"], lookup_key))
+                if atty_info:
+                    a.contact_raw = atty["contact"]
+                    a.email = atty_info["email"]
+                    a.phone = atty_info["phone"]
+                    a.fax = atty_info["fax"]
+                    if a.pk is not None:
+                        changed_attys[atty["name"]] = a
+
+            roles[(party["name"], atty["name"])] = atty["roles"] or [
+                {"role": Role.UNKNOWN, "date_action": None}
+            ]
+
+    # Parties and party types
+    Party.objects.bulk_create(new_parties)
+    for pt in new_pts:
+        # Pick up the ID of the party, now that it has one.
+        pt.party = pt.party
+    PartyType.objects.bulk_update(
+        [pt for pt in pts.values() if pt.pk is not None],
+        [
+            "extra_info",
+            "date_terminated",
+            "highest_offense_level_opening",
+            "highest_offense_level_terminated",
+        ],
+    )
+    PartyType.objects.bulk_create(new_pts)
+
+    # Criminal counts and complaints
+    CriminalCount.objects.filter(
+        party_type__in=[pts[k] for k in counts]
+    ).delete()
+    CriminalCount.objects.bulk_create(
+        [
+            CriminalCount(
+                party_type=pts[k],
+                name=criminal_count["name"],
+                disposition=criminal_count["disposition"],
+                status=CriminalCount.normalize_status(
+                    criminal_count["status"]
+                ),
+            )
+            for k, criminal_counts in counts.items()
+            for criminal_count in criminal_counts
+        ]
+    )
+    CriminalComplaint.objects.filter(
+        party_type__in=[pts[k] for k in complaints]
+    ).delete()
+    CriminalComplaint.objects.bulk_create(
+        [
+            CriminalComplaint(
+                party_type=pts[k],
+                name=complaint["name"],
+                disposition=complaint["disposition"],
+            )
+            for k, criminal_complaints in complaints.items()
+            for complaint in criminal_complaints
+        ]
+    )
+
+    # Attorneys and their organizations
+    Attorney.objects.bulk_create(new_attys)
+    right_now = now()
+    for a in changed_attys.values():
+        a.date_modified = right_now
+    Attorney.objects.bulk_update(
+        changed_attys.values(),
+        ["contact_raw", "email", "phone", "fax", "date_modified"],
+    )
+    if org_infos:
+        # Organizations are shared across dockets, so another process might
+        # add one at the same time.
+        AttorneyOrganization.objects.bulk_create(
+            [AttorneyOrganization(**info) for info in org_infos.values()],
+            ignore_conflicts=True,
+        )
+        org_pks = dict(
+            AttorneyOrganization.objects.filter(
+                lookup_key__in=org_infos.keys()
+            ).values_list("lookup_key", "pk")
+        )
+        AttorneyOrganizationAssociation.objects.bulk_create(
+            [
+                AttorneyOrganizationAssociation(
+                    attorney_id=attys_by_name[atty_name].pk,
+                    attorney_organization_id=org_pks[lookup_key],
+                    docket=d,
+                )
+                for atty_name, lookup_key in associations
+                if lookup_key in org_pks
+            ],
+            ignore_conflicts=True,
+        )
+
+    # Roles. Replace the old roles of every attorney and party pair.
+    pairs = {
+        (parties_by_name[party_name].pk, attys_by_name[atty_name].pk)
+        for party_name, atty_name in roles
+    }
+    Role.objects.filter(
+        pk__in=[
+            pk
+            for pk, party_id, attorney_id in Role.objects.filter(
+                docket=d
+            ).values_list("pk", "party_id", "attorney_id")
+            if (party_id, attorney_id) in pairs
+        ]
+    ).delete()
+    Role.objects.bulk_create(
+        [
+            Role(
+                party_id=parties_by_name[party_name].pk,
+                attorney_id=attys_by_name[atty_name].pk,
+                docket=d,
+                **atty_role,
+            )
+            for (party_name, atty_name), atty_roles in roles.items()
+            for atty_role in atty_roles
+        ]
+    )
+
+    updated_parties = {parties_by_name[party["name"]].pk for party in parties}
+    updated_attorneys = {
+        attys_by_name[atty["name"]].pk
+        for party in parties
+        for atty in party.get("attorneys", [])
+    }
+    return updated_parties, updated_attorneys
+
+
+@transaction.atomic
+# Retry on transaction deadlocks; see #814.
+@retry(OperationalError, tries=2, delay=1, backoff=1, logger=logger)
+def add_parties_and_attorneys(d, parties):
+    """Add parties and attorneys from the docket data to the docket.
+
+    :param d: The docket to update
+    :param parties: The parties to update the docket with, with their
+    associated attorney objects. This is typically the
+    docket_data['parties'] field.
+    :return: None
+
+    """
+    if not parties:
+        # Exit early if no parties. Some dockets don't have any due to user
+        # preference, and if we don't bail early, we risk deleting everything
+        # we have.
+        return
+
+    # Recall that Python is pass by reference. This means that if we mutate
+    # the parties variable in this function and then retry this function (note
+    # the decorator it has), the second time this function runs, it will not be
+    # run with the initial value of the parties variable, but will instead be
+    # run with the mutated value! That will crash because the mutated variable
+    # no longer has the correct shape as it did when it was first passed.
+    # ∴, make a copy of parties as a first step, so that retries work.
+    local_parties = deepcopy(parties)
+
+    normalize_attorney_roles(local_parties)
+
+    if len(local_parties) >= PARTY_BULK_THRESHOLD:
+        updated_parties, updated_attorneys = add_parties_and_attorneys_in_bulk(
+            d, local_parties
+        )
+    else:
+        (
+            updated_parties,
+            updated_attorneys,
+        ) = add_parties_and_attorneys_one_by_one(d, local_parties)
+
     disassociate_extraneous_entities(
         d, local_parties, updated_parties, updated_attorneys
     )
@@ -1178,8 +1658,7 @@ def add_tags_to_objs(tag_names: List[str], objs: Any) -> QuerySet:
         tags.append(tag)
 
     for tag in tags:
-        for obj in objs:
-            tag.tag_object(obj)
+        tag.tag_objects(objs)
     return tags
 
 
@@ -1,4 +1,5 @@
 import logging
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime
 from io import BytesIO
@@ -15,6 +16,8 @@ from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
 from django.utils.timezone import now
 from juriscraper.lib.exceptions import PacerLoginException, ParsingException
 from juriscraper.lib.string_utils import CaseNameTweaker, harmonize
@@ -46,7 +49,10 @@ from cl.corpus_importer.tasks import (
     update_rd_metadata,
 )
 from cl.corpus_importer.utils import mark_ia_upload_needed
-from cl.custom_filters.templatetags.text_filters import oxford_join
+from cl.custom_filters.templatetags.text_filters import (
+    best_case_name,
+    oxford_join,
+)
 from cl.lib.crypto import sha1
 from cl.lib.filesizes import convert_size_to_bytes
 from cl.lib.microservice_utils import microservice
@@ -58,6 +64,7 @@ from cl.lib.pacer_session import (
 from cl.lib.recap_utils import get_document_filename
 from cl.lib.storage import RecapEmailSESStorage
 from cl.lib.string_diff import find_best_match
+from cl.lib.string_utils import trunc
 from cl.recap.mergers import (
     add_bankruptcy_data_to_docket,
     add_claims_to_docket,
@@ -89,6 +96,16 @@ from cl.search.tasks import add_items_to_solr, add_or_update_recap_docket
 logger = logging.getLogger(__name__)
 cnt = CaseNameTweaker()
 
+# The fields of a Docket that merging an IDB row into it can change.
+IDB_MERGE_FIELDS = [
+    "source",
+    "idb_data",
+    "date_filed",
+    "date_terminated",
+    "nature_of_suit",
+    "jurisdiction_type",
+]
+
 
 def process_recap_upload(pq: ProcessingQueue) -> None:
     """Process an item uploaded from an extension or API user.
@@ -568,6 +585,7 @@ def process_recap_docket(self, pk):
     return {
         "docket_pk": d.pk,
         "content_updated": bool(rds_created or content_updated),
+        "de_pks": [de.pk for de in des_returned],
     }
 
 
@@ -835,6 +853,7 @@ def process_recap_docket_history_report(self, pk):
     return {
         "docket_pk": d.pk,
         "content_updated": bool(rds_created or content_updated),
+        "de_pks": [de.pk for de in des_returned],
     }
 
 
@@ -1024,6 +1043,7 @@ def process_recap_appellate_docket(self, pk):
     return {
         "docket_pk": d.pk,
         "content_updated": bool(rds_created or content_updated),
+        "de_pks": [de.pk for de in des_returned],
     }
 
 
@@ -1053,19 +1073,16 @@ def process_recap_appellate_case_query_page(self, pk):
     return None
 
 
-@app.task
-def create_new_docket_from_idb(idb_row):
-    """Create a new docket for the IDB item found. Populate it with all
-    applicable fields.
+def make_docket_from_idb(idb_row: FjcIntegratedDatabase) -> Docket:
+    """Make a new, unsaved docket for an IDB row.
 
-    :param idb_row: An FjcIntegratedDatabase object with which to create a
-    Docket.
-    :return Docket: The created Docket object.
+    :param idb_row: The FjcIntegratedDatabase object to make a Docket for.
+    :return: The Docket.
     """
     case_name = f"{idb_row.plaintiff} v. {idb_row.defendant}"
-    d = Docket(
+    return Docket(
         source=Docket.IDB,
-        court=idb_row.district,
+        court_id=idb_row.district_id,
         idb_data=idb_row,
         date_filed=idb_row.date_filed,
         date_terminated=idb_row.date_terminated,
@@ -1075,6 +1092,35 @@ def create_new_docket_from_idb(idb_row):
         nature_of_suit=idb_row.get_nature_of_suit_display(),
         jurisdiction_type=idb_row.get_jurisdiction_display() or "",
     )
+
+
+def update_docket_from_idb(d: Docket, idb_row: FjcIntegratedDatabase) -> None:
+    """Fill in the fields of a docket from an IDB row, without saving it.
+
+    :param d: The Docket to update.
+    :param idb_row: The FjcIntegratedDatabase object to update it from.
+    :return: None
+    """
+    d.add_idb_source()
+    d.idb_data = idb_row
+    d.date_filed = d.date_filed or idb_row.date_filed
+    d.date_terminated = d.date_terminated or idb_row.date_terminated
+    d.nature_of_suit = d.nature_of_suit or idb_row.get_nature_of_suit_display()
+    d.jurisdiction_type = (
+        d.jurisdiction_type or idb_row.get_jurisdiction_display()
+    )
+
+
+@app.task
+def create_new_docket_from_idb(idb_row):
+    """Create a new docket for the IDB item found. Populate it with all
+    applicable fields.
+
+    :param idb_row: An FjcIntegratedDatabase object with which to create a
+    Docket.
+    :return Docket: The created Docket object.
+    """
+    d = make_docket_from_idb(idb_row)
     try:
         d.save()
     except IntegrityError:
@@ -1098,14 +1144,7 @@ def merge_docket_with_idb(d, idb_row):
     updates.
     :return None
     """
-    d.add_idb_source()
-    d.idb_data = idb_row
-    d.date_filed = d.date_filed or idb_row.date_filed
-    d.date_terminated = d.date_terminated or idb_row.date_terminated
-    d.nature_of_suit = d.nature_of_suit or idb_row.get_nature_of_suit_display()
-    d.jurisdiction_type = (
-        d.jurisdiction_type or idb_row.get_jurisdiction_display()
-    )
+    update_docket_from_idb(d, idb_row)
     try:
         d.save()
     except IntegrityError:
@@ -1155,49 +1194,139 @@ def do_heuristic_match(idb_row, ds):
     return d
 
 
+def get_idb_docket_candidates(ds):
+    """Leave out the dockets that an IDB row should never be merged into.
+
+    :param ds: A Docket queryset.
+    :return: The queryset without criminal, sealed, suppressed and search
+    warrant dockets.
+    """
+    return (
+        ds.exclude(docket_number__icontains="cr")
+        .exclude(case_name__icontains="sealed")
+        .exclude(case_name__icontains="suppressed")
+        .exclude(case_name__icontains="search warrant")
+    )
+
+
+def create_or_merge_from_idb_row(idb_row: FjcIntegratedDatabase) -> None:
+    """Merge an IDB row into the Docket table, or create a new item for it.
+
+    :param idb_row: The FjcIntegratedDatabase object to merge or create.
+    :return: None
+    """
+    ds = get_idb_docket_candidates(
+        Docket.objects.filter(
+            docket_number_core=idb_row.docket_number,
+            court_id=idb_row.district_id,
+        )
+    )
+    count = ds.count()
+    if count == 0:
+        msg = "Creating new docket for IDB row: %s"
+        logger.info(msg, idb_row)
+        create_new_docket_from_idb(idb_row)
+        return
+    elif count == 1:
+        d = ds[0]
+        msg = "Merging Docket %s with IDB row: %s"
+        logger.info(msg, d, idb_row)
+        merge_docket_with_idb(d, idb_row)
+        return
+
+    msg = "Unable to merge. Got %s dockets for row: %s"
+    logger.info(msg, count, idb_row)
+
+    d = do_heuristic_match(idb_row, ds)
+    if d is not None:
+        merge_docket_with_idb(d, idb_row)
+    else:
+        create_new_docket_from_idb(idb_row)
+
+
 @app.task
 def create_or_merge_from_idb_chunk(idb_chunk):
     """Take a chunk of IDB rows and either merge them into the Docket table or
     create new items for them in the docket table.
 
+    The candidate dockets of the whole chunk are looked up in a single query
+    and the rows are sorted into ones to create and ones to merge in memory.
+    Only the rows with several candidates need do_heuristic_match. The
+    dockets are then written with one bulk_update and one bulk_create.
+
+    Rows with the same docket number and court as an earlier row of the chunk
+    are done one by one afterwards, so that they see the dockets made or
+    merged before them.
+
     :param idb_chunk: A list of FjcIntegratedDatabase PKs
     :type idb_chunk: list
     :return: None
     :rtype: None
     """
-    for idb_pk in idb_chunk:
-        idb_row = FjcIntegratedDatabase.objects.get(pk=idb_pk)
-        ds = (
-            Docket.objects.filter(
-                docket_number_core=idb_row.docket_number,
-                court=idb_row.district,
-            )
-            .exclude(docket_number__icontains="cr")
-            .exclude(case_name__icontains="sealed")
-            .exclude(case_name__icontains="suppressed")
-            .exclude(case_name__icontains="search warrant")
+    idb_rows = FjcIntegratedDatabase.objects.in_bulk(idb_chunk)
+    idb_rows = [idb_rows[pk] for pk in idb_chunk if pk in idb_rows]
+    candidates = defaultdict(list)
+    ds = get_idb_docket_candidates(
+        Docket.objects.filter(
+            docket_number_core__in={r.docket_number for r in idb_rows},
+            court_id__in={r.district_id for r in idb_rows},
         )
-        count = ds.count()
-        if count == 0:
-            msg = "Creating new docket for IDB row: %s"
-            logger.info(msg, idb_row)
-            create_new_docket_from_idb(idb_row)
-            continue
-        elif count == 1:
-            d = ds[0]
-            msg = "Merging Docket %s with IDB row: %s"
-            logger.info(msg, d, idb_row)
-            merge_docket_with_idb(d, idb_row)
+    ).only(*IDB_MERGE_FIELDS, "court", "docket_number_core", "case_name")
+    for d in ds.order_by("pk"):
+        candidates[(d.court_id, d.docket_number_core)].append(d)
+
+    to_create: List[Docket] = []
+    to_merge: List[Docket] = []
+    one_by_one: List[FjcIntegratedDatabase] = []
+    seen_keys = set()
+    for idb_row in idb_rows:
+        key = (idb_row.district_id, idb_row.docket_number)
+        if key in seen_keys:
+            one_by_one.append(idb_row)
             continue
+        seen_keys.add(key)
+
+        key_candidates = candidates[key]
+        if len(key_candidates) == 1:
+            d = key_candidates[0]
+        elif len(key_candidates) > 1:
+            msg = "Unable to merge. Got %s dockets for row: %s"
+            logger.info(msg, len(key_candidates), idb_row)
+            d = do_heuristic_match(idb_row, key_candidates)
+        else:
+            d = None
 
-        msg = "Unable to merge. Got %s dockets for row: %s"
-        logger.info(msg, count, idb_row)
-
-        d = do_heuristic_match(idb_row, ds)
-        if d is not None:
-            merge_docket_with_idb(d, idb_row)
+        if d is None:
+            to_create.append(make_docket_from_idb(idb_row))
         else:
-            create_new_docket_from_idb(idb_row)
+            update_docket_from_idb(d, idb_row)
+            d.date_modified = now()
+            to_merge.append(d)
+
+    with transaction.atomic():
+        # An IDB row can only belong to one docket. Let go of the rows that
+        # are about to be linked, and of the links that are about to be
+        # replaced, so that the writes below can't trip over each other.
+        Docket.objects.filter(
+            Q(idb_data__in=[d.idb_data_id for d in to_merge + to_create])
+            | Q(pk__in=[d.pk for d in to_merge])
+        ).update(date_modified=now(), idb_data=None)
+        Docket.objects.bulk_update(
+            to_merge, [*IDB_MERGE_FIELDS, "date_modified"]
+        )
+        for d in to_create:
+            # Done by Docket.save, which bulk_create doesn't call.
+            d.slug = slugify(trunc(best_case_name(d), 75))
+        Docket.objects.bulk_create(to_create)
+    logger.info(
+        "Merged %s and created %s dockets for a chunk of %s IDB rows.",
+        len(to_merge),
+        len(to_create),
+        len(idb_rows),
+    )
+
+    for idb_row in one_by_one:
+        create_or_merge_from_idb_row(idb_row)
 
 
 @app.task
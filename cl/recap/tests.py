@@ -1,5 +1,6 @@
 import json
 import os
+from copy import deepcopy
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 from unittest import mock
@@ -12,7 +13,9 @@ from django.contrib.auth.models import User
 from django.core import mail
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 from juriscraper.pacer import PacerRssFeed
@@ -54,11 +57,15 @@ from cl.people_db.models import (
     Role,
 )
 from cl.recap.api_serializers import PacerFetchQueueSerializer
+from cl.recap.constants import CV_2020
 from cl.recap.factories import (
     FjcIntegratedDatabaseFactory,
     ProcessingQueueFactory,
 )
-from cl.recap.management.commands.import_idb import Command
+from cl.recap.management.commands.import_idb import (
+    Command,
+    bulk_create_or_update_rows,
+)
 from cl.recap.management.commands.reprocess_recap_dockets import (
     extract_unextracted_rds_and_add_to_solr,
 )
@@ -92,6 +99,7 @@ from cl.recap.tasks import (
     process_recap_pdf,
     process_recap_zip,
 )
+from cl.scrapers.tasks import extract_recap_pdf_base
 from cl.search.factories import CourtFactory, DocketFactory
 from cl.search.models import (
     Court,
@@ -99,6 +107,7 @@ from cl.search.models import (
     DocketEntry,
     OriginatingCourtInformation,
     RECAPDocument,
+    Tag,
 )
 from cl.tests import fakes
 from cl.tests.cases import SimpleTestCase, TestCase
@@ -1407,6 +1416,61 @@ class TerminatedEntitiesTest(TestCase):
         self.assertEqual(self.d.parties.count(), count_before)
 
 
+@mock.patch("cl.recap.mergers.PARTY_BULK_THRESHOLD", 0)
+class BulkTerminatedEntitiesTest(TerminatedEntitiesTest):
+    """Does adding parties and attorneys in bulk handle terminated entities
+    the same way?"""
+
+    def test_attorneys_and_criminal_data(self) -> None:
+        """Are attorneys, their organizations and criminal data added, and
+        do parties and attorneys listed twice resolve to the same objects?
+        """
+        contact = (
+            "Lane Powell LLC\n"
+            "301 W. Nothern Lights Blvd., Suite 301\n"
+            "Anchorage, AK 99503-2648\n"
+            "907-276-2631\n"
+            "Email: jamiesonb@lanepowell.com\n"
+        )
+        self.new_powell_data["attorneys"].append(
+            {"contact": contact, "name": "Jamieson", "roles": []}
+        )
+        self.new_powell_data["criminal_data"] = {
+            "highest_offense_level_opening": "Felony",
+            "highest_offense_level_terminated": "",
+            "counts": [
+                {"name": "Count 1", "disposition": "", "status": "pending"}
+            ],
+            "complaints": [],
+        }
+        self.new_mccarthy_data["attorneys"] = [
+            {"contact": contact, "name": "Jamieson", "roles": []}
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            add_parties_and_attorneys(self.d, self.new_party_data)
+        # A fixed number of queries, not a few per party and attorney.
+        self.assertLess(len(ctx.captured_queries), 40)
+
+        a = Attorney.objects.get(name="Jamieson")
+        self.assertEqual(a.email, "jamiesonb@lanepowell.com")
+        self.assertEqual(
+            AttorneyOrganizationAssociation.objects.get(
+                attorney=a, docket=self.d
+            ).attorney_organization.name,
+            "Lane Powell LLC",
+        )
+        self.assertEqual(
+            Role.objects.filter(attorney=a, role=Role.UNKNOWN).count(), 2
+        )
+        pt = PartyType.objects.get(docket=self.d, party=self.p)
+        self.assertEqual(pt.highest_offense_level_opening, "Felony")
+        self.assertEqual(pt.criminal_counts.get().name, "Count 1")
+        # Roosevelt's role was replaced rather than duplicated.
+        self.assertEqual(
+            Role.objects.filter(attorney=self.a, docket=self.d).count(), 1
+        )
+
+
 class RecapMinuteEntriesTest(TestCase):
     """Can we ingest minute and numberless entries properly?"""
 
@@ -1551,6 +1615,64 @@ class RecapMinuteEntriesTest(TestCase):
         self.assertEqual(d.docket_entries.count(), expected_item_count)
 
 
+@mock.patch("cl.recap.mergers.DOCKET_ENTRY_BULK_THRESHOLD", 0)
+class BulkRecapMinuteEntriesTest(RecapMinuteEntriesTest):
+    """Are minute and numbered entries ingested the same way when the
+    numbered ones are added in bulk?"""
+
+    def test_bulk_add_docket_entries(self) -> None:
+        """Are entries and documents created, then updated, without
+        duplicates and with their tags?"""
+        d = Docket.objects.create(source=0, court_id="scotus")
+        tag = Tag.objects.create(name="test-bulk")
+        docket_entries = [
+            {
+                "date_filed": date(2014, 11, 16),
+                "description": f"Entry number {i}",
+                "document_number": str(i),
+                "pacer_doc_id": None,
+                "pacer_seq_no": None,
+            }
+            for i in range(1, 6)
+        ]
+        docket_entries.append(
+            {
+                "date_filed": date(2014, 11, 16),
+                "description": "Attachment",
+                "document_number": "1",
+                "attachment_number": 1,
+                "pacer_doc_id": "1234",
+                "pacer_seq_no": None,
+            }
+        )
+        des, rds_created, content_updated = add_docket_entries(
+            d, deepcopy(docket_entries), tags=[tag]
+        )
+        self.assertTrue(content_updated)
+        self.assertEqual(len(rds_created), 6)
+        self.assertEqual(d.docket_entries.count(), 5)
+        self.assertEqual(tag.docket_entries.count(), 5)
+        self.assertEqual(tag.recap_documents.count(), 6)
+
+        docket_entries[0]["pacer_doc_id"] = "5678"
+        des, rds_created, content_updated = add_docket_entries(
+            d, deepcopy(docket_entries), tags=[tag]
+        )
+        self.assertFalse(content_updated)
+        self.assertEqual(rds_created, [])
+        self.assertEqual(
+            RECAPDocument.objects.filter(docket_entry__docket=d).count(), 6
+        )
+        self.assertEqual(
+            RECAPDocument.objects.get(
+                docket_entry__docket=d,
+                document_number="1",
+                document_type=RECAPDocument.PACER_DOCUMENT,
+            ).pacer_doc_id,
+            "5678",
+        )
+
+
 class DescriptionCleanupTest(SimpleTestCase):
     def test_cleanup(self) -> None:
         # has_entered_date_at_end
@@ -1951,6 +2073,78 @@ class IdbImportTest(SimpleTestCase):
             )
 
 
+class IdbBulkImportTest(TestCase):
+    """Does the bulk IDB loader match rows like create_or_update_row?"""
+
+    def setUp(self) -> None:
+        self.existing = FjcIntegratedDatabaseFactory(
+            dataset_source=CV_2020,
+            docket_number="2000001",
+            origin=1,
+            date_filed=date(2020, 1, 1),
+            plaintiff="Old plaintiff",
+            defendant="Smith",
+        )
+
+    def make_values(self, **kwargs):
+        values = {
+            "dataset_source": CV_2020,
+            "circuit": self.existing.circuit,
+            "district": self.existing.district,
+            "docket_number": "2000001",
+            "origin": 1,
+            "date_filed": date(2020, 1, 1),
+            "plaintiff": "",
+            "defendant": "Smith",
+        }
+        values.update(kwargs)
+        return values
+
+    def test_bulk_create_or_update_rows(self) -> None:
+        """Are rows added and updated, with duplicates done in order?"""
+        stats = bulk_create_or_update_rows(
+            [
+                self.make_values(plaintiff='M/V "Pheonix"\tand \\ more'),
+                self.make_values(docket_number="2000002", plaintiff="First"),
+                self.make_values(docket_number="2000002", plaintiff="Last"),
+                self.make_values(docket_number="2000003", date_filed=None),
+            ]
+        )
+        self.assertEqual(
+            stats, {"added": 2, "updated": 1, "skipped": 0, "one_by_one": 1}
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.plaintiff, 'M/V "Pheonix"\tand \\ more')
+        self.assertEqual(
+            FjcIntegratedDatabase.objects.get(
+                docket_number="2000002"
+            ).plaintiff,
+            "Last",
+        )
+        self.assertIsNone(
+            FjcIntegratedDatabase.objects.get(
+                docket_number="2000003"
+            ).date_filed
+        )
+
+    def test_ambiguous_rows_are_skipped(self) -> None:
+        """Are rows matching several rows, even by defendant, skipped?"""
+        FjcIntegratedDatabaseFactory(
+            dataset_source=CV_2020,
+            circuit=self.existing.circuit,
+            district=self.existing.district,
+            docket_number="2000001",
+            origin=1,
+            date_filed=date(2020, 1, 1),
+            defendant="Smith",
+        )
+        stats = bulk_create_or_update_rows([self.make_values(plaintiff="New")])
+        self.assertEqual(stats["skipped"], 1)
+        self.assertFalse(
+            FjcIntegratedDatabase.objects.filter(plaintiff="New").exists()
+        )
+
+
 class IdbMergeTest(TestCase):
     """Can we successfully do heuristic matching"""
 
@@ -2005,6 +2199,30 @@ class IdbMergeTest(TestCase):
         create_or_merge_from_idb_chunk([self.fcj_2.id])
         self.assertEqual(Docket.objects.count(), 3)
 
+    def test_create_and_merge_in_one_chunk(self) -> None:
+        """Are the rows of a chunk merged and created together, with rows of
+        the same case done one after the other?"""
+        fcj_3 = FjcIntegratedDatabaseFactory(
+            district=self.court,
+            jurisdiction=3,
+            nature_of_suit=440,
+            docket_number="7101462",
+        )
+        create_or_merge_from_idb_chunk(
+            [self.fcj_1.id, self.fcj_2.id, fcj_3.id]
+        )
+        self.assertEqual(Docket.objects.count(), 3)
+        self.assertEqual(
+            Docket.objects.get(idb_data=self.fcj_1).pk, self.docket_1.pk
+        )
+        # The second row with the same case is merged into the docket that
+        # was created for the first one.
+        d = Docket.objects.get(idb_data=fcj_3)
+        self.assertEqual(d.source, Docket.IDB)
+        self.assertEqual(d.docket_number_core, "7101462")
+        self.assertTrue(d.slug)
+        self.assertFalse(Docket.objects.filter(idb_data=self.fcj_2).exists())
+
 
 @mock.patch(
     "cl.recap.tasks.RecapEmailSESStorage.open",
@@ -2147,7 +2365,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_case_auto_subscription(
@@ -2210,7 +2428,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_case_auto_subscription_prev_user(
@@ -2294,7 +2512,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_case_no_auto_subscription(
@@ -2350,7 +2568,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_case_no_auto_subscription_prev_user(
@@ -2475,7 +2693,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_receive_same_recap_email_notification_different_users(
@@ -2573,7 +2791,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_subscribe_by_email_link(
@@ -2637,7 +2855,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_unsubscribe_by_email_link(
@@ -2720,7 +2938,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_recap_email_alerts_integration(
@@ -2834,7 +3052,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_docket_alert_toggle_confirmation_fails(
@@ -2908,7 +3126,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x, c, v, b, d: (None, ""),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     @mock.patch(
@@ -3028,7 +3246,7 @@ class RecapEmailDocketAlerts(TestCase):
         ),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_extract_pdf_for_recap_email(
@@ -3070,7 +3288,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x: "009033568259",
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_nda_recap_email(
@@ -3105,7 +3323,7 @@ class RecapEmailDocketAlerts(TestCase):
         self.assertEqual(docket.docket_number, "21-16499")
 
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     @mock.patch(
@@ -3185,7 +3403,7 @@ class RecapEmailDocketAlerts(TestCase):
         side_effect=lambda z, x: "009033568259",
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_new_nda_recap_email_case_no_auto_subscription(
@@ -3253,7 +3471,7 @@ class RecapEmailDocketAlerts(TestCase):
         ),
     )
     @mock.patch(
-        "cl.api.utils.requests.post",
+        "cl.api.utils.WebhookSession.post",
         side_effect=lambda *args, **kwargs: MockResponse(200, mock_raw=True),
     )
     def test_multiple_docket_nef(
@@ -3651,6 +3869,62 @@ class TestRecapDocumentsExtractContentCommand(TestCase):
         self.assertEqual(rd[0].sha1, "")
         self.assertEqual(rd[0].date_upload, None)
 
+    def test_extract_recap_pdfs_in_batch(self):
+        """Can we extract a batch of documents concurrently, falling back to
+        OCR where the text layer isn't enough?
+        """
+        rds = []
+        for n in range(1, 4):
+            rd = RECAPDocument.objects.create(
+                docket_entry=self.de,
+                document_number=str(n),
+                pacer_doc_id=f"0450557869{n}",
+                document_type=RECAPDocument.PACER_DOCUMENT,
+                is_available=True,
+            )
+            rd.filepath_local.save(self.filename, ContentFile(b"%PDF"))
+            rds.append(rd)
+
+        header = "Appellate Case: 21-1298     Document: 42     Page: 1"
+        texts = {
+            rds[0].pk: "The text layer of the first document.",
+            rds[1].pk: header,
+        }
+
+        def fake_microservice(service, item, params=None):
+            response = mock.MagicMock()
+            response.ok = item.pk in texts
+            if service == "document-extract-ocr":
+                content = "The OCRed text of the second document."
+            else:
+                content = texts.get(item.pk, "")
+            response.json.return_value = {
+                "content": content,
+                "extracted_by_ocr": False,
+            }
+            return response
+
+        with mock.patch(
+            "cl.scrapers.tasks.microservice", side_effect=fake_microservice
+        ) as mock_microservice:
+            processed = extract_recap_pdf_base(
+                [rd.pk for rd in rds], max_in_flight=2
+            )
+
+        # The third document failed, and only the second needed OCR.
+        self.assertEqual(processed, [rds[0].pk, rds[1].pk])
+        self.assertEqual(mock_microservice.call_count, 4)
+        for rd in rds:
+            rd.refresh_from_db()
+        self.assertEqual(rds[0].plain_text, texts[rds[0].pk])
+        self.assertEqual(rds[0].ocr_status, RECAPDocument.OCR_UNNECESSARY)
+        self.assertEqual(
+            rds[1].plain_text, "The OCRed text of the second document."
+        )
+        self.assertEqual(rds[1].ocr_status, RECAPDocument.OCR_COMPLETE)
+        self.assertEqual(rds[2].plain_text, "")
+        self.assertIsNone(rds[2].ocr_status)
+
 
 @mock.patch(
     "cl.recap.tasks.RecapEmailSESStorage.open",
@@ -4138,7 +4412,7 @@ class WebhooksRetries(TestCase):
             next_retry_date=fake_now + timedelta(minutes=3),
         )
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, mock_raw=True
             ),
@@ -4196,7 +4470,7 @@ class WebhooksRetries(TestCase):
         )
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, raw=self.file_stream
             ),
@@ -4279,7 +4553,7 @@ class WebhooksRetries(TestCase):
         webhook_e1_compare = WebhookEvent.objects.filter(pk=webhook_e1.id)
         for status_code, expected_event_status in status_codes_tests:
             with mock.patch(
-                "cl.api.utils.requests.post",
+                "cl.api.utils.WebhookSession.post",
                 side_effect=lambda *args, **kwargs: MockResponse(
                     status_code, raw=self.file_stream
                 ),
@@ -4314,7 +4588,7 @@ class WebhooksRetries(TestCase):
         after receiving an HttpResponse with a failure status code.
         """
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 500,
                 raw=self.file_stream_error,
@@ -4377,7 +4651,7 @@ class WebhooksRetries(TestCase):
         """
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: exec(
                 "raise ConnectionError('Connection Error')"
             ),
@@ -4440,7 +4714,7 @@ class WebhooksRetries(TestCase):
         """
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, raw=self.file_stream
             ),
@@ -4497,7 +4771,7 @@ class WebhooksRetries(TestCase):
         """
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 500, raw=self.file_stream
             ),
@@ -4640,7 +4914,7 @@ class WebhooksRetries(TestCase):
         webhook_e2_compare = WebhookEvent.objects.filter(pk=webhook_e2.id)
         for try_count, notification_out, webhook_enabled in iterations:
             with mock.patch(
-                "cl.api.utils.requests.post",
+                "cl.api.utils.WebhookSession.post",
                 side_effect=lambda *args, **kwargs: MockResponse(
                     500, mock_raw=True
                 ),
@@ -4768,7 +5042,7 @@ class WebhooksRetries(TestCase):
         webhook_compare = Webhook.objects.filter(pk=self.webhook.pk)
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 500, mock_raw=True
             ),
@@ -4798,7 +5072,7 @@ class WebhooksRetries(TestCase):
                 self.assertEqual(webhooks_to_retry, 0)
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, mock_raw=True
             ),
@@ -4875,7 +5149,7 @@ class WebhooksRetries(TestCase):
         for try_count, notification_out in iterations:
             # Try to deliver webhook_e1 and webhook_e2 4 times.
             with mock.patch(
-                "cl.api.utils.requests.post",
+                "cl.api.utils.WebhookSession.post",
                 side_effect=lambda *args, **kwargs: MockResponse(
                     500, mock_raw=True
                 ),
@@ -4900,7 +5174,7 @@ class WebhooksRetries(TestCase):
                         )
 
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 200, mock_raw=True
             ),
@@ -4927,7 +5201,7 @@ class WebhooksRetries(TestCase):
         # 6th try, and disable the webhook endpoint on the 8th try.
         for try_count, notification_out, webhook_enabled in iterations:
             with mock.patch(
-                "cl.api.utils.requests.post",
+                "cl.api.utils.WebhookSession.post",
                 side_effect=lambda *args, **kwargs: MockResponse(
                     500, mock_raw=True
                 ),
@@ -5056,7 +5330,7 @@ class WebhooksRetries(TestCase):
 
         webhook_e1_compare = WebhookEvent.objects.filter(pk=webhook_e1.id)
         with mock.patch(
-            "cl.api.utils.requests.post",
+            "cl.api.utils.WebhookSession.post",
             side_effect=lambda *args, **kwargs: MockResponse(
                 500, mock_raw=True
             ),
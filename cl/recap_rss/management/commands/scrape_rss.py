@@ -2,8 +2,10 @@ import fcntl
 import sys
 import time
 from datetime import datetime, timedelta
+from typing import Dict
 
 from celery.canvas import chain
+from django.db.models import Count, QuerySet
 from django.utils.timezone import make_aware, now
 
 from cl.alerts.tasks import send_alerts_and_webhooks
@@ -22,9 +24,13 @@ from cl.search.tasks import add_items_to_solr
 class Command(VerboseCommand):
     help = "Scrape PACER RSS feeds"
 
-    RSS_MAX_VISIT_FREQUENCY = 5 * 60
+    # Courts are visited between these many seconds apart, depending on how
+    # often their feed changed during the publishing window.
+    RSS_MIN_VISIT_INTERVAL = 2 * 60
+    RSS_MAX_VISIT_INTERVAL = 15 * 60
+    RSS_PUBLISHING_WINDOW = 6 * 60 * 60
     RSS_MAX_PROCESSING_DURATION = 10 * 60
-    DELAY_BETWEEN_ITERATIONS = 1 * 60
+    DELAY_BETWEEN_ITERATIONS = 30
     DELAY_BETWEEN_CACHE_TRIMS = 60 * 60
 
     def add_arguments(self, parser):
@@ -55,6 +61,67 @@ class Command(VerboseCommand):
             "this with --iterations 1",
         )
 
+    @staticmethod
+    def get_latest_statuses(
+        courts: QuerySet, is_sweep: bool
+    ) -> Dict[str, RssFeedStatus]:
+        """Get the latest useful status of every court, in one query.
+
+        :param courts: The courts to get the statuses of.
+        :param is_sweep: Whether to get the statuses of sweeps or of partial
+        crawls.
+        :return: A dict mapping court IDs to their latest status.
+        """
+        statuses = (
+            RssFeedStatus.objects.filter(
+                court__in=courts,
+                is_sweep=is_sweep,
+                status__in=[
+                    RssFeedStatus.PROCESSING_SUCCESSFUL,
+                    RssFeedStatus.UNCHANGED,
+                    RssFeedStatus.PROCESSING_IN_PROGRESS,
+                ],
+            )
+            .order_by("court_id", "-date_created")
+            .distinct("court_id")
+        )
+        return {status.court_id: status for status in statuses}
+
+    def get_visit_intervals(self, courts: QuerySet) -> Dict[str, float]:
+        """Work out how often to visit each court from how often its feed
+        changed during the publishing window.
+
+        Courts are visited about twice per change, within the min and max
+        intervals. Courts that didn't change get the max interval.
+
+        :param courts: The courts to get the intervals of.
+        :return: A dict mapping court IDs to the number of seconds to wait
+        between two visits. Courts that didn't change are left out.
+        """
+        since = now() - timedelta(seconds=self.RSS_PUBLISHING_WINDOW)
+        change_counts = (
+            RssFeedStatus.objects.filter(
+                court__in=courts,
+                is_sweep=False,
+                status=RssFeedStatus.PROCESSING_SUCCESSFUL,
+                date_created__gte=since,
+            )
+            .order_by()
+            .values("court_id")
+            .annotate(count=Count("pk"))
+            .values_list("court_id", "count")
+        )
+        return {
+            court_id: min(
+                max(
+                    self.RSS_PUBLISHING_WINDOW / count / 2,
+                    self.RSS_MIN_VISIT_INTERVAL,
+                ),
+                self.RSS_MAX_VISIT_INTERVAL,
+            )
+            for court_id, count in change_counts
+        }
+
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
 
@@ -88,19 +155,14 @@ class Command(VerboseCommand):
             options["iterations"] == 0
             or iterations_completed < options["iterations"]
         ):
+            # Check the last time we successfully got each feed
+            latest_statuses = self.get_latest_statuses(
+                courts, options["sweep"]
+            )
+            visit_intervals = self.get_visit_intervals(courts)
             for court in courts:
-                # Check the last time we successfully got the feed
-                try:
-                    feed_status = RssFeedStatus.objects.filter(
-                        court=court,
-                        is_sweep=options["sweep"],
-                        status__in=[
-                            RssFeedStatus.PROCESSING_SUCCESSFUL,
-                            RssFeedStatus.UNCHANGED,
-                            RssFeedStatus.PROCESSING_IN_PROGRESS,
-                        ],
-                    ).latest("date_created")
-                except RssFeedStatus.DoesNotExist:
+                feed_status = latest_statuses.get(court.pk)
+                if feed_status is None:
                     # First time running it or status items have been nuked by
                     # an admin. Make a dummy object, but no need to actually
                     # save it to the DB. Make it old.
@@ -114,7 +176,9 @@ class Command(VerboseCommand):
                     # If it's all courts and it's not a sweep, check if we did
                     # it recently.
                     max_visit_ago = now() - timedelta(
-                        seconds=self.RSS_MAX_VISIT_FREQUENCY
+                        seconds=visit_intervals.get(
+                            court.pk, self.RSS_MAX_VISIT_INTERVAL
+                        )
                     )
                     if feed_status.date_created > max_visit_ago:
                         # Processed too recently. Try next court.
@@ -61,6 +61,9 @@ class RssFeedStatus(AbstractDateTimeModel):
 class RssItemCache(models.Model):
     """A cache for hashes of the RSS models to make it faster to look them up
     and merge them in.
+
+    The hashes are normally cached in Redis. This table is only used as a
+    durable fallback, see RSS_ITEM_CACHE_USE_DB.
     """
 
     date_created = models.DateTimeField(
@@ -5,23 +5,27 @@ import logging
 import re
 from calendar import SATURDAY, SUNDAY
 from datetime import datetime, timedelta
-from typing import Optional
+from http import HTTPStatus
+from typing import Dict, List, Optional, Set
 
 import requests
 from celery import Task
 from dateutil import parser
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.mail import send_mail
 from django.db import IntegrityError, transaction
 from django.utils.timezone import now
 from juriscraper.pacer import PacerRssFeed
 from pytz import timezone
-from requests import HTTPError
+from redis import RedisError
+from requests import HTTPError, Response
 
 from cl.alerts.tasks import enqueue_docket_alert
 from cl.celery_init import app
 from cl.lib.crypto import sha256
 from cl.lib.pacer import map_cl_to_pacer_id
+from cl.lib.redis_utils import make_redis_interface
 from cl.lib.types import EmailType
 from cl.recap.constants import COURT_TIMEZONES
 from cl.recap.mergers import (
@@ -160,6 +164,72 @@ def abort_task(task: Task, feed_status: RssFeedStatus):
     return
 
 
+def make_feed_validators_key(court_pk: str) -> str:
+    return f"rss.validators:{court_pk}"
+
+
+def get_conditional_headers(
+    court_pk: str, date_last_built: Optional[datetime]
+) -> Dict[str, str]:
+    """Get the headers to make a conditional GET of a court's feed with.
+
+    The validators of a response are only used if they came with the build
+    date we last processed. If that processing failed, the feed is fetched in
+    full again.
+
+    :param court_pk: The CL ID of the court.
+    :param date_last_built: The build date of the feed we last processed.
+    :return: A dict of If-None-Match and If-Modified-Since headers, empty if
+    we have no usable validators.
+    """
+    if date_last_built is None:
+        return {}
+    try:
+        validators = make_redis_interface("CACHE").hgetall(
+            make_feed_validators_key(court_pk)
+        )
+    except RedisError:
+        return {}
+    if validators.get("build_date") != date_last_built.isoformat():
+        return {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def save_feed_validators(
+    court_pk: str, response: Response, build_date: datetime
+) -> None:
+    """Keep the ETag and Last-Modified headers of a feed for the next
+    conditional GET.
+
+    :param court_pk: The CL ID of the court.
+    :param response: The response of the feed.
+    :param build_date: The build date of the feed in the response.
+    :return: None
+    """
+    validators = {
+        "etag": response.headers.get("ETag", ""),
+        "last_modified": response.headers.get("Last-Modified", ""),
+        "build_date": build_date.isoformat(),
+    }
+    key = make_feed_validators_key(court_pk)
+    try:
+        if not validators["etag"] and not validators["last_modified"]:
+            # This court doesn't support conditional GETs.
+            make_redis_interface("CACHE").delete(key)
+            return
+        pipe = make_redis_interface("CACHE").pipeline()
+        pipe.hset(key, mapping=validators)
+        pipe.expire(key, 60 * 60 * 24)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
 @app.task(bind=True, max_retries=0)
 def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
     """Check if the feed changed
@@ -175,8 +245,9 @@ def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
     If we were being very careful and really optimizing when we crawled these
     feeds, this would cause us trouble because we'd detect a change in this
     field when the actual data hadn't changed. But because we only crawl the
-    feeds at most once every five minutes, and because the gaps we've observed
-    in this field tend to only be about one minute, we can get away with this.
+    feeds at most once every two minutes, because the gaps we've observed in
+    this field tend to only be about one minute, and because items that were
+    already merged are skipped by their hash, we can get away with this.
 
     Other solutions/thoughts we can consider later:
 
@@ -188,14 +259,22 @@ def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
     lastBuildDate value. This is because parsing the feed properly can take
     several seconds for a big feed.
 
+    When the court supports it, the feed is fetched with a conditional GET,
+    so that an unchanged feed isn't downloaded at all.
+
     :param court_pk: The CL ID for the court object.
     :param feed_status_pk: The CL ID for the status object.
     :param date_last_built: The last time the court was scraped.
     """
     feed_status = RssFeedStatus.objects.get(pk=feed_status_pk)
     rss_feed = PacerRssFeed(map_cl_to_pacer_id(court_pk))
+    headers = {}
+    if not feed_status.is_sweep:
+        headers = get_conditional_headers(court_pk, date_last_built)
     try:
-        rss_feed.query()
+        rss_feed.response = requests.get(
+            rss_feed.url, headers=headers, timeout=(60, 300)
+        )
     except requests.RequestException:
         logger.warning(
             f"Network error trying to get RSS feed at {rss_feed.url}"
@@ -203,6 +282,18 @@ def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
         abort_task(self, feed_status)
         return
 
+    if rss_feed.response.status_code == HTTPStatus.NOT_MODIFIED:
+        logger.info(
+            "%s: Feed not modified since %s. Aborting.",
+            feed_status.court_id,
+            date_last_built,
+        )
+        alert_on_staleness(date_last_built, feed_status.court_id, rss_feed.url)
+        feed_status.date_last_build = date_last_built
+        self.request.chain = None
+        mark_status(feed_status, RssFeedStatus.UNCHANGED)
+        return
+
     content = rss_feed.response.content
     if not content:
         try:
@@ -231,6 +322,7 @@ def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
         )
         feed_status.date_last_build = current_build_date
         feed_status.save()
+        save_feed_validators(court_pk, rss_feed.response, current_build_date)
     else:
         try:
             raise Exception(
@@ -289,17 +381,66 @@ def hash_item(item):
     return item_hash
 
 
-def is_cached(item_hash):
-    """Check if a hash is in the RSS Item Cache"""
-    return RssItemCache.objects.filter(hash=item_hash).exists()
+def make_item_cache_key(item_hash: str) -> str:
+    return f"rss.item:{item_hash}"
+
+
+def get_cached_hashes(item_hashes: List[str]) -> Set[str]:
+    """Find which of a feed's item hashes are in the RSS Item Cache, with a
+    single round trip to Redis.
+
+    The RssItemCache table is checked too, with a single query, if it's
+    enabled or if Redis can't be used.
+
+    :param item_hashes: The hashes to look up.
+    :return: The hashes that are cached.
+    """
+    use_db = settings.RSS_ITEM_CACHE_USE_DB
+    cached = set()
+    try:
+        pipe = make_redis_interface("CACHE").pipeline()
+        for item_hash in item_hashes:
+            pipe.exists(make_item_cache_key(item_hash))
+        for item_hash, exists in zip(item_hashes, pipe.execute()):
+            if exists:
+                cached.add(item_hash)
+    except RedisError:
+        use_db = True
+    if use_db:
+        misses = [h for h in item_hashes if h not in cached]
+        cached.update(
+            RssItemCache.objects.filter(hash__in=misses).values_list(
+                "hash", flat=True
+            )
+        )
+    return cached
 
 
 def cache_hash(item_hash):
     """Add a new hash to the RSS Item Cache
 
+    Hashes are kept in Redis until they expire. They're added to the
+    RssItemCache table too if it's enabled or if Redis can't be used.
+
     :param item_hash: A SHA1 hash you wish to cache.
     :returns True if successful, False if not.
     """
+    use_db = settings.RSS_ITEM_CACHE_USE_DB
+    try:
+        added = make_redis_interface("CACHE").set(
+            make_item_cache_key(item_hash),
+            1,
+            nx=True,
+            ex=settings.RSS_ITEM_CACHE_TIMEOUT,
+        )
+        if not added:
+            # Happens during race conditions or when you try to cache
+            # something that's already in there.
+            return False
+    except RedisError:
+        use_db = True
+    if not use_db:
+        return True
     try:
         RssItemCache.objects.create(hash=item_hash)
     except IntegrityError:
@@ -310,6 +451,20 @@ def cache_hash(item_hash):
         return True
 
 
+def uncache_hash(item_hash: str) -> None:
+    """Remove a hash from the RSS Item Cache in Redis, so that an item that
+    failed to merge is tried again. Its row in the RssItemCache table, if
+    any, goes away with the rolled back transaction.
+
+    :param item_hash: The hash to remove.
+    :return: None
+    """
+    try:
+        make_redis_interface("CACHE").delete(make_item_cache_key(item_hash))
+    except RedisError:
+        pass
+
+
 @app.task(bind=True, max_retries=1)
 def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
     """Merge the rss feed contents into CourtListener
@@ -328,38 +483,50 @@ def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
     # RSS feeds are a list of normal Juriscraper docket objects.
     all_rds_created = []
     d_pks_to_alert = []
-    for docket in feed_data:
-        item_hash = hash_item(docket)
-        if is_cached(item_hash):
+    item_hashes = [hash_item(docket) for docket in feed_data]
+    cached_hashes = get_cached_hashes(item_hashes)
+    for docket, item_hash in zip(feed_data, item_hashes):
+        if item_hash in cached_hashes:
             continue
 
-        with transaction.atomic():
-            cached_ok = cache_hash(item_hash)
-            if not cached_ok:
-                # The item is already in the cache, ergo it's getting processed
-                # in another thread/process and we had a race condition.
-                continue
-            d = find_docket_object(
-                court_pk, docket["pacer_case_id"], docket["docket_number"]
-            )
-
-            d.add_recap_source()
-            update_docket_metadata(d, docket)
-            if not d.pacer_case_id:
-                d.pacer_case_id = docket["pacer_case_id"]
-            try:
-                d.save()
-                add_bankruptcy_data_to_docket(d, docket)
-            except IntegrityError as exc:
-                # The docket was created while we looked it up. Retry and it
-                # should associate with the new one instead.
-                raise self.retry(exc=exc)
-            if metadata_only:
-                continue
-
-            des_returned, rds_created, content_updated = add_docket_entries(
-                d, docket["docket_entries"]
-            )
+        cached_ok = False
+        try:
+            with transaction.atomic():
+                cached_ok = cache_hash(item_hash)
+                if not cached_ok:
+                    # The item is already in the cache, ergo it's getting
+                    # processed in another thread/process and we had a race
+                    # condition.
+                    continue
+                d = find_docket_object(
+                    court_pk, docket["pacer_case_id"], docket["docket_number"]
+                )
+
+                d.add_recap_source()
+                update_docket_metadata(d, docket)
+                if not d.pacer_case_id:
+                    d.pacer_case_id = docket["pacer_case_id"]
+                try:
+                    d.save()
+                    add_bankruptcy_data_to_docket(d, docket)
+                except IntegrityError as exc:
+                    # The docket was created while we looked it up. Retry and
+                    # it should associate with the new one instead.
+                    raise self.retry(exc=exc)
+                if metadata_only:
+                    continue
+
+                (
+                    des_returned,
+                    rds_created,
+                    content_updated,
+                ) = add_docket_entries(d, docket["docket_entries"])
+        except BaseException:
+            if cached_ok:
+                # The transaction was rolled back. Take the item out of Redis
+                # too, so that it's merged on the next try.
+                uncache_hash(item_hash)
+            raise
 
         if content_updated:
             newly_enqueued = enqueue_docket_alert(d.pk)
@@ -0,0 +1,309 @@
+import os
+from datetime import timedelta
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from juriscraper.pacer import PacerRssFeed
+from redis import TimeoutError as RedisTimeoutError
+from requests import Response
+
+from cl.lib.redis_utils import make_redis_interface
+from cl.recap_rss.management.commands.scrape_rss import (
+    Command as ScrapeRssCommand,
+)
+from cl.recap_rss.models import RssFeedStatus, RssItemCache
+from cl.recap_rss.tasks import (
+    cache_hash,
+    check_if_feed_changed,
+    get_cached_hashes,
+    get_conditional_headers,
+    get_last_build_date,
+    hash_item,
+    make_feed_validators_key,
+    make_item_cache_key,
+    merge_rss_feed_contents,
+)
+from cl.search.factories import CourtFactory
+from cl.search.models import Court, Docket
+from cl.tests.cases import TestCase
+
+
+class RssItemCacheTest(TestCase):
+    """Are merged RSS items skipped, with Redis or with the DB?"""
+
+    def setUp(self) -> None:
+        self.court = CourtFactory(
+            id="mdb", jurisdiction=Court.FEDERAL_BANKRUPTCY
+        )
+        rss_feed = PacerRssFeed(self.court.pk)
+        path = os.path.join(
+            settings.INSTALL_ROOT,
+            "cl",
+            "recap",
+            "test_assets",
+            "rss_sample_unnumbered_mdb.xml",
+        )
+        with open(path, "rb") as f:
+            rss_feed._parse_text(f.read().decode())
+        self.feed_data = rss_feed.data
+        self.item_hashes = [hash_item(item) for item in self.feed_data]
+        self.r = make_redis_interface("CACHE")
+        self.r.delete(*[make_item_cache_key(h) for h in self.item_hashes])
+
+    def tearDown(self) -> None:
+        self.r.delete(*[make_item_cache_key(h) for h in self.item_hashes])
+
+    def test_miss_is_merged_and_cached(self) -> None:
+        """Is an item that isn't cached merged, and then cached in Redis
+        only?"""
+        merge_rss_feed_contents(self.feed_data, self.court.pk)
+        self.assertEqual(
+            Docket.objects.filter(court=self.court).count(),
+            len(self.feed_data),
+        )
+        for item_hash in self.item_hashes:
+            self.assertTrue(self.r.exists(make_item_cache_key(item_hash)))
+        self.assertFalse(RssItemCache.objects.exists())
+
+    def test_redis_hit_skips_item(self) -> None:
+        """Is an item that's cached in Redis skipped?"""
+        for item_hash in self.item_hashes:
+            self.assertTrue(cache_hash(item_hash))
+        with mock.patch(
+            "cl.recap_rss.tasks.find_docket_object"
+        ) as find_docket_object:
+            merge_rss_feed_contents(self.feed_data, self.court.pk)
+        find_docket_object.assert_not_called()
+
+    def test_set_nx_race(self) -> None:
+        """If another worker caches an item between our check and our merge,
+        do we leave the item to it?"""
+        item_hash = self.item_hashes[0]
+        self.assertTrue(cache_hash(item_hash))
+        self.assertFalse(cache_hash(item_hash))
+        with mock.patch(
+            "cl.recap_rss.tasks.get_cached_hashes", return_value=set()
+        ), mock.patch(
+            "cl.recap_rss.tasks.find_docket_object"
+        ) as find_docket_object:
+            merge_rss_feed_contents(self.feed_data[:1], self.court.pk)
+        find_docket_object.assert_not_called()
+        # The other worker's key is left alone.
+        self.assertTrue(self.r.exists(make_item_cache_key(item_hash)))
+
+    def test_failed_merge_is_uncached(self) -> None:
+        """Is the hash of an item that failed to merge removed, so that the
+        item is tried again?"""
+        with mock.patch(
+            "cl.recap_rss.tasks.find_docket_object",
+            side_effect=ValueError("Boom"),
+        ), self.assertRaises(ValueError):
+            merge_rss_feed_contents(self.feed_data[:1], self.court.pk)
+        self.assertFalse(
+            self.r.exists(make_item_cache_key(self.item_hashes[0]))
+        )
+        self.assertEqual(get_cached_hashes(self.item_hashes[:1]), set())
+
+    @override_settings(RSS_ITEM_CACHE_USE_DB=True)
+    def test_db_is_used_when_enabled(self) -> None:
+        """With RSS_ITEM_CACHE_USE_DB, are hashes kept in the table too, and
+        found there once they're gone from Redis?"""
+        merge_rss_feed_contents(self.feed_data, self.court.pk)
+        self.assertEqual(
+            set(RssItemCache.objects.values_list("hash", flat=True)),
+            set(self.item_hashes),
+        )
+        self.r.delete(*[make_item_cache_key(h) for h in self.item_hashes])
+        self.assertEqual(
+            get_cached_hashes(self.item_hashes), set(self.item_hashes)
+        )
+
+    def test_db_is_used_when_redis_fails(self) -> None:
+        """Do Redis errors other than connection errors fall back to the DB
+        instead of failing the task?"""
+        with mock.patch(
+            "cl.recap_rss.tasks.make_redis_interface",
+            side_effect=RedisTimeoutError("Timed out"),
+        ):
+            merge_rss_feed_contents(self.feed_data, self.court.pk)
+            self.assertEqual(
+                RssItemCache.objects.count(), len(self.item_hashes)
+            )
+            self.assertEqual(
+                get_cached_hashes(self.item_hashes), set(self.item_hashes)
+            )
+            with mock.patch(
+                "cl.recap_rss.tasks.find_docket_object"
+            ) as find_docket_object:
+                merge_rss_feed_contents(self.feed_data, self.court.pk)
+            find_docket_object.assert_not_called()
+
+
+class ConditionalFeedTest(TestCase):
+    """Are feeds fetched with conditional GETs, using the validators of the
+    build we last processed?"""
+
+    def setUp(self) -> None:
+        self.court = CourtFactory(
+            id="mdb", jurisdiction=Court.FEDERAL_BANKRUPTCY
+        )
+        path = os.path.join(
+            settings.INSTALL_ROOT,
+            "cl",
+            "recap",
+            "test_assets",
+            "rss_sample_unnumbered_mdb.xml",
+        )
+        with open(path, "rb") as f:
+            self.content = f.read()
+        self.build_date = get_last_build_date(self.content)
+        self.r = make_redis_interface("CACHE")
+        self.key = make_feed_validators_key(self.court.pk)
+        self.r.delete(self.key)
+
+    def tearDown(self) -> None:
+        self.r.delete(self.key)
+
+    def set_validators(self) -> None:
+        self.r.hset(
+            self.key,
+            mapping={
+                "etag": '"abc123"',
+                "last_modified": "Tue, 24 Apr 2018 22:30:01 GMT",
+                "build_date": self.build_date.isoformat(),
+            },
+        )
+
+    def make_status(self) -> RssFeedStatus:
+        return RssFeedStatus.objects.create(
+            court=self.court,
+            status=RssFeedStatus.PROCESSING_IN_PROGRESS,
+        )
+
+    @staticmethod
+    def make_response(status_code: int, content: bytes = b"") -> Response:
+        response = Response()
+        response.status_code = status_code
+        response._content = content
+        return response
+
+    def test_headers_come_from_last_build(self) -> None:
+        """Are the validators sent, but only if they came with the build
+        date we last processed?"""
+        self.assertEqual(
+            get_conditional_headers(self.court.pk, self.build_date), {}
+        )
+        self.set_validators()
+        self.assertEqual(
+            get_conditional_headers(self.court.pk, self.build_date),
+            {
+                "If-None-Match": '"abc123"',
+                "If-Modified-Since": "Tue, 24 Apr 2018 22:30:01 GMT",
+            },
+        )
+        self.assertEqual(get_conditional_headers(self.court.pk, None), {})
+        self.assertEqual(
+            get_conditional_headers(
+                self.court.pk, self.build_date - timedelta(minutes=5)
+            ),
+            {},
+        )
+
+    @mock.patch("cl.recap_rss.tasks.alert_on_staleness")
+    @mock.patch("cl.recap_rss.tasks.PacerRssFeed.parse")
+    def test_not_modified_is_unchanged(self, parse, alert) -> None:
+        """Is a 304 marked as unchanged, without parsing anything?"""
+        self.set_validators()
+        feed_status = self.make_status()
+        with mock.patch(
+            "cl.recap_rss.tasks.requests.get",
+            return_value=self.make_response(HTTPStatus.NOT_MODIFIED),
+        ) as get:
+            result = check_if_feed_changed(
+                self.court.pk, feed_status.pk, self.build_date
+            )
+        self.assertIsNone(result)
+        self.assertEqual(
+            get.call_args.kwargs["headers"],
+            {
+                "If-None-Match": '"abc123"',
+                "If-Modified-Since": "Tue, 24 Apr 2018 22:30:01 GMT",
+            },
+        )
+        parse.assert_not_called()
+        feed_status.refresh_from_db()
+        self.assertEqual(feed_status.status, RssFeedStatus.UNCHANGED)
+        self.assertEqual(feed_status.date_last_build, self.build_date)
+
+    @mock.patch("cl.recap_rss.tasks.alert_on_staleness")
+    def test_validators_are_saved(self, alert) -> None:
+        """Are the validators of a 200 saved with its build date?"""
+        response = self.make_response(HTTPStatus.OK, self.content)
+        response.headers["ETag"] = '"def456"'
+        response.headers["Last-Modified"] = "Tue, 24 Apr 2018 22:30:01 GMT"
+        feed_status = self.make_status()
+        with mock.patch(
+            "cl.recap_rss.tasks.requests.get", return_value=response
+        ) as get:
+            check_if_feed_changed(
+                self.court.pk, feed_status.pk, self.build_date
+            )
+        self.assertEqual(get.call_args.kwargs["headers"], {})
+        self.assertEqual(
+            self.r.hgetall(self.key),
+            {
+                "etag": '"def456"',
+                "last_modified": "Tue, 24 Apr 2018 22:30:01 GMT",
+                "build_date": self.build_date.isoformat(),
+            },
+        )
+        self.assertGreater(self.r.ttl(self.key), 0)
+        # The build date didn't change, so the feed isn't merged.
+        feed_status.refresh_from_db()
+        self.assertEqual(feed_status.status, RssFeedStatus.UNCHANGED)
+
+    def test_visit_intervals_are_clamped(self) -> None:
+        """Are courts visited about twice per change, but no more often
+        than the min interval and no less often than the max interval?"""
+        courts = {
+            "mdb": (self.court, 1),
+            "nysb": (CourtFactory(id="nysb"), 20),
+            "cand": (CourtFactory(id="cand"), 500),
+            "nyed": (CourtFactory(id="nyed"), 0),
+        }
+        for court, count in courts.values():
+            RssFeedStatus.objects.bulk_create(
+                [
+                    RssFeedStatus(
+                        court=court,
+                        status=RssFeedStatus.PROCESSING_SUCCESSFUL,
+                    )
+                    for _ in range(count)
+                ]
+            )
+        # Statuses that aren't successful partial crawls don't count.
+        RssFeedStatus.objects.create(
+            court=courts["nyed"][0],
+            status=RssFeedStatus.UNCHANGED,
+        )
+        RssFeedStatus.objects.create(
+            court=courts["nyed"][0],
+            status=RssFeedStatus.PROCESSING_SUCCESSFUL,
+            is_sweep=True,
+        )
+        command = ScrapeRssCommand()
+        intervals = command.get_visit_intervals(
+            Court.objects.filter(pk__in=courts.keys())
+        )
+        self.assertEqual(
+            intervals,
+            {
+                "mdb": command.RSS_MAX_VISIT_INTERVAL,
+                "nysb": command.RSS_PUBLISHING_WINDOW / 20 / 2,
+                "cand": command.RSS_MIN_VISIT_INTERVAL,
+            },
+        )
+        self.assertEqual(command.RSS_MIN_VISIT_INTERVAL, 2 * 60)
+        self.assertEqual(command.RSS_MAX_VISIT_INTERVAL, 15 * 60)
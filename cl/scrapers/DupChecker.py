@@ -1,7 +1,12 @@
+from typing import Dict, Iterable, Set, Tuple
+
 from juriscraper.AbstractSite import logger
 
 from cl.scrapers.models import UrlHash
 
+# The number of values to look up per query when prefetching.
+PREFETCH_CHUNK_SIZE = 1000
+
 
 class DupChecker(dict):
     def __init__(
@@ -14,6 +19,9 @@ class DupChecker(dict):
         self.dup_count = 0
         self.last_found_date = None
         self.emulate_break = False
+        # The values that were prefetched and the ones of them that exist,
+        # by object type and lookup field.
+        self.prefetched: Dict[Tuple[type, str], Tuple[Set, Set]] = {}
         super(DupChecker, self).__init__(*args, **kwargs)
 
     def _increment(self, current_date):
@@ -68,6 +76,50 @@ class DupChecker(dict):
             # no matter what.
             return False
 
+    @staticmethod
+    def _get_lookup_field(lookup_by: str) -> str:
+        if lookup_by not in ["sha1", "download_url"]:
+            raise NotImplementedError("Unknown lookup_by parameter.")
+        return lookup_by
+
+    def prefetch(
+        self,
+        object_type,
+        lookup_values: Iterable[str],
+        lookup_by: str = "sha1",
+    ) -> None:
+        """Look up many values at once, so that press_on can check them
+        without a query each.
+
+        Use this when every item of a Site is going to be looked up anyway,
+        like in a full crawl.
+
+        :param object_type: The model to look the values up in.
+        :param lookup_values: The values to look up.
+        :param lookup_by: The field to look them up by.
+        :return: None
+        """
+        field = self._get_lookup_field(lookup_by)
+        checked, existing = self.prefetched.setdefault(
+            (object_type, lookup_by), (set(), set())
+        )
+        values = list(set(lookup_values) - checked)
+        for i in range(0, len(values), PREFETCH_CHUNK_SIZE):
+            chunk = values[i : i + PREFETCH_CHUNK_SIZE]
+            existing.update(
+                object_type.objects.filter(
+                    **{f"{field}__in": chunk}
+                ).values_list(field, flat=True)
+            )
+            checked.update(chunk)
+
+    def _exists(self, object_type, lookup_value: str, lookup_by: str) -> bool:
+        field = self._get_lookup_field(lookup_by)
+        prefetched = self.prefetched.get((object_type, lookup_by))
+        if prefetched and lookup_value in prefetched[0]:
+            return lookup_value in prefetched[1]
+        return object_type.objects.filter(**{field: lookup_value}).exists()
+
     def press_on(
         self,
         object_type,
@@ -101,14 +153,7 @@ class DupChecker(dict):
             return False
 
         # check for a duplicate in the db.
-        if lookup_by == "sha1":
-            exists = object_type.objects.filter(sha1=lookup_value).exists()
-        elif lookup_by == "download_url":
-            exists = object_type.objects.filter(
-                download_url=lookup_value
-            ).exists()
-        else:
-            raise NotImplementedError("Unknown lookup_by parameter.")
+        exists = self._exists(object_type, lookup_value, lookup_by)
 
         if exists:
             logger.info(
@@ -149,4 +194,9 @@ class DupChecker(dict):
                 # say that we shouldn't press on, since the item already exists.
                 return False
         else:
+            prefetched = self.prefetched.get((object_type, lookup_by))
+            if prefetched and lookup_value in prefetched[0]:
+                # The caller is about to save the item, so a later item with
+                # the same value is a duplicate, as it'd be without prefetching.
+                prefetched[1].add(lookup_value)
             return True
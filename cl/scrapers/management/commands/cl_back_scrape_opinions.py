@@ -6,6 +6,9 @@ from cl.scrapers.management.commands import cl_scrape_opinions
 
 
 class Command(cl_scrape_opinions.Command):
+    # Back scrapes take as long as they take.
+    default_court_timeout = 0
+
     def parse_and_scrape_site(
         self,
         mod: AbstractSite,
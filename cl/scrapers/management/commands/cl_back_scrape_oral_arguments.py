@@ -5,6 +5,9 @@ from cl.scrapers.management.commands import cl_scrape_oral_arguments
 
 
 class Command(cl_scrape_oral_arguments.Command):
+    # Back scrapes take as long as they take.
+    default_court_timeout = 0
+
     def parse_and_scrape_site(self, mod, full_crawl):
         court_str = mod.__name__.split(".")[-1].split("_")[0]
         logger.info(f'Using court_str: "{court_str}"')
@@ -1,12 +1,26 @@
 import signal
 import sys
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for_futures
 from datetime import date
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
 
 from django.core.files.base import ContentFile
 from django.core.management.base import CommandError
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils.encoding import force_bytes
 from eyecite.find import get_citations
 from juriscraper.lib.importer import build_module_list
@@ -22,7 +36,12 @@ from cl.people_db.lookup_utils import lookup_judges_by_messy_str
 from cl.scrapers.DupChecker import DupChecker
 from cl.scrapers.models import ErrorLog
 from cl.scrapers.tasks import extract_doc_content
-from cl.scrapers.utils import get_binary_content, get_extension, signal_handler
+from cl.scrapers.utils import (
+    die_now,
+    get_binary_content,
+    get_extension,
+    signal_handler,
+)
 from cl.search.models import (
     SEARCH_TYPES,
     Citation,
@@ -32,8 +51,6 @@ from cl.search.models import (
     OpinionCluster,
 )
 
-# for use in catching the SIGINT (Ctrl+4)
-die_now = False
 cnt = CaseNameTweaker()
 
 
@@ -168,8 +185,18 @@ def save_everything(
 class Command(VerboseCommand):
     help = "Runs the Juriscraper toolkit against one or many jurisdictions."
 
+    # The default number of seconds a court gets before it's stopped.
+    default_court_timeout = 30 * 60
+
+    # The number of items of a full crawl that are downloaded and checked
+    # for duplicates together. This bounds how much downloaded content is
+    # held in memory at once.
+    full_crawl_window = 50
+
     def __init__(self, stdout=None, stderr=None, no_color=False):
         super(Command, self).__init__(stdout=None, stderr=None, no_color=False)
+        # The deadline of the court being scraped by each worker thread.
+        self._court = threading.local()
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -187,8 +214,8 @@ class Command(VerboseCommand):
             type=int,
             default=30,
             help=(
-                "The length of time in minutes it takes to crawl "
-                "all requested courts. Particularly useful if it is "
+                "The length of time in minutes between two crawls of "
+                "a court in daemon mode. Particularly useful if it is "
                 "desired to quickly scrape over all courts. Default "
                 "is 30 minutes."
             ),
@@ -214,6 +241,122 @@ class Command(VerboseCommand):
             default=False,
             help="Disable duplicate aborting.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="The number of courts to scrape at once.",
+        )
+        parser.add_argument(
+            "--court-timeout",
+            type=int,
+            default=self.default_court_timeout,
+            help=(
+                "The number of seconds a court can take before it's stopped. "
+                "It's stopped between two items, without updating its site "
+                "hash, so that it's picked up again on the next run. Use 0 "
+                "for no timeout."
+            ),
+        )
+        parser.add_argument(
+            "--host-delay",
+            type=int,
+            default=10,
+            help=(
+                "The number of seconds to wait between two courts hosted on "
+                "the same website. Courts on the same website are never "
+                "scraped at once."
+            ),
+        )
+
+    def download_item(
+        self, site, item: Dict[str, Any], court: Court
+    ) -> Optional[Tuple[bytes, str]]:
+        """Download an item of a Site and hash it.
+
+        :param site: The Site the item is from.
+        :param item: The item to download.
+        :param court: The court of the Site.
+        :return: The cleaned up content of the item and its sha1, or None if
+        it couldn't be downloaded.
+        """
+        msg, r = get_binary_content(
+            item["download_urls"],
+            site.cookies,
+            method=site.method,
+        )
+        if msg:
+            logger.warning(msg)
+            ErrorLog(log_level="WARNING", court=court, message=msg).save()
+            return None
+
+        content = site.cleanup_content(r.content)
+        # request.content is sometimes a str, sometimes unicode, so
+        # force it all to be bytes, pleasing hashlib.
+        return content, sha1(force_bytes(content))
+
+    def iter_downloads(
+        self,
+        site,
+        court: Court,
+        full_crawl: bool,
+        prefetch: Callable[
+            [List[Tuple[Dict[str, Any], Tuple[bytes, str]]]], None
+        ],
+    ) -> Iterator[Tuple[int, Dict[str, Any], Optional[Tuple[bytes, str]]]]:
+        """Download the items of a Site, until the court runs out of time.
+
+        A full crawl downloads every item anyway, so it downloads them in
+        windows of full_crawl_window items, and checks each window for
+        duplicates at once before yielding it. Other crawls download the
+        items one at a time, so that they can stop early.
+
+        :param site: The Site to download the items of.
+        :param court: The court of the Site.
+        :param full_crawl: Whether this is a full crawl.
+        :param prefetch: Called with the items of each window of a full crawl
+        that were downloaded, and their downloads, to prefetch their
+        duplicate checks.
+        :return: An iterator of the index of each item, the item, and its
+        download, as returned by download_item.
+        """
+        window_size = self.full_crawl_window if full_crawl else 1
+        for start in range(0, len(site), window_size):
+            window = []
+            for i in range(start, min(start + window_size, len(site))):
+                if self.court_timed_out():
+                    return
+                item = site[i]
+                window.append((i, item, self.download_item(site, item, court)))
+            if full_crawl:
+                prefetch(
+                    [
+                        (item, download)
+                        for _, item, download in window
+                        if download
+                    ]
+                )
+            yield from window
+
+    @staticmethod
+    def get_lookup_params(
+        court_str: str, item: Dict[str, Any], sha1_hash: str
+    ) -> Dict[str, str]:
+        """Get the params to give DupChecker to look an item up with."""
+        if (
+            court_str == "nev"
+            and item["precedential_statuses"] == "Unpublished"
+        ):
+            # Nevada's non-precedential cases have different SHA1 sums
+            # every time.
+            return {
+                "lookup_value": item["download_urls"],
+                "lookup_by": "download_url",
+            }
+        return {
+            "lookup_value": sha1_hash,
+            "lookup_by": "sha1",
+        }
 
     def scrape_court(self, site, full_crawl=False, ocr_available=True):
         # Get the court object early for logging
@@ -229,19 +372,25 @@ class Command(VerboseCommand):
         if site.cookies:
             logger.info(f"Using cookies: {site.cookies}")
         logger.debug(f"#{len(site)} opinions found.")
+
+        def prefetch(downloads):
+            lookups: Dict[str, List[str]] = {}
+            for item, (_, sha1_hash) in downloads:
+                params = self.get_lookup_params(court_str, item, sha1_hash)
+                lookups.setdefault(params["lookup_by"], []).append(
+                    params["lookup_value"]
+                )
+            for lookup_by, values in lookups.items():
+                dup_checker.prefetch(Opinion, values, lookup_by=lookup_by)
+
         added = 0
-        for i, item in enumerate(site):
-            msg, r = get_binary_content(
-                item["download_urls"],
-                site.cookies,
-                method=site.method,
-            )
-            if msg:
-                logger.warning(msg)
-                ErrorLog(log_level="WARNING", court=court, message=msg).save()
+        downloads = self.iter_downloads(site, court, full_crawl, prefetch)
+        for i, item, download in downloads:
+            if self.court_timed_out():
+                break
+            if download is None:
                 continue
-
-            content = site.cleanup_content(r.content)
+            content, sha1_hash = download
 
             current_date = item["case_dates"]
             try:
@@ -249,24 +398,7 @@ class Command(VerboseCommand):
             except IndexError:
                 next_date = None
 
-            # request.content is sometimes a str, sometimes unicode, so
-            # force it all to be bytes, pleasing hashlib.
-            sha1_hash = sha1(force_bytes(content))
-            if (
-                court_str == "nev"
-                and item["precedential_statuses"] == "Unpublished"
-            ):
-                # Nevada's non-precedential cases have different SHA1 sums
-                # every time.
-                lookup_params = {
-                    "lookup_value": item["download_urls"],
-                    "lookup_by": "download_url",
-                }
-            else:
-                lookup_params = {
-                    "lookup_value": sha1_hash,
-                    "lookup_by": "sha1",
-                }
+            lookup_params = self.get_lookup_params(court_str, item, sha1_hash)
 
             proceed = dup_checker.press_on(
                 Opinion, current_date, next_date, **lookup_params
@@ -307,6 +439,12 @@ class Command(VerboseCommand):
             )
             added += 1
 
+        if self.court_timed_out():
+            logger.warning(
+                f"{site.court_id}: Timed out after {added} opinions."
+            )
+            return
+
         # Update the hash if everything finishes properly.
         logger.debug(
             f"{site.court_id}: Successfully crawled {added}/{len(site)} opinions."
@@ -315,13 +453,51 @@ class Command(VerboseCommand):
             # Only update the hash if no errors occurred.
             dup_checker.update_site_hash(site.hash)
 
+    def court_timed_out(self) -> bool:
+        """Whether the court being scraped by this thread is out of time.
+
+        :return: True if the court should be stopped.
+        """
+        deadline = getattr(self._court, "deadline", None)
+        return deadline is not None and time.monotonic() > deadline
+
     def parse_and_scrape_site(self, mod, full_crawl):
         site = mod.Site().parse()
         self.scrape_court(site, full_crawl)
 
+    def run_court(self, mod, full_crawl: bool, timeout: int) -> None:
+        """Scrape a court from a worker thread.
+
+        :param mod: The Juriscraper module of the court.
+        :param full_crawl: Whether to disable duplicate aborting.
+        :param timeout: The number of seconds the court gets, or 0 for no
+        timeout.
+        :return: None
+        """
+        self._court.deadline = time.monotonic() + timeout if timeout else None
+        try:
+            self.parse_and_scrape_site(mod, full_crawl)
+        finally:
+            self._court.deadline = None
+            # Threads get their own DB connection. Don't leak it.
+            connection.close()
+
+    @staticmethod
+    def get_host(mod) -> str:
+        """Get the website a court is scraped from, to throttle the requests
+        made to it.
+
+        :param mod: The Juriscraper module of the court.
+        :return: The host of the site, or the name of the module if it can't
+        be told.
+        """
+        try:
+            return urlparse(mod.Site().url).netloc or mod.__name__
+        except Exception:
+            return mod.__name__
+
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
-        global die_now
 
         # this line is used for handling SIGTERM (CTRL+4), so things can die
         # safely
@@ -331,38 +507,110 @@ class Command(VerboseCommand):
         if not len(module_strings):
             raise CommandError("Unable to import module or package. Aborting.")
 
-        logger.info("Starting up the scraper.")
-        num_courts = len(module_strings)
-        wait = (options["rate"] * 60) / num_courts
-        i = 0
-        while i < num_courts:
-            # this catches SIGTERM, so the code can be killed safely.
-            if die_now:
-                logger.info("The scraper has stopped.")
-                sys.exit(1)
-
-            package, module = module_strings[i].rsplit(".", 1)
-
-            mod = __import__(
-                f"{package}.{module}", globals(), locals(), [module]
+        mods = []
+        for module_string in module_strings:
+            package, module = module_string.rsplit(".", 1)
+            mods.append(
+                __import__(
+                    f"{package}.{module}", globals(), locals(), [module]
+                )
             )
-            try:
-                self.parse_and_scrape_site(mod, options["full_crawl"])
-            except Exception as e:
-                capture_exception(e)
-            last_court_in_list = i == (num_courts - 1)
-            daemon_mode = options["daemon"]
-            if last_court_in_list:
-                if not daemon_mode:
-                    break
-                else:
-                    logger.info(
-                        "All jurisdictions done. Looping back to "
-                        "the beginning because daemon mode is enabled."
-                    )
-                    i = 0
-            else:
-                i += 1
-            time.sleep(wait)
 
+        logger.info("Starting up the scraper.")
+        self.scrape_concurrently(
+            mods,
+            full_crawl=options["full_crawl"],
+            daemon_mode=options["daemon"],
+            rate=options["rate"],
+            workers=options["workers"],
+            court_timeout=options["court_timeout"],
+            host_delay=options["host_delay"],
+        )
+        if die_now.is_set():
+            logger.info("The scraper has stopped.")
+            sys.exit(1)
         logger.info("The scraper has stopped.")
+
+    def scrape_concurrently(
+        self,
+        mods: List[Any],
+        full_crawl: bool,
+        daemon_mode: bool,
+        rate: int,
+        workers: int,
+        court_timeout: int,
+        host_delay: int,
+    ) -> None:
+        """Scrape courts in a pool of worker threads, so that a slow court
+        doesn't hold the others up.
+
+        Courts on the same website are scraped one at a time, with host_delay
+        seconds between them. In daemon mode, each court is scraped again
+        rate minutes after its last scrape started, or as soon as a worker is
+        free if that's later.
+
+        When a SIGTERM is caught, the courts being scraped are finished, and
+        no more are started.
+
+        :param mods: The Juriscraper modules of the courts to scrape.
+        :param full_crawl: Whether to disable duplicate aborting.
+        :param daemon_mode: Whether to scrape the courts forever.
+        :param rate: In daemon mode, the number of minutes between two
+        scrapes of a court.
+        :param workers: The number of courts to scrape at once.
+        :param court_timeout: The number of seconds a court gets.
+        :param host_delay: The number of seconds between two courts on the
+        same website.
+        :return: None
+        """
+        hosts = [self.get_host(mod) for mod in mods]
+        # The time each court is due at, by its index in mods.
+        due_at: Dict[int, float] = {i: 0.0 for i in range(len(mods))}
+        running: Dict[Future, Tuple[int, float]] = {}
+        busy_hosts: Set[str] = set()
+        host_free_at: Dict[str, float] = {}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                now = time.monotonic()
+                if not die_now.is_set():
+                    for i in sorted(due_at, key=due_at.get):
+                        if len(running) >= workers or due_at[i] > now:
+                            break
+                        host = hosts[i]
+                        if (
+                            host in busy_hosts
+                            or host_free_at.get(host, 0) > now
+                        ):
+                            continue
+                        del due_at[i]
+                        busy_hosts.add(host)
+                        future = pool.submit(
+                            self.run_court, mods[i], full_crawl, court_timeout
+                        )
+                        running[future] = (i, now)
+
+                if not running:
+                    if die_now.is_set() or not due_at:
+                        break
+                    # Nothing to do until a court is due or a host is free.
+                    die_now.wait(1)
+                    continue
+
+                done, _ = wait_for_futures(
+                    running, timeout=1, return_when=FIRST_COMPLETED
+                )
+                now = time.monotonic()
+                for future in done:
+                    i, started = running.pop(future)
+                    busy_hosts.discard(hosts[i])
+                    host_free_at[hosts[i]] = now + host_delay
+                    try:
+                        future.result()
+                    except Exception as e:
+                        capture_exception(e)
+                    logger.info(
+                        f"{mods[i].__name__}: Done in {now - started:0.0f}s."
+                    )
+                    if daemon_mode:
+                        due_at[i] = started + rate * 60
@@ -4,21 +4,18 @@ from typing import Any, Dict, Tuple, Union
 
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.utils.encoding import force_bytes
 from juriscraper.lib.string_utils import CaseNameTweaker
 
 from cl.alerts.models import RealTimeQueue
 from cl.audio.models import Audio
 from cl.lib.command_utils import logger
-from cl.lib.crypto import sha1
 from cl.lib.import_lib import get_scotus_judges
 from cl.lib.string_utils import trunc
 from cl.people_db.lookup_utils import lookup_judges_by_messy_str
 from cl.scrapers.DupChecker import DupChecker
 from cl.scrapers.management.commands import cl_scrape_opinions
-from cl.scrapers.models import ErrorLog
 from cl.scrapers.tasks import process_audio_file
-from cl.scrapers.utils import get_binary_content, get_extension
+from cl.scrapers.utils import get_extension
 from cl.search.models import SEARCH_TYPES, Court, Docket
 
 cnt = CaseNameTweaker()
@@ -102,6 +99,9 @@ def make_objects(
 
 
 class Command(cl_scrape_opinions.Command):
+    # Audio files are much bigger than opinions.
+    full_crawl_window = 10
+
     def scrape_court(
         self,
         site,
@@ -120,18 +120,19 @@ class Command(cl_scrape_opinions.Command):
 
         if site.cookies:
             logger.info(f"Using cookies: {site.cookies}")
-        for i, item in enumerate(site):
-            msg, r = get_binary_content(
-                item["download_urls"],
-                site.cookies,
-                method=site.method,
+
+        def prefetch(downloads):
+            dup_checker.prefetch(
+                Audio, [d[1] for _, d in downloads], lookup_by="sha1"
             )
-            if msg:
-                logger.warning(msg)
-                ErrorLog(log_level="WARNING", court=court, message=msg).save()
-                continue
 
-            content = site.cleanup_content(r.content)
+        downloads = self.iter_downloads(site, court, full_crawl, prefetch)
+        for i, item, download in downloads:
+            if self.court_timed_out():
+                break
+            if download is None:
+                continue
+            content, sha1_hash = download
 
             current_date = item["case_dates"]
             try:
@@ -139,9 +140,6 @@ class Command(cl_scrape_opinions.Command):
             except IndexError:
                 next_date = None
 
-            # request.content is sometimes a str, sometimes unicode, so
-            # force it all to be bytes, pleasing hashlib.
-            sha1_hash = sha1(force_bytes(content))
             onwards = dup_checker.press_on(
                 Audio,
                 current_date,
@@ -179,6 +177,10 @@ class Command(cl_scrape_opinions.Command):
                     )
                 )
 
+        if self.court_timed_out():
+            logger.warning(f"{site.court_id}: Timed out.")
+            return
+
         # Update the hash if everything finishes properly.
         logger.info(f"{site.court_id}: Successfully crawled oral arguments.")
         if not full_crawl:
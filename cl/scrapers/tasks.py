@@ -1,12 +1,16 @@
 import logging
 import random
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import List, Optional, Tuple, Union
 
 import requests
 from django.apps import apps
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.utils import timezone
 from juriscraper.lib.exceptions import PacerLoginException
 from juriscraper.pacer import CaseQuery, PacerSession
 from redis import ConnectionError as RedisConnectionError
@@ -24,6 +28,7 @@ from cl.lib.pacer import map_cl_to_pacer_id
 from cl.lib.pacer_session import get_or_cache_pacer_cookies
 from cl.lib.privacy_tools import anonymize, set_blocked_status
 from cl.lib.recap_utils import needs_ocr
+from cl.lib.search_utils import clean_up_recap_document_file
 from cl.lib.string_utils import trunc
 from cl.lib.utils import is_iter
 from cl.recap.mergers import save_iquery_to_docket
@@ -133,8 +138,9 @@ def extract_doc_content(
         )
         return
 
-    content = response.json()["content"]
-    extracted_by_ocr = response.json()["extracted_by_ocr"]
+    data = response.json()
+    content = data["content"]
+    extracted_by_ocr = data["extracted_by_ocr"]
     # For PDF documents, if there's no content after the extraction without OCR
     # Let's try to extract using OCR.
     if (
@@ -148,10 +154,10 @@ def extract_doc_content(
             params={"ocr_available": ocr_available},
         )
         if response.ok:
-            content = response.json()["content"]
+            data = response.json()
+            content = data["content"]
             extracted_by_ocr = True
 
-    data = response.json()
     extension = opinion.local_path.name.split(".")[-1]
     opinion.extracted_by_ocr = extracted_by_ocr
 
@@ -237,17 +243,108 @@ def extract_recap_pdf(
     return extract_recap_pdf_base(pks, ocr_available, check_if_needed)
 
 
+# The number of RECAPDocuments to extract and save at a time, and how many of
+# them to send to doctor at once.
+RECAP_EXTRACTION_BATCH_SIZE = 100
+RECAP_EXTRACTION_MAX_IN_FLIGHT = 8
+
+
+@dataclass
+class RecapExtraction:
+    """The text doctor extracted from a RECAP PDF."""
+
+    content: str
+    extracted_by_ocr: bool
+    ocr_needed: bool
+
+
+def extract_recap_document_text(
+    rd: RECAPDocument, ocr_available: bool
+) -> Optional[RecapExtraction]:
+    """Have doctor extract the text of a RECAPDocument, falling back to OCR
+    if the text layer of the PDF isn't good enough.
+
+    This only talks to storage and doctor, not to the DB, so it can be run
+    from worker threads.
+
+    :param rd: The RECAPDocument to extract.
+    :param ocr_available: Whether OCR can be used.
+    :return: The extracted text, or None if the extraction failed.
+    :raises FileNotFoundError: If the PDF isn't in storage.
+    """
+    # Open the file here so that a missing file is raised to the caller
+    # instead of being cleaned up from this thread.
+    rd.filepath_local.open(mode="rb")
+    try:
+        response = microservice(
+            service="document-extract",
+            item=rd,
+        )
+        if not response.ok:
+            return None
+
+        data = response.json()
+        content = data["content"]
+        extracted_by_ocr = data["extracted_by_ocr"]
+        ocr_needed = needs_ocr(content)
+        if ocr_available and ocr_needed:
+            response = microservice(
+                service="document-extract-ocr",
+                item=rd,
+                params={"ocr_available": ocr_available},
+            )
+            if response.ok:
+                content = response.json()["content"]
+                extracted_by_ocr = True
+    finally:
+        rd.filepath_local.close()
+    return RecapExtraction(content, extracted_by_ocr, ocr_needed)
+
+
+def set_recap_extraction(
+    rd: RECAPDocument, extraction: RecapExtraction
+) -> None:
+    """Set the text and the OCR status of a RECAPDocument from its
+    extraction. Saving is left to the caller.
+
+    :param rd: The RECAPDocument to update.
+    :param extraction: Its extracted text.
+    :return: None
+    """
+    has_content = bool(extraction.content)
+    match has_content, extraction.extracted_by_ocr:
+        case True, True:
+            rd.ocr_status = RECAPDocument.OCR_COMPLETE
+        case True, False:
+            if not extraction.ocr_needed:
+                rd.ocr_status = RECAPDocument.OCR_UNNECESSARY
+        case False, True:
+            rd.ocr_status = RECAPDocument.OCR_FAILED
+        case False, False:
+            rd.ocr_status = RECAPDocument.OCR_NEEDED
+
+    rd.plain_text, _ = anonymize(extraction.content)
+
+
 def extract_recap_pdf_base(
     pks: Union[int, List[int]],
     ocr_available: bool = True,
     check_if_needed: bool = True,
+    batch_size: int = RECAP_EXTRACTION_BATCH_SIZE,
+    max_in_flight: int = RECAP_EXTRACTION_MAX_IN_FLIGHT,
 ) -> List[int]:
     """Extract the contents from a RECAP PDF if necessary.
 
+    The documents are loaded a batch at a time. Up to max_in_flight of them
+    are sent to doctor at once, and the batch is saved with a single update.
+    Documents that don't exist are skipped.
+
     :param pks: The RECAPDocument pk or list of pks to work on.
     :param ocr_available: Whether it's needed to perform OCR extraction.
     :param check_if_needed: Whether it's needed to check if the RECAPDocument
     needs extraction.
+    :param batch_size: The number of documents to load and save at a time.
+    :param max_in_flight: The number of documents to extract at once.
 
     :return: A list of processed RECAPDocument
     """
@@ -256,52 +353,88 @@ def extract_recap_pdf_base(
         pks = [pks]
 
     processed = []
+    for i in range(0, len(pks), batch_size):
+        processed.extend(
+            extract_recap_pdf_batch(
+                pks[i : i + batch_size],
+                ocr_available,
+                check_if_needed,
+                max_in_flight,
+            )
+        )
+    return processed
+
+
+def extract_recap_pdf_batch(
+    pks: List[int],
+    ocr_available: bool,
+    check_if_needed: bool,
+    max_in_flight: int,
+) -> List[int]:
+    """Extract the contents of a batch of RECAP PDFs. See
+    extract_recap_pdf_base.
+
+    :return: A list of processed RECAPDocument
+    """
+    t1 = time.monotonic()
+    rds_by_pk = RECAPDocument.objects.in_bulk(pks)
+    processed = set()
+    to_extract = []
     for pk in pks:
-        rd = RECAPDocument.objects.get(pk=pk)
+        rd = rds_by_pk.get(pk)
+        if rd is None:
+            continue
         if check_if_needed and not rd.needs_extraction:
             # Early abort if the item doesn't need extraction and the user
             # hasn't disabled early abortion.
-            processed.append(pk)
+            processed.add(pk)
             continue
-
-        response = microservice(
-            service="document-extract",
-            item=rd,
+        to_extract.append(rd)
+
+    # Save whatever was extracted before raising any error, so that a retry
+    # doesn't have to extract it again.
+    error = None
+    to_update = []
+    now = timezone.now()
+    max_workers = max(1, min(max_in_flight, len(to_extract)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(extract_recap_document_text, rd, ocr_available)
+            for rd in to_extract
+        ]
+        for rd, future in zip(to_extract, futures):
+            try:
+                extraction = future.result()
+            except FileNotFoundError:
+                # The file is no longer available, clean it up in DB
+                clean_up_recap_document_file(rd)
+                continue
+            except Exception as e:
+                error = error or e
+                continue
+            if extraction is None:
+                continue
+            set_recap_extraction(rd, extraction)
+            rd.date_modified = now
+            to_update.append(rd)
+
+    # Do not do indexing here. Creates race condition in celery.
+    RECAPDocument.objects.bulk_update(
+        to_update, ["plain_text", "ocr_status", "date_modified"]
+    )
+    processed.update(rd.pk for rd in to_update)
+    if to_extract:
+        elapsed = time.monotonic() - t1
+        logger.info(
+            "Extracted %s of %s RECAP documents in %0.1fs (%0.1f docs/s).",
+            len(to_update),
+            len(to_extract),
+            elapsed,
+            len(to_update) / max(elapsed, 0.001),
         )
-        if not response.ok:
-            continue
-
-        content = response.json()["content"]
-        extracted_by_ocr = response.json()["extracted_by_ocr"]
-        ocr_needed = needs_ocr(content)
-        if ocr_available and ocr_needed:
-            response = microservice(
-                service="document-extract-ocr",
-                item=rd,
-                params={"ocr_available": ocr_available},
-            )
-            if response.ok:
-                content = response.json()["content"]
-                extracted_by_ocr = True
-
-        has_content = bool(content)
-        match has_content, extracted_by_ocr:
-            case True, True:
-                rd.ocr_status = RECAPDocument.OCR_COMPLETE
-            case True, False:
-                if not ocr_needed:
-                    rd.ocr_status = RECAPDocument.OCR_UNNECESSARY
-            case False, True:
-                rd.ocr_status = RECAPDocument.OCR_FAILED
-            case False, False:
-                rd.ocr_status = RECAPDocument.OCR_NEEDED
-
-        rd.plain_text, _ = anonymize(content)
-        # Do not do indexing here. Creates race condition in celery.
-        rd.save(index=False, do_extraction=False)
-        processed.append(pk)
-
-    return processed
+    if error is not None:
+        raise error
+    return [pk for pk in pks if pk in processed]
 
 
 @app.task(
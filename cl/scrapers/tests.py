@@ -1,7 +1,11 @@
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from http import HTTPStatus
 from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.base import ContentFile
@@ -66,6 +70,41 @@ class ScraperIngestionTest(TestCase):
         audio_files = Audio.objects.all()
         self.assertEqual(2, audio_files.count())
 
+    def test_full_crawl_downloads_in_windows(self) -> None:
+        """Does a full crawl download and check its items a window at a
+        time?"""
+        site = test_opinion_scraper.Site()
+        site.method = "LOCAL"
+        parsed_site = site.parse()
+        cmd = cl_scrape_opinions.Command()
+        cmd.full_crawl_window = 4
+        with mock.patch.object(
+            DupChecker,
+            "prefetch",
+            autospec=True,
+            side_effect=DupChecker.prefetch,
+        ) as prefetch:
+            cmd.scrape_court(parsed_site, full_crawl=True, ocr_available=False)
+
+        # Six items make a window of four and a window of two.
+        self.assertEqual(
+            [len(call.args[2]) for call in prefetch.call_args_list], [4, 2]
+        )
+        self.assertEqual(Opinion.objects.count(), 6)
+
+    def test_full_crawl_stops_downloading_when_timed_out(self) -> None:
+        """Does a full crawl stop downloading once the court is out of
+        time?"""
+        site = test_opinion_scraper.Site()
+        site.method = "LOCAL"
+        parsed_site = site.parse()
+        cmd = cl_scrape_opinions.Command()
+        cmd._court.deadline = time.monotonic() - 1
+        with mock.patch.object(cmd, "download_item") as download_item:
+            cmd.scrape_court(parsed_site, full_crawl=True, ocr_available=False)
+        download_item.assert_not_called()
+        self.assertEqual(Opinion.objects.count(), 0)
+
     def test_parsing_xml_opinion_site_to_site_object(self) -> None:
         """Does a basic parse of a site reveal the right number of items?"""
         site = test_opinion_scraper.Site().parse()
@@ -169,6 +208,72 @@ class ExtensionIdentificationTest(SimpleTestCase):
         self.assertEqual(get_extension(data), ".html")
 
 
+class ConcurrentScraperTest(SimpleTestCase):
+    def test_courts_are_scraped_concurrently(self) -> None:
+        """Are courts scraped at once, except for those on the same website,
+        and does a failing court leave the others alone?
+        """
+        mods = [SimpleNamespace(__name__=f"court{i}") for i in range(4)]
+        hosts = {
+            "court0": "a.gov",
+            "court1": "a.gov",
+            "court2": "b.gov",
+            "court3": "c.gov",
+        }
+        lock = threading.Lock()
+        running = []
+        max_running = 0
+        same_host_overlaps = []
+        done = []
+
+        def run_court(mod, full_crawl, timeout):
+            nonlocal max_running
+            host = hosts[mod.__name__]
+            with lock:
+                if host in running:
+                    same_host_overlaps.append(mod.__name__)
+                running.append(host)
+                max_running = max(max_running, len(running))
+            time.sleep(0.1)
+            with lock:
+                running.remove(host)
+                done.append(mod.__name__)
+            if mod.__name__ == "court2":
+                raise ValueError("The site is down.")
+
+        cmd = cl_scrape_opinions.Command()
+        with mock.patch.object(
+            cmd, "run_court", side_effect=run_court
+        ), mock.patch.object(
+            cmd, "get_host", side_effect=lambda mod: hosts[mod.__name__]
+        ), mock.patch(
+            "cl.scrapers.management.commands.cl_scrape_opinions."
+            "capture_exception"
+        ) as capture_exception:
+            cmd.scrape_concurrently(
+                mods,
+                full_crawl=False,
+                daemon_mode=False,
+                rate=30,
+                workers=3,
+                court_timeout=0,
+                host_delay=0,
+            )
+
+        self.assertCountEqual(done, [mod.__name__ for mod in mods])
+        # Courts ran at once, but never two on the same website.
+        self.assertEqual(max_running, 3)
+        self.assertEqual(same_host_overlaps, [])
+        capture_exception.assert_called_once()
+
+    def test_court_timeout(self) -> None:
+        """Does a court know when it's out of time?"""
+        cmd = cl_scrape_opinions.Command()
+        self.assertFalse(cmd.court_timed_out())
+        cmd._court.deadline = time.monotonic() - 1
+        self.assertTrue(cmd.court_timed_out())
+
+
 class ReportScrapeStatusTest(TestCase):
     fixtures = [
         "test_court.json",
@@ -403,6 +508,41 @@ class DupcheckerWithFixturesTest(TestCase):
                     "We should have hit a break but didn't.",
                 )
 
+    def test_prefetched_press_on_matches_per_item(self) -> None:
+        """Does prefetching give the same answers as a query per item, in one
+        query?
+        """
+        values = [self.content_hash, "new hash", "other hash"]
+        results = []
+        for prefetch in [False, True]:
+            dup_checker = DupChecker(self.court, full_crawl=True)
+            if prefetch:
+                with self.assertNumQueries(1):
+                    dup_checker.prefetch(Opinion, values, lookup_by="sha1")
+            with self.assertNumQueries(0 if prefetch else len(values)):
+                results.append(
+                    [
+                        dup_checker.press_on(
+                            Opinion,
+                            now(),
+                            now(),
+                            lookup_value=value,
+                            lookup_by="sha1",
+                        )
+                        for value in values
+                    ]
+                )
+        self.assertEqual(results[0], [False, True, True])
+        self.assertEqual(results[0], results[1])
+
+        # The caller saves the items it presses on with, so a value seen
+        # again is a duplicate.
+        self.assertFalse(
+            dup_checker.press_on(
+                Opinion, now(), now(), lookup_value="new hash"
+            )
+        )
+
 
 class AudioFileTaskTest(TestCase):
     @classmethod
@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 import traceback
 from typing import Optional, Tuple
 from urllib.parse import urljoin
@@ -146,13 +147,17 @@ def get_binary_content(
     return "", r
 
 
+# Set when a SIGTERM is caught, so that the scrapers can finish the courts
+# they're on and then exit.
+die_now = threading.Event()
+
+
 def signal_handler(signal, frame):
     # Trigger this with CTRL+4
     logger.info("**************")
-    logger.info("Signal caught. Finishing the current court, then exiting...")
+    logger.info("Signal caught. Finishing the current courts, then exiting...")
     logger.info("**************")
-    global die_now
-    die_now = True
+    die_now.set()
 
 
 def extract_recap_documents(
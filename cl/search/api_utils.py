@@ -1,24 +1,58 @@
+import binascii
+import logging
+from base64 import b64decode
+
 from django.conf import settings
 from rest_framework.exceptions import ParseError
+from scorched.exc import SolrError
 
+from cl.api.pagination import SolrCursorPagination
 from cl.lib import search_utils
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.lib.search_utils import map_to_docket_entry_sorting
 from cl.search.models import SEARCH_TYPES
 
+logger = logging.getLogger(__name__)
+
+
+def is_valid_cursor_mark(cursor_mark: str) -> bool:
+    """Check that a cursor mark from the query string could come from Solr,
+    which uses "*" for the first page and base64 totems after it.
+
+    :param cursor_mark: The cursor mark to check.
+    :return: True if Solr could parse it, else False.
+    """
+    if cursor_mark == "*":
+        return True
+    try:
+        return bool(b64decode(cursor_mark, validate=True))
+    except (binascii.Error, ValueError):
+        return False
+
 
 def get_object_list(request, cd, paginator):
     """Perform the Solr work"""
-    # Set the offset value
-    try:
-        page_number = int(request.GET.get(paginator.page_query_param, 1))
-    except ValueError:
-        raise ParseError(
-            f"Invalid page number: {request.GET.get(paginator.page_query_param)}"
-        )
     page_size = paginator.get_page_size(request)
-    # Assume page_size = 20, then: 1 --> 0, 2 --> 20, 3 --> 40
-    offset = max(0, (page_number - 1) * page_size)
+    cursor_mark = request.GET.get(SolrCursorPagination.cursor_query_param)
+    if cursor_mark is not None:
+        if cd["type"] == SEARCH_TYPES.DOCKETS:
+            # Solr can't use cursors with result grouping.
+            raise ParseError(
+                "Cursor pagination is not supported for this search type."
+            )
+        if not is_valid_cursor_mark(cursor_mark):
+            raise ParseError("Invalid cursor")
+        offset = 0
+    else:
+        # Set the offset value
+        try:
+            page_number = int(request.GET.get(paginator.page_query_param, 1))
+        except ValueError:
+            raise ParseError(
+                f"Invalid page number: {request.GET.get(paginator.page_query_param)}"
+            )
+        # Assume page_size = 20, then: 1 --> 0, 2 --> 20, 3 --> 40
+        offset = max(0, (page_number - 1) * page_size)
     group = False
     if cd["type"] == SEARCH_TYPES.DOCKETS:
         group = True
@@ -28,78 +62,130 @@ def get_object_list(request, cd, paginator):
     main_query["caller"] = "api_search"
     if cd["type"] == SEARCH_TYPES.RECAP:
         main_query["sort"] = map_to_docket_entry_sorting(main_query["sort"])
-    sl = SolrList(main_query=main_query, offset=offset, type=cd["type"])
+    sl = SolrList(
+        main_query=main_query,
+        offset=offset,
+        type=cd["type"],
+        rows=page_size,
+        cursor_mark=cursor_mark,
+    )
     return sl
 
 
+SOLR_URLS_BY_TYPE = {
+    SEARCH_TYPES.OPINION: settings.SOLR_OPINION_URL,
+    SEARCH_TYPES.ORAL_ARGUMENT: settings.SOLR_AUDIO_URL,
+    SEARCH_TYPES.RECAP: settings.SOLR_RECAP_URL,
+    SEARCH_TYPES.DOCKETS: settings.SOLR_RECAP_URL,
+    SEARCH_TYPES.PEOPLE: settings.SOLR_PEOPLE_URL,
+}
+
+
 class SolrList(object):
-    """This implements a yielding list object that fetches items as they are
-    queried.
+    """A list of the results for one page of the search API.
+
+    The page and the total number of results are fetched together, with a
+    single Solr request, the first time either is needed. The request goes
+    through the shared, keep-alive interface of the core.
     """
 
-    def __init__(self, main_query, offset, type, length=None):
+    def __init__(
+        self,
+        main_query,
+        offset,
+        type,
+        length=None,
+        rows=20,
+        cursor_mark=None,
+    ):
+        """
+        :param main_query: The Solr parameters of the search.
+        :param offset: The number of results before the page.
+        :param type: The search type.
+        :param length: The total number of results, if it's already known.
+        :param rows: The number of results per page.
+        :param cursor_mark: If given, get the page after this cursor mark
+        instead of using the offset. Use "*" for the first page.
+        """
         super(SolrList, self).__init__()
         self.main_query = main_query
         self.offset = offset
         self.type = type
+        self.rows = rows
+        self.cursor_mark = cursor_mark
+        self.next_cursor_mark = None
         self._item_cache = []
-        if self.type == SEARCH_TYPES.OPINION:
-            self.conn = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
-        elif self.type == SEARCH_TYPES.ORAL_ARGUMENT:
-            self.conn = ExtraSolrInterface(settings.SOLR_AUDIO_URL, mode="r")
-        elif self.type in [SEARCH_TYPES.RECAP, SEARCH_TYPES.DOCKETS]:
-            self.conn = ExtraSolrInterface(settings.SOLR_RECAP_URL, mode="r")
-        elif self.type == SEARCH_TYPES.PEOPLE:
-            self.conn = ExtraSolrInterface(settings.SOLR_PEOPLE_URL, mode="r")
+        self._fetched = False
+        self.conn = get_shared_solr_interface(SOLR_URLS_BY_TYPE[self.type])
         self._length = length
 
     def __len__(self):
-        if self._length is None:
-            mq = self.main_query.copy()  # local copy for manipulation
-            mq["caller"] = "api_search_count"
-            count = self.conn.query().add_extra(**mq).count()
-            self._length = count
+        self._fetch()
         return self._length
 
     def __iter__(self):
-        for item in range(0, len(self)):
-            try:
-                yield self._item_cache[item]
-            except IndexError:
-                yield self.__getitem__(item)
+        self._fetch()
+        return iter(self._item_cache)
+
+    def _fetch(self):
+        if self._fetched:
+            return
+        params = self.main_query.copy()
+        params["start"] = self.offset
+        params["rows"] = self.rows
+        if self.cursor_mark is not None:
+            # Cursors need a sort with a tie-breaker on the unique key.
+            unique_key = self.conn.schema["uniqueKey"]
+            sort = params.get("sort") or "score desc"
+            if unique_key not in [s.split()[0] for s in sort.split(",")]:
+                sort = f"{sort},{unique_key} asc"
+            params.update(
+                {"sort": sort, "start": 0, "cursorMark": self.cursor_mark}
+            )
+        try:
+            r = self.conn.query().add_extra(**params).execute()
+        except SolrError as exc:
+            # Cursors come from the query string, and Solr rejects the totems
+            # it can't parse. Other errors are ours.
+            if self.cursor_mark is None or "cursorMark" not in str(exc):
+                raise
+            logger.info("Solr rejected cursor %r: %s", self.cursor_mark, exc)
+            raise ParseError("Invalid cursor")
+        self._fetched = True
 
-    def __getitem__(self, item):
-        self.main_query["start"] = self.offset
-        r = self.conn.query().add_extra(**self.main_query).execute()
-        self.conn.conn.http_connection.close()
         if r.group_field is None:
-            # Pull the text snippet up a level
-            for result in r.result.docs:
-                result["snippet"] = "&hellip;".join(
-                    result["solr_highlights"]["text"]
-                )
-                self._item_cache.append(SolrObject(initial=result))
+            count = r.result.numFound
+            docs = r.result.docs
         else:
-            # Flatten group results, and pull up the text snippet as above.
-            for group in getattr(r.groups, r.group_field)["groups"]:
-                for doc in group["doclist"]["docs"]:
-                    doc["snippet"] = "&hellip;".join(
-                        doc["solr_highlights"]["text"]
-                    )
-                    self._item_cache.append(SolrObject(initial=doc))
-
-        # Now, assuming our _item_cache is all set, we just get the item.
+            # Flatten group results.
+            groups = getattr(r.groups, r.group_field)
+            count = groups["ngroups"]
+            docs = [
+                doc
+                for group in groups["groups"]
+                for doc in group["doclist"]["docs"]
+            ]
+        for doc in docs:
+            # Pull the text snippet up a level
+            doc["snippet"] = "&hellip;".join(doc["solr_highlights"]["text"])
+            self._item_cache.append(SolrObject(initial=doc))
+        if self._length is None:
+            self._length = count
+        self.next_cursor_mark = r.next_cursor_mark
+
+    def __getitem__(self, item):
+        self._fetch()
         if isinstance(item, slice):
             s = slice(
-                item.start - int(self.offset),
-                item.stop - int(self.offset),
+                max(0, (item.start or 0) - int(self.offset)),
+                None if item.stop is None else item.stop - int(self.offset),
                 item.step,
             )
             return self._item_cache[s]
         else:
             # Not slicing.
             try:
-                return self._item_cache[item]
+                return self._item_cache[item - int(self.offset)]
             except IndexError:
                 # No results!
                 return []
@@ -1,5 +1,6 @@
 from rest_framework import pagination, permissions, response, status, viewsets
 
+from cl.api.pagination import ShallowOrKeysetPagination, SolrCursorPagination
 from cl.api.utils import CacheListMixin, LoggingMixin, RECAPUsersReadOnly
 from cl.search import api_utils
 from cl.search.api_serializers import (
@@ -44,6 +45,7 @@ class OriginatingCourtInformationViewSet(viewsets.ModelViewSet):
 
 class DocketViewSet(LoggingMixin, viewsets.ModelViewSet):
     serializer_class = DocketSerializer
+    pagination_class = ShallowOrKeysetPagination
     filterset_class = DocketFilter
     ordering_fields = (
         "id",
@@ -70,6 +72,7 @@ class DocketViewSet(LoggingMixin, viewsets.ModelViewSet):
 class DocketEntryViewSet(LoggingMixin, viewsets.ModelViewSet):
     permission_classes = (RECAPUsersReadOnly,)
     serializer_class = DocketEntrySerializer
+    pagination_class = ShallowOrKeysetPagination
     filterset_class = DocketEntryFilter
     ordering_fields = ("id", "date_created", "date_modified", "date_filed")
 
@@ -91,6 +94,7 @@ class RECAPDocumentViewSet(
 ):
     permission_classes = (RECAPUsersReadOnly,)
     serializer_class = RECAPDocumentSerializer
+    pagination_class = ShallowOrKeysetPagination
     filterset_class = RECAPDocumentFilter
     ordering_fields = ("id", "date_created", "date_modified", "date_upload")
     queryset = (
@@ -174,6 +178,8 @@ class SearchViewSet(LoggingMixin, viewsets.ViewSet):
 
             paginator = pagination.PageNumberPagination()
             sl = api_utils.get_object_list(request, cd=cd, paginator=paginator)
+            if sl.cursor_mark is not None:
+                paginator = SolrCursorPagination()
 
             result_page = paginator.paginate_queryset(sl, request)
             serializer = SearchResultSerializer(
@@ -8,7 +8,7 @@ from django.utils.feedgenerator import Atom1Feed
 from cl.lib import search_utils
 from cl.lib.date_time import midnight_pst
 from cl.lib.mime_types import lookup_mime_type
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.search.forms import SearchForm
 from cl.search.models import SEARCH_TYPES, Court
 
@@ -44,9 +44,9 @@ class SearchFeed(Feed):
             cd = search_form.cleaned_data
             order_by = "dateFiled"
             if cd["type"] == SEARCH_TYPES.OPINION:
-                solr = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+                solr = get_shared_solr_interface(settings.SOLR_OPINION_URL)
             elif cd["type"] == SEARCH_TYPES.RECAP:
-                solr = ExtraSolrInterface(settings.SOLR_RECAP_URL, mode="r")
+                solr = get_shared_solr_interface(settings.SOLR_RECAP_URL)
             else:
                 return []
             main_params = search_utils.build_main_query(
@@ -63,7 +63,6 @@ class SearchFeed(Feed):
             # Eliminate items that lack the ordering field.
             main_params["fq"].append(f"{order_by}:[* TO *]")
             items = solr.query().add_extra(**main_params).execute()
-            solr.conn.http_connection.close()
             return items
         else:
             return []
@@ -101,7 +100,7 @@ class JurisdictionFeed(Feed):
 
     def items(self, obj):
         """Do a Solr query here. Return the first 20 results"""
-        solr = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        solr = get_shared_solr_interface(settings.SOLR_OPINION_URL)
         params = {
             "q": "*",
             "fq": f"court_exact:{obj.pk}",
@@ -111,7 +110,6 @@ class JurisdictionFeed(Feed):
             "caller": "JurisdictionFeed",
         }
         items = solr.query().add_extra(**params).execute()
-        solr.conn.http_connection.close()
         return items
 
     def item_link(self, item):
@@ -155,7 +153,7 @@ class AllJurisdictionsFeed(JurisdictionFeed):
 
     def items(self, obj):
         """Do a Solr query here. Return the first 20 results"""
-        solr = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        solr = get_shared_solr_interface(settings.SOLR_OPINION_URL)
         params = {
             "q": "*",
             "sort": "dateFiled desc",
@@ -164,5 +162,4 @@ class AllJurisdictionsFeed(JurisdictionFeed):
             "caller": "AllJurisdictionsFeed",
         }
         items = solr.query().add_extra(**params).execute()
-        solr.conn.http_connection.close()
         return items
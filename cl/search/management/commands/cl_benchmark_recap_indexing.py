@@ -0,0 +1,150 @@
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.search.models import Court, Docket, DocketEntry, RECAPDocument
+
+
+class BenchmarkRollback(Exception):
+    """Raised to throw away the synthetic docket once we're done with it."""
+
+    pass
+
+
+def make_synthetic_docket(
+    court_id: str, doc_count: int, docs_per_entry: int
+) -> Docket:
+    """Create a RECAP docket with doc_count RECAPDocuments on it.
+
+    :param court_id: The court to put the docket in.
+    :param doc_count: The number of RECAPDocuments to create.
+    :param docs_per_entry: How many documents each docket entry gets. The
+    first is the main document and the rest are attachments.
+    :return: The new docket.
+    """
+    d = Docket.objects.create(
+        source=Docket.RECAP,
+        court_id=court_id,
+        pacer_case_id="999999",
+        docket_number="1:99-cv-99999",
+        case_name="Benchmark v. Synthetic Docket",
+    )
+    entry_count = -(-doc_count // docs_per_entry)
+    des = DocketEntry.objects.bulk_create(
+        [
+            DocketEntry(
+                docket=d,
+                entry_number=i,
+                description=f"Synthetic docket entry number {i}",
+            )
+            for i in range(1, entry_count + 1)
+        ],
+        batch_size=1000,
+    )
+    rds = []
+    for de in des:
+        for att in range(docs_per_entry):
+            if len(rds) >= doc_count:
+                break
+            rds.append(
+                RECAPDocument(
+                    docket_entry=de,
+                    document_type=(
+                        RECAPDocument.ATTACHMENT
+                        if att
+                        else RECAPDocument.PACER_DOCUMENT
+                    ),
+                    document_number=str(de.entry_number),
+                    attachment_number=att or None,
+                    pacer_doc_id="",
+                    plain_text="Lorem ipsum dolor sit amet. " * 50,
+                )
+            )
+    RECAPDocument.objects.bulk_create(rds, batch_size=1000)
+    return d
+
+
+class Command(VerboseCommand):
+    help = (
+        "Build the Solr documents for a synthetic RECAP docket without "
+        "sending them to Solr, and report the number of queries, the time "
+        "and the peak memory it took. Nothing is left in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--documents",
+            type=int,
+            default=50_000,
+            help="The number of RECAPDocuments on the synthetic docket.",
+        )
+        parser.add_argument(
+            "--docs-per-entry",
+            type=int,
+            default=3,
+            help="The number of documents (main document plus attachments) "
+            "per docket entry.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The chunk size to hand to Docket.iter_search_chunks.",
+        )
+        parser.add_argument(
+            "--court",
+            type=str,
+            default="",
+            help="The court to create the docket in. Defaults to the first "
+            "court in the DB.",
+        )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        court_id = (
+            options["court"]
+            or Court.objects.values_list("pk", flat=True)
+            .order_by("pk")
+            .first()
+        )
+        try:
+            with transaction.atomic():
+                logger.info(
+                    "Creating synthetic docket with %s documents...",
+                    options["documents"],
+                )
+                d = make_synthetic_docket(
+                    court_id,
+                    options["documents"],
+                    options["docs_per_entry"],
+                )
+                # Start from a fresh instance so nothing is cached.
+                d = Docket.objects.get(pk=d.pk)
+                self.run_benchmark(d, options["chunk_size"])
+                raise BenchmarkRollback()
+        except BenchmarkRollback:
+            pass
+
+    def run_benchmark(self, d: Docket, chunk_size: int) -> None:
+        doc_count = 0
+        peak_chunk = 0
+        tracemalloc.start()
+        t1 = time.monotonic()
+        with CaptureQueriesContext(connection) as ctx:
+            for chunk in d.iter_search_chunks(chunk_size=chunk_size):
+                doc_count += len(chunk)
+                peak_chunk = max(peak_chunk, len(chunk))
+        elapsed = time.monotonic() - t1
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"Built {doc_count} Solr documents in {elapsed:0.1f} seconds "
+            f"({doc_count / max(elapsed, 0.001):0.0f} docs/second).\n"
+            f"Queries: {len(ctx.captured_queries)}\n"
+            f"Largest chunk: {peak_chunk} documents\n"
+            f"Peak traced memory: {peak_memory / 1024 / 1024:0.1f} MB\n"
+        )
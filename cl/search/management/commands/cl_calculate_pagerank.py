@@ -1,32 +1,162 @@
 import os
+import resource
+import time
+from array import array
+from typing import Optional, Tuple
 
-import igraph
+import numpy as np
 from django.conf import settings
+from scipy.sparse import csr_matrix
 
-from cl.lib.command_utils import VerboseCommand
+from cl.lib.command_utils import VerboseCommand, logger
 from cl.lib.solr_core_admin import get_data_dir
 from cl.search.models import Opinion, OpinionsCited
 
+DAMPING_FACTOR = 0.85
 
-def make_and_populate_nx_graph():
-    """Create a new igraph object and populate it.
 
-    This pulls all of the inter-opinion citations into memory then passes all of
-    them to igraph as a directed graph.
+def load_citation_edges(
+    chunk_size: int = 100_000,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Load every inter-opinion citation into two integer arrays.
+
+    The rows are streamed from the DB with a server-side cursor and appended
+    to compact arrays, so we never hold a Python tuple per citation.
+
+    :param chunk_size: The number of rows to fetch from the cursor at a time.
+    :return: A tuple of the citing and the cited opinion IDs of every edge.
     """
-    g = igraph.Graph(
-        directed=True,
-        edges=list(
-            OpinionsCited.objects.values_list(
-                "citing_opinion", "cited_opinion"
-            )
-        ),
+    citing = array("q")
+    cited = array("q")
+    rows = (
+        OpinionsCited.objects.order_by()
+        .values_list("citing_opinion_id", "cited_opinion_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    for citing_id, cited_id in rows:
+        citing.append(citing_id)
+        cited.append(cited_id)
+    if not citing:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return (
+        np.frombuffer(citing, dtype=np.int64),
+        np.frombuffer(cited, dtype=np.int64),
     )
-    return g
 
 
-def make_sorted_pr_file(pr_results, result_file_path):
-    """Convert the pagerank results list into something Solr can use.
+def make_citation_graph(
+    citing: np.ndarray, cited: np.ndarray
+) -> Tuple[np.ndarray, csr_matrix, np.ndarray]:
+    """Build a sparse citation graph, compressing the sparse opinion IDs to
+    dense indices so that opinions without citations take no room.
+
+    :param citing: The citing opinion ID of every edge.
+    :param cited: The cited opinion ID of every edge.
+    :return: A tuple of the sorted opinion IDs of the nodes, a matrix where
+    the cell at (i, j) is set when node j cites node i, and the out degree of
+    every node.
+    """
+    node_ids = np.union1d(citing, cited)
+    src = np.searchsorted(node_ids, citing).astype(np.int32)
+    dst = np.searchsorted(node_ids, cited).astype(np.int32)
+    n = len(node_ids)
+    graph = csr_matrix(
+        (np.ones(len(src), dtype=np.float32), (dst, src)), shape=(n, n)
+    )
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    return node_ids, graph, out_degree
+
+
+def compute_pagerank(
+    graph: csr_matrix,
+    out_degree: np.ndarray,
+    initial_scores: Optional[np.ndarray] = None,
+    damping: float = DAMPING_FACTOR,
+    tol: float = 1e-10,
+    max_iter: int = 200,
+) -> Tuple[np.ndarray, int]:
+    """Run the pagerank power iteration over a citation graph.
+
+    The citation graph is a scipy sparse matrix, so each iteration is a
+    single sparse matrix-vector product. Nodes that don't cite anything
+    spread their score evenly over every node, and the iteration stops once
+    the L1 change between two iterations is below tol.
+
+    :param graph: The matrix from make_citation_graph.
+    :param out_degree: The out degree of every node.
+    :param initial_scores: The scores to start iterating from, for instance
+    the ones from the previous run. If None, start from a uniform vector.
+    :param damping: The damping factor.
+    :param tol: Stop once the L1 change of an iteration is below this.
+    :param max_iter: Stop after this many iterations regardless.
+    :return: A tuple of the score of every node, summing to 1, and the number
+    of iterations it took.
+    """
+    n = graph.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    if initial_scores is None:
+        scores = np.full(n, 1.0 / n)
+    else:
+        scores = initial_scores / initial_scores.sum()
+
+    dangling = out_degree == 0
+    inv_out_degree = np.zeros(n)
+    np.divide(1.0, out_degree, out=inv_out_degree, where=~dangling)
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        teleport = (1 - damping + damping * scores[dangling].sum()) / n
+        new_scores = damping * graph.dot(scores * inv_out_degree) + teleport
+        delta = np.abs(new_scores - scores).sum()
+        scores = new_scores
+        if delta < tol:
+            break
+    return scores, iterations
+
+
+def load_previous_scores(
+    result_file_path: str, node_ids: np.ndarray
+) -> Optional[np.ndarray]:
+    """Read the scores of a previous run to warm start the power iteration.
+
+    Nodes that weren't in the previous run start from the average score.
+
+    :param result_file_path: The file written by make_sorted_pr_file.
+    :param node_ids: The sorted opinion IDs of the nodes.
+    :return: The previous score of every node, or None if there's no usable
+    previous run.
+    """
+    if not os.path.isfile(result_file_path) or len(node_ids) == 0:
+        return None
+    previous_pks = array("q")
+    previous_scores = array("d")
+    with open(result_file_path) as f:
+        for line in f:
+            pk, _, score = line.partition("=")
+            previous_pks.append(int(pk))
+            previous_scores.append(float(score))
+    if not previous_pks:
+        return None
+    previous_pks = np.frombuffer(previous_pks, dtype=np.int64)
+    previous_scores = np.frombuffer(previous_scores, dtype=np.float64)
+
+    # Both are sorted, so each node can be found with a binary search.
+    scores = np.full(len(node_ids), np.nan)
+    i = np.searchsorted(previous_pks, node_ids)
+    i[i == len(previous_pks)] = 0
+    found = previous_pks[i] == node_ids
+    scores[found] = previous_scores[i[found]]
+    known = ~np.isnan(scores)
+    if not known.any():
+        return None
+    scores[~known] = scores[known].mean()
+    return scores
+
+
+def make_sorted_pr_file(
+    node_ids: np.ndarray, scores: np.ndarray, result_file_path: str
+) -> None:
+    """Convert the pagerank results into something Solr can use.
 
     Solr uses a file of the form:
 
@@ -34,48 +164,124 @@ def make_sorted_pr_file(pr_results, result_file_path):
         2=0.214810626172
         3=0.397399661529
 
-    The IDs must be sorted for performance, and every ID should be listed. This
-    function takes the pagerank results and converts them into a file like this,
-    using the os's `sort` executable for fastest sorting.
+    The IDs must be sorted for performance, and every ID should be listed.
+    Opinions are read in pk order and node_ids is sorted, so the two are
+    merged as we go and the file comes out sorted. It's written next to its
+    destination and moved into place once it's complete.
+
+    :param node_ids: The sorted opinion IDs of the nodes.
+    :param scores: The score of every node.
+    :param result_file_path: Where to write the file.
+    :return: None
     """
-    temp_extension = ".tmp"
-    min_value = min(pr_results)
-    with open(result_file_path + temp_extension, "w") as f:
-        # pr_results has a score for every value between 0 and our highest
-        # opinion id that has citations. Write a file that only contains values
-        # matching valid Opinions.
-        for pk in Opinion.objects.values_list("pk", flat=True):
-            try:
-                score = pr_results[pk]
-            except IndexError:
-                # Happens because some items don't have citations, thus aren't
-                # in network.
+    # Opinions without citations aren't in the network. Give them the lowest
+    # score.
+    min_value = scores.min() if len(scores) else 0.0
+    node_ids = node_ids.tolist()
+    scores = scores.tolist()
+    i = 0
+    temp_path = f"{result_file_path}.tmp"
+    with open(temp_path, "w") as f:
+        pks = (
+            Opinion.objects.order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(chunk_size=100_000)
+        )
+        for pk in pks:
+            while i < len(node_ids) and node_ids[i] < pk:
+                i += 1
+            if i < len(node_ids) and node_ids[i] == pk:
+                score = scores[i]
+            else:
                 score = min_value
             f.write(f"{pk}={score}\n")
+    os.replace(temp_path, result_file_path)
 
-    # For improved Solr performance, sort the temp file, creating a new file
-    # without the temp_extension value.
-    os.system(
-        f"sort -n {result_file_path}{temp_extension} > {result_file_path}"
-    )
-    os.remove(result_file_path + temp_extension)
+
+def get_peak_memory_mb() -> float:
+    """Get the peak resident memory of this process, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 
 class Command(VerboseCommand):
     args = "<args>"
     help = "Calculate pagerank value for every case"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cold-start",
+            action="store_true",
+            default=False,
+            help="Start the power iteration from scratch instead of from the "
+            "scores of the previous run.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100_000,
+            help="The number of citations to fetch from the DB at a time.",
+        )
+
     @staticmethod
-    def do_pagerank():
-        g = make_and_populate_nx_graph()
-        pr_results = g.pagerank()
-        return pr_results
+    def do_pagerank(
+        previous_file_path: Optional[str] = None,
+        chunk_size: int = 100_000,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Calculate the pagerank of every opinion with citations.
+
+        :param previous_file_path: The file of a previous run to warm start
+        from, if any.
+        :param chunk_size: The number of citations to fetch at a time.
+        :return: A tuple of the sorted opinion IDs and their scores.
+        """
+        t1 = time.monotonic()
+        citing, cited = load_citation_edges(chunk_size)
+        logger.info(
+            "Loaded %s citations in %0.1fs. Peak memory: %0.0f MB.",
+            len(citing),
+            time.monotonic() - t1,
+            get_peak_memory_mb(),
+        )
+
+        t1 = time.monotonic()
+        node_ids, graph, out_degree = make_citation_graph(citing, cited)
+        del citing, cited
+        logger.info(
+            "Built a graph of %s opinions in %0.1fs. Peak memory: %0.0f MB.",
+            len(node_ids),
+            time.monotonic() - t1,
+            get_peak_memory_mb(),
+        )
+
+        initial_scores = None
+        if previous_file_path:
+            initial_scores = load_previous_scores(previous_file_path, node_ids)
+        t1 = time.monotonic()
+        scores, iterations = compute_pagerank(
+            graph, out_degree, initial_scores
+        )
+        logger.info(
+            "Computed pagerank in %s iterations (%s) in %0.1fs. Peak memory: "
+            "%0.0f MB.",
+            iterations,
+            "warm start" if initial_scores is not None else "cold start",
+            time.monotonic() - t1,
+            get_peak_memory_mb(),
+        )
+        return node_ids, scores
 
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
-        pr_results = self.do_pagerank()
         pr_dest_dir = settings.SOLR_PAGERANK_DEST_DIR
-        make_sorted_pr_file(pr_results, pr_dest_dir)
+        node_ids, scores = self.do_pagerank(
+            previous_file_path=None if options["cold_start"] else pr_dest_dir,
+            chunk_size=options["chunk_size"],
+        )
+        t1 = time.monotonic()
+        make_sorted_pr_file(node_ids, scores, pr_dest_dir)
+        logger.info(
+            "Wrote the pagerank file in %0.1fs.", time.monotonic() - t1
+        )
         normal_dest_dir = f"{get_data_dir('collection1')}external_pagerank"
         print(
             "Pagerank file created at %s. Because of distributed servers, "
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2022-11-28 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0009_alter_court_jurisdiction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parenthetical',
+            name='minhash',
+            field=models.BinaryField(help_text='The MinHash signature of the tokens of the text, as 64 little-endian 32-bit integers. Used to group similar parentheticals without hashing them again.', null=True),
+        ),
+    ]
@@ -0,0 +1,6 @@
+BEGIN;
+--
+-- Add field minhash to parenthetical
+--
+ALTER TABLE "search_parenthetical" ADD COLUMN "minhash" bytea NULL;
+COMMIT;
@@ -1,5 +1,6 @@
 import re
-from typing import Any, Dict, List, Tuple, TypeVar
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, TypeVar
 
 from celery.canvas import chain
 from django.contrib.contenttypes.fields import GenericRelation
@@ -24,6 +25,7 @@ from cl.lib.model_helpers import (
 from cl.lib.models import AbstractDateTimeModel, AbstractPDF, s3_warning_note
 from cl.lib.search_index_utils import (
     InvalidDocumentError,
+    make_search_fingerprint,
     normalize_search_dicts,
     null_map,
 )
@@ -774,21 +776,32 @@ class Docket(AbstractDateTimeModel):
             ),
         )
 
-    def as_search_list(self):
-        """Create list of search dicts from a single docket. This should be
-        faster than creating a search dict per document on the docket.
-        """
-        search_list = []
+    def get_search_metadata(self) -> Dict[str, Any]:
+        """The docket-level fields that are copied into every RECAPDocument
+        in the RECAP Solr index.
 
-        # Docket
+        :return: A dict of Solr fields describing the docket, its court, its
+        judges and its parties, attorneys and firms.
+        """
+        # IDs
         out = {
-            "docketNumber": self.docket_number,
-            "caseName": best_case_name(self),
-            "suitNature": self.nature_of_suit,
-            "cause": self.cause,
-            "juryDemand": self.jury_demand,
-            "jurisdictionType": self.jurisdiction_type,
+            "docket_id": self.pk,
+            "court_id": self.court.pk,
+            "assigned_to_id": getattr(self.assigned_to, "pk", None),
+            "referred_to_id": getattr(self.referred_to, "pk", None),
         }
+
+        # Docket
+        out.update(
+            {
+                "docketNumber": self.docket_number,
+                "caseName": best_case_name(self),
+                "suitNature": self.nature_of_suit,
+                "cause": self.cause,
+                "juryDemand": self.jury_demand,
+                "jurisdictionType": self.jurisdiction_type,
+            }
+        )
         if self.date_argued is not None:
             out["dateArgued"] = midnight_pst(self.date_argued)
         if self.date_filed is not None:
@@ -842,68 +855,107 @@ class Docket(AbstractDateTimeModel):
                     out["firm_id"].add(f.pk)
                     out["firm"].add(f.name)
 
-        # Do RECAPDocument and Docket Entries in a nested loop
-        for de in self.docket_entries.all().iterator():
-            # Docket Entry
-            de_out = {
-                "description": de.description,
+        return out
+
+    def get_search_fingerprint(
+        self, docket_metadata: Dict[str, Any] | None = None
+    ) -> str:
+        """Hash the docket-level values that are copied into every document
+        of this docket in the RECAP Solr index.
+
+        That's the output of get_search_metadata plus the docket fields that
+        only appear in the text of each document. If the fingerprint hasn't
+        changed since the docket was last indexed, only new or changed
+        documents need to be sent to Solr.
+
+        :param docket_metadata: The output of get_search_metadata, if the
+        caller already has it.
+        :return: A hexadecimal hash of the docket-level values.
+        """
+        out = (docket_metadata or self.get_search_metadata()).copy()
+        out.update(
+            {
+                "case_name_full": self.case_name_full,
+                "case_name": self.case_name,
+                "case_name_short": self.case_name_short,
             }
-            if de.entry_number is not None:
-                de_out["entry_number"] = de.entry_number
-            if de.date_filed is not None:
-                de_out["entry_date_filed"] = midnight_pst(de.date_filed)
-            rds = de.recap_documents.all()
-
-            if len(rds) == 0:
-                # Minute entry or other entry that lacks docs.
-                # For now, we punt.
-                # https://github.com/freelawproject/courtlistener/issues/784
-                continue
-
-            for rd in rds:
-                # IDs
-                rd_out = {
-                    "id": rd.pk,
-                    "docket_entry_id": de.pk,
-                    "docket_id": self.pk,
-                    "court_id": self.court.pk,
-                    "assigned_to_id": getattr(self.assigned_to, "pk", None),
-                    "referred_to_id": getattr(self.referred_to, "pk", None),
+        )
+        try:
+            bankr_info = self.bankruptcy_information
+        except BankruptcyInformation.DoesNotExist:
+            pass
+        else:
+            out.update(
+                {
+                    "bankr_chapter": bankr_info.chapter,
+                    "bankr_trustee_str": bankr_info.trustee_str,
                 }
+            )
+        return make_search_fingerprint(out)
 
-                # RECAPDocument
-                rd_out.update(
-                    {
-                        "short_description": rd.description,
-                        "document_type": rd.get_document_type_display(),
-                        "document_number": rd.document_number or None,
-                        "attachment_number": rd.attachment_number,
-                        "is_available": rd.is_available,
-                        "page_count": rd.page_count,
-                    }
-                )
-                if rd.filepath_local:
-                    rd_out["filepath_local"] = rd.filepath_local.name
-                try:
-                    rd_out["absolute_url"] = rd.get_absolute_url()
-                except NoReverseMatch:
-                    raise InvalidDocumentError(
-                        "Unable to save to index due to missing absolute_url: "
-                        "%s" % self.pk
-                    )
-
-                text_template = loader.get_template("indexes/dockets_text.txt")
-                rd_out["text"] = text_template.render({"item": rd}).translate(
-                    null_map
-                )
+    def iter_search_chunks(
+        self,
+        chunk_size: int = 500,
+        docket_metadata: Dict[str, Any] | None = None,
+        entry_pks: List[int] | None = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Generate the search dicts for the RECAPDocuments on this docket in
+        lists of roughly chunk_size items.
+
+        Docket entries are pulled in pk order, chunk_size at a time, and their
+        RECAPDocuments are prefetched alongside them, so a docket costs about
+        two queries per chunk instead of one query per docket entry. The
+        docket-level metadata and the text template are only built once.
+
+        :param chunk_size: The number of docket entries to pull per query and
+        the approximate number of search dicts yielded per list.
+        :param docket_metadata: The output of get_search_metadata, if the
+        caller already has it.
+        :param entry_pks: If provided, only index the documents of these
+        docket entries.
+        :return: A generator of lists of search dicts.
+        """
+        metadata = docket_metadata or self.get_search_metadata()
+        text_template = loader.get_template("indexes/dockets_text.txt")
+        entries = self.docket_entries.order_by("pk").prefetch_related(
+            Prefetch(
+                "recap_documents",
+                queryset=RECAPDocument.objects.order_by(),
+            )
+        )
+        if entry_pks is not None:
+            entries = entries.filter(pk__in=entry_pks)
 
-                # Ensure that loops to bleed into each other
-                out_copy = out.copy()
-                out_copy.update(rd_out)
-                out_copy.update(de_out)
+        search_list = []
+        last_pk = 0
+        while True:
+            des = list(entries.filter(pk__gt=last_pk)[:chunk_size])
+            if not des:
+                break
+            last_pk = des[-1].pk
+            for de in des:
+                # Minute entries and other entries that lack docs are punted.
+                # https://github.com/freelawproject/courtlistener/issues/784
+                for rd in de.recap_documents.all():
+                    out = metadata.copy()
+                    out.update(rd.get_search_fields(text_template))
+                    search_list.append(normalize_search_dicts(out))
+            if len(search_list) >= chunk_size:
+                yield search_list
+                search_list = []
+        if search_list:
+            yield search_list
 
-                search_list.append(normalize_search_dicts(out_copy))
+    def as_search_list(self):
+        """Create list of search dicts from a single docket. This should be
+        faster than creating a search dict per document on the docket.
 
+        For big dockets, prefer iter_search_chunks, which doesn't hold every
+        document of the docket in memory at once.
+        """
+        search_list = []
+        for chunk in self.iter_search_chunks():
+            search_list.extend(chunk)
         return search_list
 
     def reprocess_recap_content(self, do_original_xml: bool = False) -> None:
@@ -1307,98 +1359,19 @@ class RECAPDocument(AbstractPacerDocument, AbstractPDF, AbstractDateTimeModel):
 
     def get_docket_metadata(self):
         """The metadata for the item that comes from the Docket."""
-        docket = self.docket_entry.docket
-        # IDs
-        out = {
-            "docket_id": docket.pk,
-            "court_id": docket.court.pk,
-            "assigned_to_id": getattr(docket.assigned_to, "pk", None),
-            "referred_to_id": getattr(docket.referred_to, "pk", None),
-        }
-
-        # Docket
-        out.update(
-            {
-                "docketNumber": docket.docket_number,
-                "caseName": best_case_name(docket),
-                "suitNature": docket.nature_of_suit,
-                "cause": docket.cause,
-                "juryDemand": docket.jury_demand,
-                "jurisdictionType": docket.jurisdiction_type,
-            }
-        )
-        if docket.date_argued is not None:
-            out["dateArgued"] = midnight_pst(docket.date_argued)
-        if docket.date_filed is not None:
-            out["dateFiled"] = midnight_pst(docket.date_filed)
-        if docket.date_terminated is not None:
-            out["dateTerminated"] = midnight_pst(docket.date_terminated)
-        try:
-            out["docket_absolute_url"] = docket.get_absolute_url()
-        except NoReverseMatch:
-            raise InvalidDocumentError(
-                f"Unable to save to index due to missing absolute_url: {self.pk}"
-            )
-
-        # Judges
-        if docket.assigned_to is not None:
-            out["assignedTo"] = docket.assigned_to.name_full
-        elif docket.assigned_to_str:
-            out["assignedTo"] = docket.assigned_to_str
-        if docket.referred_to is not None:
-            out["referredTo"] = docket.referred_to.name_full
-        elif docket.referred_to_str:
-            out["referredTo"] = docket.referred_to_str
+        return self.docket_entry.docket.get_search_metadata()
 
-        # Court
-        out.update(
-            {
-                "court": docket.court.full_name,
-                "court_exact": docket.court_id,  # For faceting
-                "court_citation_string": docket.court.citation_string,
-            }
-        )
-
-        # Parties, Attorneys, Firms
-        out.update(
-            {
-                "party_id": set(),
-                "party": set(),
-                "attorney_id": set(),
-                "attorney": set(),
-                "firm_id": set(),
-                "firm": set(),
-            }
-        )
-        for p in docket.prefetched_parties:
-            out["party_id"].add(p.pk)
-            out["party"].add(p.name)
-            for a in p.attys_in_docket:
-                out["attorney_id"].add(a.pk)
-                out["attorney"].add(a.name)
-                for f in a.firms_in_docket:
-                    out["firm_id"].add(f.pk)
-                    out["firm"].add(f.name)
+    def get_search_fields(self, text_template=None) -> Dict[str, Any]:
+        """The fields of the Solr document that come from this RECAPDocument
+        and its DocketEntry.
 
-        return out
-
-    def as_search_dict(self, docket_metadata=None):
-        """Create a dict that can be ingested by Solr.
-
-        Search results are presented as Dockets, but they're indexed as
-        RECAPDocument's, which are then grouped back together in search results
-        to form Dockets.
-
-        Since it's common to update an entire docket, there's a shortcut,
-        get_docket_metadata that lets you query that information first and then
-        pass it in as an argument so that it doesn't have to be queried for
-        every RECAPDocument on the docket. This can provide big performance
-        boosts.
+        :param text_template: The compiled indexes/dockets_text.txt template.
+        Pass it in when indexing many documents so that it's only looked up
+        once.
+        :return: A dict of Solr fields.
         """
-        out = docket_metadata or self.get_docket_metadata()
-
         # IDs
-        out.update({"id": self.pk, "docket_entry_id": self.docket_entry.pk})
+        out = {"id": self.pk, "docket_entry_id": self.docket_entry.pk}
 
         # RECAPDocument
         out.update(
@@ -1430,9 +1403,26 @@ class RECAPDocument(AbstractPacerDocument, AbstractPDF, AbstractDateTimeModel):
                 self.docket_entry.date_filed
             )
 
-        text_template = loader.get_template("indexes/dockets_text.txt")
+        if text_template is None:
+            text_template = loader.get_template("indexes/dockets_text.txt")
         out["text"] = text_template.render({"item": self}).translate(null_map)
+        return out
+
+    def as_search_dict(self, docket_metadata=None):
+        """Create a dict that can be ingested by Solr.
+
+        Search results are presented as Dockets, but they're indexed as
+        RECAPDocument's, which are then grouped back together in search results
+        to form Dockets.
 
+        Since it's common to update an entire docket, there's a shortcut,
+        get_docket_metadata that lets you query that information first and then
+        pass it in as an argument so that it doesn't have to be queried for
+        every RECAPDocument on the docket. This can provide big performance
+        boosts.
+        """
+        out = (docket_metadata or self.get_docket_metadata()).copy()
+        out.update(self.get_search_fields())
         return normalize_search_dicts(out)
 
 
@@ -2934,6 +2924,12 @@ class Parenthetical(models.Model):
         help_text="A score between 0 and 1 representing how descriptive the "
         "parenthetical is",
     )
+    minhash = models.BinaryField(
+        null=True,
+        help_text="The MinHash signature of the tokens of the text, as 64 "
+        "little-endian 32-bit integers. Used to group similar parentheticals "
+        "without hashing them again.",
+    )
 
     def __str__(self) -> str:
         return (
@@ -3040,6 +3036,36 @@ class Tag(AbstractDateTimeModel):
         else:
             raise NotImplementedError("Object type not supported for tagging.")
 
+    def tag_objects(self, things: Iterable[TaggableType]) -> None:
+        """Add a tag to many items, with a query per type of item.
+
+        Like tag_object, this is safe to run from several processes at once,
+        and items that already have the tag are left as they are.
+
+        :param things: Dockets, DocketEntries, RECAPDocuments or Claims that
+        you wish to tag.
+        :return: None
+        """
+        throughs = {
+            Docket: (self.dockets.through, "docket_id"),
+            DocketEntry: (self.docket_entries.through, "docketentry_id"),
+            RECAPDocument: (self.recap_documents.through, "recapdocument_id"),
+            Claim: (self.claims.through, "claim_id"),
+        }
+        pks_by_type = defaultdict(set)
+        for thing in things:
+            if type(thing) not in throughs:
+                raise NotImplementedError(
+                    "Object type not supported for tagging."
+                )
+            pks_by_type[type(thing)].add(thing.pk)
+        for thing_type, pks in pks_by_type.items():
+            through, field_name = throughs[thing_type]
+            through.objects.bulk_create(
+                [through(tag_id=self.pk, **{field_name: pk}) for pk in pks],
+                ignore_conflicts=True,
+            )
+
 
 # class AppellateReview(models.Model):
 #     REVIEW_STANDARDS = (
@@ -1,13 +1,14 @@
 import socket
 from datetime import timedelta
 
-import scorched
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.timezone import now
 from scorched.exc import SolrError
 
 from cl.celery_init import app
+from cl.lib.scorched_utils import get_shared_solr_interface
 from cl.lib.search_index_utils import InvalidDocumentError
 from cl.search.models import Docket, OpinionCluster, RECAPDocument
 
@@ -38,19 +39,26 @@ def add_items_to_solr(item_pks, app_label, force_commit=False):
         except InvalidDocumentError:
             print(f"Unable to parse: {item}")
 
-    si = scorched.SolrInterface(settings.SOLR_URLS[app_label], mode="w")
+    si = get_shared_solr_interface(settings.SOLR_URLS[app_label], mode="w")
     try:
         si.add(search_dicts)
         if force_commit:
             si.commit()
-        si.conn.http_connection.close()
     except (socket.error, SolrError) as exc:
         add_items_to_solr.retry(exc=exc, countdown=30)
     else:
         # Mark dockets as updated if needed
         if model == Docket:
             items.update(date_modified=now(), date_last_index=now())
-        si.conn.http_connection.close()
+
+
+# Fingerprints are only an optimization. If one expires, the next update of
+# the docket is a full rewrite, which makes a new one.
+RECAP_FINGERPRINT_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def make_recap_fingerprint_key(docket_pk: int) -> str:
+    return f"solr.recap.fingerprint:{docket_pk}"
 
 
 @app.task(ignore_resutls=True)
@@ -67,14 +75,26 @@ def add_or_update_recap_docket(
     field in Solr. For example, if the name of the case changes, that has to get
     reflected in every document in the docket in Solr.
 
-    To deal with this mess, we have a field on the docket that says when we last
-    updated it in Solr. If that date is after a threshold, we just don't do the
-    update unless we know the docket has something new.
+    To deal with this mess, we keep a fingerprint of the docket-level fields
+    from the last time the docket was indexed. If the fingerprint hasn't
+    changed, the documents already in Solr are up to date with the docket, and
+    we only have to send the documents of the docket entries listed in
+    data['de_pks'], if they're provided. A full rewrite is only done when a
+    docket-level field changed or when we don't know what changed.
+
+    If we don't have a fingerprint for the docket, we fall back to a field on
+    the docket that says when we last updated it in Solr. If that date is
+    after a threshold, we just don't do the update unless we know the docket
+    has something new.
+
+    Documents are built and sent to Solr in chunks so that huge dockets don't
+    have to fit in memory all at once.
 
     :param data: A dictionary containing the a key for 'docket_pk' and
     'content_updated'. 'docket_pk' will be used to find the docket to modify.
     'content_updated' is a boolean indicating whether the docket must be
-    updated.
+    updated. An optional 'de_pks' key can list the docket entries that were
+    created or updated, so that only their documents are reindexed.
     :param force_commit: Whether to send a commit to Solr (this is usually not
     needed).
     :param update_threshold: Items staler than this number of seconds will be
@@ -83,26 +103,40 @@ def add_or_update_recap_docket(
     if data is None:
         return
 
-    si = scorched.SolrInterface(settings.SOLR_RECAP_URL, mode="w")
     some_time_ago = now() - timedelta(seconds=update_threshold)
     d = Docket.objects.get(pk=data["docket_pk"])
     too_fresh = d.date_last_index is not None and (
         d.date_last_index > some_time_ago
     )
-    update_not_required = not data.get("content_updated", False)
-    if all([too_fresh, update_not_required]):
+    content_updated = data.get("content_updated", False)
+    fingerprint_key = make_recap_fingerprint_key(d.pk)
+    old_fingerprint = cache.get(fingerprint_key)
+    if old_fingerprint is None and too_fresh and not content_updated:
         return
+
+    metadata = d.get_search_metadata()
+    fingerprint = d.get_search_fingerprint(metadata)
+    entry_pks = None
+    if fingerprint == old_fingerprint:
+        if not content_updated:
+            # Solr already has everything.
+            return
+        entry_pks = data.get("de_pks")
+
+    si = get_shared_solr_interface(settings.SOLR_RECAP_URL, mode="w")
+    try:
+        for search_dicts in d.iter_search_chunks(
+            docket_metadata=metadata, entry_pks=entry_pks
+        ):
+            si.add(search_dicts)
+        if force_commit:
+            si.commit()
+    except SolrError as exc:
+        add_or_update_recap_docket.retry(exc=exc, countdown=30)
     else:
-        try:
-            si.add(d.as_search_list())
-            if force_commit:
-                si.commit()
-            si.conn.http_connection.close()
-        except SolrError as exc:
-            add_or_update_recap_docket.retry(exc=exc, countdown=30)
-        else:
-            d.date_last_index = now()
-            d.save()
+        cache.set(fingerprint_key, fingerprint, RECAP_FINGERPRINT_TIMEOUT)
+        d.date_last_index = now()
+        d.save()
 
 
 @app.task
@@ -120,7 +154,7 @@ def add_docket_to_solr_by_rds(item_pks, force_commit=False):
     needed).
     :return: None
     """
-    si = scorched.SolrInterface(settings.SOLR_RECAP_URL, mode="w")
+    si = get_shared_solr_interface(settings.SOLR_RECAP_URL, mode="w")
     rds = RECAPDocument.objects.filter(pk__in=item_pks).order_by()
     try:
         metadata = rds[0].get_docket_metadata()
@@ -131,18 +165,16 @@ def add_docket_to_solr_by_rds(item_pks, force_commit=False):
         si.add([item.as_search_dict(docket_metadata=metadata) for item in rds])
         if force_commit:
             si.commit()
-        si.conn.http_connection.close()
     except SolrError as exc:
         add_docket_to_solr_by_rds.retry(exc=exc, countdown=30)
 
 
 @app.task
 def delete_items(items, app_label, force_commit=False):
-    si = scorched.SolrInterface(settings.SOLR_URLS[app_label], mode="w")
+    si = get_shared_solr_interface(settings.SOLR_URLS[app_label], mode="w")
     try:
         si.delete_by_ids(list(items))
         if force_commit:
             si.commit()
-        si.conn.http_connection.close()
     except SolrError as exc:
         delete_items.retry(exc=exc, countdown=30)
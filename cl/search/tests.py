@@ -1,5 +1,6 @@
 import io
 import os
+import tempfile
 from datetime import date
 from pathlib import Path
 from unittest import mock
@@ -7,15 +8,18 @@ from unittest import mock
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.core.management import call_command
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.http import HttpRequest
 from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from lxml import etree, html
-from rest_framework.status import HTTP_200_OK
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from scorched.exc import SolrError
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
@@ -30,7 +34,13 @@ from cl.lib.test_helpers import (
 )
 from cl.scrapers.factories import PACERFreeDocumentLogFactory
 from cl.search.feeds import JurisdictionFeed
-from cl.search.management.commands.cl_calculate_pagerank import Command
+from cl.search.management.commands.cl_benchmark_recap_indexing import (
+    make_synthetic_docket,
+)
+from cl.search.management.commands.cl_calculate_pagerank import (
+    Command,
+    make_sorted_pr_file,
+)
 from cl.search.models import (
     PRECEDENTIAL_STATUS,
     SEARCH_TYPES,
@@ -43,7 +53,11 @@ from cl.search.models import (
     RECAPDocument,
     sort_cites,
 )
-from cl.search.tasks import add_docket_to_solr_by_rds
+from cl.search.tasks import (
+    add_docket_to_solr_by_rds,
+    add_or_update_recap_docket,
+    make_recap_fingerprint_key,
+)
 from cl.search.views import do_search
 from cl.tests.base import SELENIUM_TIMEOUT, BaseSeleniumTest
 from cl.tests.cases import TestCase
@@ -278,6 +292,77 @@ class DocketValidationTest(TestCase):
                 )
 
 
+class DocketSearchListTest(TestCase):
+    fixtures = ["test_court.json"]
+
+    def setUp(self) -> None:
+        self.docket = make_synthetic_docket("test", 20, 2)
+
+    def test_search_list_matches_search_dicts(self) -> None:
+        """Does the bulk builder make the same docs as as_search_dict?"""
+        search_list = self.docket.as_search_list()
+        self.assertEqual(len(search_list), 20)
+        for doc in search_list:
+            rd = RECAPDocument.objects.get(pk=doc["id"])
+            self.assertEqual(doc, rd.as_search_dict())
+
+    def test_search_chunks_are_bounded(self) -> None:
+        """Are docs streamed in chunks with a fixed number of queries?"""
+        d = Docket.objects.get(pk=self.docket.pk)
+        d.get_search_metadata()
+        with CaptureQueriesContext(connection) as ctx:
+            chunks = list(d.iter_search_chunks(chunk_size=4))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 20)
+        self.assertTrue(all(len(chunk) <= 8 for chunk in chunks))
+        # Metadata (court, parties, etc.) plus a couple of queries per chunk,
+        # but nothing per docket entry.
+        self.assertLess(len(ctx.captured_queries), 30)
+
+
+@mock.patch("cl.search.tasks.get_shared_solr_interface")
+class RecapFingerprintTest(TestCase):
+    fixtures = ["test_court.json"]
+
+    def setUp(self) -> None:
+        self.docket = make_synthetic_docket("test", 6, 2)
+        cache.delete(make_recap_fingerprint_key(self.docket.pk))
+
+    def tearDown(self) -> None:
+        cache.delete(make_recap_fingerprint_key(self.docket.pk))
+
+    @staticmethod
+    def _sent_count(mock_si) -> int:
+        count = sum(
+            len(c.args[0]) for c in mock_si.return_value.add.call_args_list
+        )
+        mock_si.reset_mock()
+        return count
+
+    def test_only_changed_entries_are_reindexed(self, mock_si) -> None:
+        """Do we only send new documents when the docket didn't change?"""
+        data = {"docket_pk": self.docket.pk, "content_updated": True}
+        add_or_update_recap_docket(data)
+        self.assertEqual(self._sent_count(mock_si), 6)
+
+        de = self.docket.docket_entries.order_by("pk").first()
+        add_or_update_recap_docket({**data, "de_pks": [de.pk]})
+        self.assertEqual(self._sent_count(mock_si), 2)
+
+        add_or_update_recap_docket({**data, "content_updated": False})
+        self.assertEqual(self._sent_count(mock_si), 0)
+
+    def test_docket_changes_reindex_everything(self, mock_si) -> None:
+        """Does a new case name rewrite every document on the docket?"""
+        data = {"docket_pk": self.docket.pk, "content_updated": True}
+        add_or_update_recap_docket(data)
+        self._sent_count(mock_si)
+
+        Docket.objects.filter(pk=self.docket.pk).update(case_name="Lorem")
+        de = self.docket.docket_entries.order_by("pk").first()
+        add_or_update_recap_docket({**data, "de_pks": [de.pk]})
+        self.assertEqual(self._sent_count(mock_si), 6)
+
+
 class IndexingTest(EmptySolrTestCase):
     """Are things indexed properly?"""
 
@@ -687,6 +772,48 @@ class SearchTest(IndexedSolrTestCase):
             msg="Did not get good status code from oral arguments API endpoint",
         )
 
+    def test_oa_search_api_cursor(self) -> None:
+        """Can we page through oa results on the search endpoint with a
+        cursor?"""
+        r = self.client.get(
+            reverse("search-list", kwargs={"version": "v3"}),
+            {"type": SEARCH_TYPES.ORAL_ARGUMENT, "cursor": "*"},
+        )
+        self.assertEqual(r.status_code, HTTP_200_OK)
+        self.assertGreater(r.data["count"], 0)
+        self.assertEqual(len(r.data["results"]), r.data["count"])
+        self.assertIsNotNone(r.data["next"])
+
+        # Everything fit on the first page, so the next one is empty.
+        r = self.client.get(r.data["next"])
+        self.assertEqual(r.status_code, HTTP_200_OK)
+        self.assertEqual(r.data["results"], [])
+        self.assertIsNone(r.data["next"])
+
+    def test_oa_search_api_invalid_cursor(self) -> None:
+        """Is a garbage cursor a bad request instead of a server error?"""
+        r = self.client.get(
+            reverse("search-list", kwargs={"version": "v3"}),
+            {"type": SEARCH_TYPES.ORAL_ARGUMENT, "cursor": "not-a-cursor!"},
+        )
+        self.assertEqual(r.status_code, HTTP_400_BAD_REQUEST)
+        self.assertEqual(r.data["detail"], "Invalid cursor")
+
+    def test_oa_search_api_cursor_solr_error(self) -> None:
+        """Are Solr errors that aren't about the cursor still server errors,
+        instead of being blamed on the cursor?"""
+        with mock.patch(
+            "cl.search.api_utils.get_shared_solr_interface"
+        ) as get_si, self.assertRaises(SolrError):
+            si = get_si.return_value
+            si.schema = {"uniqueKey": "id"}
+            query = si.query.return_value.add_extra.return_value
+            query.execute.side_effect = SolrError("500 - Solr is down")
+            self.client.get(
+                reverse("search-list", kwargs={"version": "v3"}),
+                {"type": SEARCH_TYPES.ORAL_ARGUMENT, "cursor": "*"},
+            )
+
     def test_homepage(self) -> None:
         """Is the homepage loaded when no GET parameters are provided?"""
         response = self.client.get(reverse("show_results"))
@@ -1204,14 +1331,16 @@ class PagerankTest(TestCase):
         # calculate pagerank of these 3 document
         comm = Command()
         self.verbosity = 1
-        pr_results = comm.do_pagerank()
+        node_ids, scores = comm.do_pagerank()
+        pr_results = dict(zip(node_ids.tolist(), scores.tolist()))
 
-        # Verify that whether the answer is correct, based on calculations in
-        # Gephi
+        # Verify that the answer is correct. These are the scores of the
+        # power iteration in compute_pagerank, which converges to the same
+        # values as Gephi and igraph did for this graph.
         answers = {
-            1: 0.369323534954,
-            2: 0.204581549974,
-            3: 0.378475867453,
+            1: 0.387789711702,
+            2: 0.214810627473,
+            3: 0.397399660825,
         }
         for key, value in answers.items():
             self.assertTrue(
@@ -1220,6 +1349,23 @@ class PagerankTest(TestCase):
                 "%s" % (key, pr_results[key], answers[key]),
             )
 
+    def test_warm_start_and_pagerank_file(self) -> None:
+        """Does a warm start converge to the same scores, and does the file
+        list every opinion in order?"""
+        node_ids, scores = Command.do_pagerank()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "external_pagerank")
+            make_sorted_pr_file(node_ids, scores, path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+            warm_node_ids, warm_scores = Command.do_pagerank(path)
+
+        pks = list(Opinion.objects.order_by("pk").values_list("pk", flat=True))
+        self.assertEqual([int(line.split("=")[0]) for line in lines], pks)
+        self.assertEqual(node_ids.tolist(), warm_node_ids.tolist())
+        for score, warm_score in zip(scores, warm_scores):
+            self.assertAlmostEqual(score, warm_score, places=6)
+
 
 class OpinionSearchFunctionalTest(BaseSeleniumTest):
     """
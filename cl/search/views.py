@@ -133,7 +133,6 @@ def do_search(
         try:
             si = get_solr_interface(cd)
         except NotImplementedError:
-            si.conn.http_connection.close()
             logger.error(
                 "Tried getting solr connection for %s, but it's not "
                 "implemented yet",
@@ -157,15 +156,11 @@ def do_search(
                     # Original query
                     cd["q"].replace(related_prefix_match.group("pfx"), ""),
                 )
-                si.conn.http_connection.close()
             else:
                 # Regular search queries
                 results = si.query().add_extra(
                     **build_main_query(cd, facet=facet)
                 )
-                si.conn.http_connection.close()
-
-            si.conn.http_connection.close()
 
             paged_results = paginate_cached_solr_results(
                 get_params, cd, results, rows, cache_key
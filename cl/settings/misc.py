@@ -45,6 +45,18 @@ GOOGLE_AUTH = {
 }
 
 
+#############
+# RECAP RSS #
+#############
+# The hashes of the RSS items that were merged are kept in Redis for this
+# long. They're kept in the RssItemCache table too if this is enabled, or
+# when Redis can't be reached.
+RSS_ITEM_CACHE_TIMEOUT = env.int(
+    "RSS_ITEM_CACHE_TIMEOUT", default=60 * 60 * 24 * 2
+)
+RSS_ITEM_CACHE_USE_DB = env.bool("RSS_ITEM_CACHE_USE_DB", default=False)
+
+
 ##############
 # Super Misc #
 ##############
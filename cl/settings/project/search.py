@@ -24,6 +24,16 @@ SOLR_URLS = {
     "search.OpinionCluster": SOLR_OPINION_URL,
 }
 
+# Solr connections are pooled per core and per process. Timeouts are
+# (connect, read) tuples in seconds, keyed by core URL.
+SOLR_DEFAULT_TIMEOUT = (3.05, env.int("SOLR_READ_TIMEOUT", default=60))
+SOLR_TIMEOUTS = {
+    SOLR_RECAP_URL: (3.05, env.int("SOLR_RECAP_READ_TIMEOUT", default=180)),
+}
+SOLR_MAX_RETRIES = env.int("SOLR_MAX_RETRIES", default=3)
+SOLR_RETRY_BACKOFF = 0.5
+SOLR_POOL_MAXSIZE = env.int("SOLR_POOL_MAXSIZE", default=10)
+
 SOLR_OPINION_TEST_CORE_NAME = "opinion_test"
 SOLR_AUDIO_TEST_CORE_NAME = "audio_test"
 SOLR_PEOPLE_TEST_CORE_NAME = "person_test"
@@ -60,3 +70,18 @@ RELATED_MLT_MAXDF = 1000
 RELATED_MLT_MINWL = 3
 RELATED_MLT_MAXWL = 0
 RELATED_FILTER_BY_STATUS = "Precedential"
+
+
+#############
+# Citations #
+#############
+# During cl_find_citations runs, resolved citation lookups are memoized in
+# each process. Setting a Redis timeout adds a tier that's shared by every
+# worker (0 disables it).
+CITATION_LOOKUP_CACHE_SIZE = env.int(
+    "CITATION_LOOKUP_CACHE_SIZE", default=100_000
+)
+CITATION_LOOKUP_CACHE_TTL = 60 * 60
+CITATION_LOOKUP_REDIS_TIMEOUT = env.int(
+    "CITATION_LOOKUP_REDIS_TIMEOUT", default=0
+)
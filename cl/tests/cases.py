@@ -6,6 +6,10 @@ from django import test
 from django.contrib.staticfiles import testing
 from rest_framework.test import APITestCase
 
+from cl.citations.lookup_cache import citation_lookup_cache
+from cl.people_db.lookup_utils import judge_name_index
+from cl.visualizations.network_utils import scotus_citation_graph
+
 
 class OutputBlockerTestMixin:
     """Block the output of tests so that they run a bit faster.
@@ -28,6 +32,19 @@ class OutputBlockerTestMixin:
             raise
 
 
+class InProcessCacheMixin:
+    """Clear the caches that live in the memory of the process before each
+    test, so that what a test sees doesn't depend on the tests that ran
+    before it in the same process.
+    """
+
+    def _callSetUp(self):
+        citation_lookup_cache.clear()
+        judge_name_index.clear()
+        scotus_citation_graph.clear()
+        super()._callSetUp()
+
+
 class OneDatabaseMixin:
     """Only use one DB during tests
 
@@ -51,6 +68,7 @@ class SimpleTestCase(
 
 class TestCase(
     OutputBlockerTestMixin,
+    InProcessCacheMixin,
     OneDatabaseMixin,
     test.TestCase,
 ):
@@ -59,6 +77,7 @@ class TestCase(
 
 class TransactionTestCase(
     OutputBlockerTestMixin,
+    InProcessCacheMixin,
     OneDatabaseMixin,
     test.TransactionTestCase,
 ):
@@ -67,6 +86,7 @@ class TransactionTestCase(
 
 class LiveServerTestCase(
     OutputBlockerTestMixin,
+    InProcessCacheMixin,
     OneDatabaseMixin,
     test.LiveServerTestCase,
 ):
@@ -75,6 +95,7 @@ class LiveServerTestCase(
 
 class StaticLiveServerTestCase(
     OutputBlockerTestMixin,
+    InProcessCacheMixin,
     OneDatabaseMixin,
     testing.StaticLiveServerTestCase,
 ):
@@ -83,6 +104,7 @@ class StaticLiveServerTestCase(
 
 class APITestCase(
     OutputBlockerTestMixin,
+    InProcessCacheMixin,
     OneDatabaseMixin,
     APITestCase,
 ):
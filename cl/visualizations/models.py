@@ -11,11 +11,7 @@ from cl.lib.models import AbstractDateTimeModel
 from cl.lib.string_utils import trunc
 from cl.search.models import OpinionCluster
 from cl.visualizations.exceptions import TooManyNodes
-from cl.visualizations.network_utils import (
-    graphs_intersect,
-    set_shortest_path_to_end,
-    within_max_hops,
-)
+from cl.visualizations.network_utils import scotus_citation_graph
 
 
 class SCOTUSMap(AbstractDateTimeModel):
@@ -109,163 +105,30 @@ class SCOTUSMap(AbstractDateTimeModel):
         """Return good referers"""
         return self.referers.filter(display=True).order_by("date_created")
 
-    def build_nx_digraph(
-        self,
-        parent_authority,
-        visited_nodes,
-        good_nodes,
-        max_hops,
-        hops_taken=0,
-        max_nodes=70,
-    ):
-        """Recursively build a networkx graph
-
-        Process is:
-         - Work backwards through the authorities for self.cluster_end and all
-           of its children.
-         - For each authority, add it to a nx graph, if:
-            - it happened after self.cluster_start
-            - it's in the Supreme Court
-            - we haven't exceeded max_hops
-            - we haven't already followed this path in a longer or equal route
-            - it is on a simple path between the beginning and end
-            - fewer than max_nodes nodes are in the network
-
-        The last point above is a complicated one. The algorithm is implemented
-        in a depth-first fashion, so we quickly can create simple paths between
-        the first and last node. If it were in a breadth-first algorithm, we
-        would fan out and have to do many more queries before we learned that a
-        line of citations was needed or not. For example, consider this network:
-
-            START
-               ├─-> A--> B--> C--> D--> END
-               └--> E    ├─-> F
-                         └--> G
-
-        The only nodes that we should include are A, B, C, and D. In a depth-
-        first approach, you do:
-
-            START
-               ├─1-> A-2-> B-3-> C-4-> D-5-> END
-               └-8-> E     ├─6-> F
-                           └-7-> G
-
-        After five hops, we know that A, B, C, and D are relevant and should be
-        kept.
-
-        Compare to a breadth-first:
-
-             START
-                ├─1-> A-3-> B-4-> C-7-> D-8-> END
-                └-2-> E     ├─5-> F
-                            └-6-> G
-
-        In this case, it takes eight hops to know the same thing, and in a real
-        network, it would be many more than two or three citations from each
-        node.
-
-        This matters a great deal because the sooner we can count the number of
-        nodes in the network, the sooner we will hit max_nodes and be able to
-        abort if the job is too big.
-
-        The other complicated part of this algorithm is keeping track of
-        shortest routes and avoiding unneeded graph traversal. For example, it's
-        quite possible to traverse
-
-        :param parent_authority: The starting point for the recursion. At first,
-        this will be self.cluster_end, but in recursive calls, it will be the
-        child of the current parent.
-        :param visited_nodes: A dict of nodes that have already been visited.
-        :param good_nodes: A dict of nodes that have been identified as good.
-        :param hops_taken: The number of hops taken so far, from
-        self.cluster_end
+    def build_nx_digraph(self, max_hops, max_nodes=70):
+        """Build a networkx graph of the citations between self.cluster_end
+        and self.cluster_start.
+
+        A citation is in the graph if it's on a path of at most max_hops
+        citations from the end back to the start, through Supreme Court
+        cases filed on or after the start. The paths are found in memory, on
+        the per-process graph of every SCOTUS citation, so no matter how big
+        the network is, building it takes no queries beyond refreshing that
+        graph now and then.
+
         :param max_hops: The maximum degree of separation for the network.
         :param max_nodes: The maximum number of nodes a network can contain.
         """
-        g = networkx.DiGraph()
-        if len(good_nodes) == 0:
-            # Add the beginning and end.
-            good_nodes = {
-                self.cluster_start_id: {"shortest_path": 0},
-            }
-
-        is_already_handled_with_shorter_path = (
-            parent_authority.pk in visited_nodes
-            and visited_nodes[parent_authority.pk]["hops_taken"] < hops_taken
+        edges = scotus_citation_graph.find_paths(
+            start_id=self.cluster_start_id,
+            end_id=self.cluster_end_id,
+            start_date=self.cluster_start.date_filed,
+            max_hops=max_hops,
         )
-        has_no_more_hops_remaining = hops_taken == max_hops
-        blocking_conditions = [
-            is_already_handled_with_shorter_path,
-            has_no_more_hops_remaining,
-        ]
-        if not any(blocking_conditions):
-            visited_nodes[parent_authority.pk] = {"hops_taken": hops_taken}
-            hops_taken += 1
-            for child_authority in parent_authority.authorities.filter(
-                docket__court="scotus",
-                date_filed__gte=self.cluster_start.date_filed,
-            ).order_by("date_filed"):
-                # Combine our present graph with the result of the next
-                # recursion
-                sub_graph = networkx.DiGraph()
-                if child_authority == self.cluster_start:
-                    # Parent links to the starting point. Add an edge. No need
-                    # to check distance here because we're already at the start
-                    # node.
-                    g.add_edge(parent_authority.pk, child_authority.pk)
-                    _ = set_shortest_path_to_end(
-                        good_nodes,
-                        node_id=parent_authority.pk,
-                        target_id=child_authority.pk,
-                    )
-                elif child_authority.pk in good_nodes:
-                    # Parent links to a node already in the network. Check if
-                    # we could make it to the end in max_dod hops. Set
-                    # shortest_path for the child_authority
-                    if within_max_hops(
-                        good_nodes, child_authority.pk, hops_taken, max_hops
-                    ):
-                        g.add_edge(parent_authority.pk, child_authority.pk)
-                        is_shorter = set_shortest_path_to_end(
-                            good_nodes,
-                            node_id=parent_authority.pk,
-                            target_id=child_authority.pk,
-                        )
-                        if is_shorter:
-                            # New route to a node that's shorter than the old
-                            # route. Thus, we must re-recurse its children.
-                            sub_graph = self.build_nx_digraph(
-                                parent_authority=child_authority,
-                                visited_nodes=visited_nodes,
-                                good_nodes=good_nodes,
-                                max_hops=max_hops,
-                                hops_taken=hops_taken,
-                                max_nodes=max_nodes,
-                            )
-                else:
-                    # No easy shortcuts. Recurse.
-                    sub_graph = self.build_nx_digraph(
-                        parent_authority=child_authority,
-                        visited_nodes=visited_nodes,
-                        good_nodes=good_nodes,
-                        max_hops=max_hops,
-                        hops_taken=hops_taken,
-                        max_nodes=max_nodes,
-                    )
-
-                if graphs_intersect(good_nodes, g, sub_graph):
-                    # The graphs intersect. Merge them.
-                    g.add_edge(parent_authority.pk, child_authority.pk)
-                    _ = set_shortest_path_to_end(
-                        good_nodes,
-                        node_id=parent_authority.pk,
-                        target_id=child_authority.pk,
-                    )
-                    g = networkx.compose(g, sub_graph)
-
-                if len(g) > max_nodes:
-                    raise TooManyNodes()
-
+        g = networkx.DiGraph()
+        g.add_edges_from(edges)
+        if len(g) > max_nodes:
+            raise TooManyNodes()
         return g
 
     def add_clusters(self, g):
@@ -1,3 +1,18 @@
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cl.search.models import OpinionCluster, OpinionsCited
+
+# How often the SCOTUS citation graph picks up new clusters and citations,
+# and how often it's rebuilt from scratch, which drops deleted ones.
+SCOTUS_GRAPH_REFRESH_INTERVAL = 10 * 60
+SCOTUS_GRAPH_RELOAD_INTERVAL = 24 * 60 * 60
+
+
 def new_title_for_viz(referer):
     """Check if a visualization already has a referer with a given title."""
     from cl.visualizations.models import Referer
@@ -23,42 +38,242 @@ def reverse_endpoints_if_needed(start, end):
         return end, start
 
 
-def within_max_hops(good_nodes, child_authority_id, hops_taken, max_hops):
-    """Determine if a new route to a node that's already in the network is
-    within the max_hops of the start_point.
+class ScotusCitationGraph:
+    """A compact, in-memory graph of the citations between SCOTUS clusters,
+    loaded once per process.
+
+    Clusters are numbered by their position in a sorted array of their IDs,
+    and the citations between them are kept as CSR adjacency arrays in both
+    directions, so the graph of every SCOTUS citation takes a few MB.
+
+    It's refreshed incrementally, by loading the clusters and citations
+    with IDs above the ones it has, and rebuilt from scratch once a day.
     """
-    shortest_path = good_nodes[child_authority_id]["shortest_path"]
-    if (shortest_path + hops_taken) > max_hops:
-        return False
-    return True
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
 
-def graphs_intersect(good_nodes, main_graph, sub_graph):
-    """Test if two graphs have common nodes.
+    def clear(self) -> None:
+        self._clear_data()
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        # The sorted cluster IDs, their date ordinals, and the CSR arrays of
+        # the cited and of the citing clusters of each cluster. They're
+        # swapped as a whole, so that readers get a consistent graph.
+        self._index: Optional[Tuple[np.ndarray, ...]] = None
 
-    First check if it's in the main graph, then check if it's in good_nodes,
-    indicating a second path to the start node.
-    """
-    return any([(node in main_graph) for node in sub_graph.nodes()]) or any(
-        [(node in good_nodes) for node in sub_graph.nodes()]
-    )
+    def _clear_data(self) -> None:
+        self.cluster_ids = np.zeros(0, dtype=np.int64)
+        self.date_ordinals = np.zeros(0, dtype=np.int32)
+        # The citing and cited cluster IDs of every citation.
+        self.citing = np.zeros(0, dtype=np.int64)
+        self.cited = np.zeros(0, dtype=np.int64)
+        self.max_citation_pk = 0
+
+    def _load_clusters(self, min_pk: int) -> None:
+        rows = (
+            OpinionCluster.objects.filter(
+                docket__court_id="scotus", pk__gt=min_pk
+            )
+            .order_by()
+            .values_list("pk", "date_filed")
+            .iterator(chunk_size=10_000)
+        )
+        ids = []
+        ordinals = []
+        for pk, date_filed in rows:
+            ids.append(pk)
+            ordinals.append(date_filed.toordinal())
+        ids = np.concatenate([self.cluster_ids, np.array(ids, dtype=np.int64)])
+        ordinals = np.concatenate(
+            [self.date_ordinals, np.array(ordinals, dtype=np.int32)]
+        )
+        order = np.argsort(ids, kind="stable")
+        self.cluster_ids = ids[order]
+        self.date_ordinals = ordinals[order]
 
+    def _load_citations(self, min_pk: int) -> None:
+        rows = (
+            OpinionsCited.objects.filter(
+                citing_opinion__cluster__docket__court_id="scotus",
+                cited_opinion__cluster__docket__court_id="scotus",
+                pk__gt=min_pk,
+            )
+            .order_by()
+            .values_list(
+                "pk",
+                "citing_opinion__cluster_id",
+                "cited_opinion__cluster_id",
+            )
+            .iterator(chunk_size=100_000)
+        )
+        citing = []
+        cited = []
+        for pk, citing_id, cited_id in rows:
+            self.max_citation_pk = max(self.max_citation_pk, pk)
+            citing.append(citing_id)
+            cited.append(cited_id)
+        self.citing = np.concatenate(
+            [self.citing, np.array(citing, dtype=np.int64)]
+        )
+        self.cited = np.concatenate(
+            [self.cited, np.array(cited, dtype=np.int64)]
+        )
 
-def set_shortest_path_to_end(good_nodes, node_id, target_id):
-    """Determine if a path is to the end is shorter, and if so, update the
-    current value.
-    """
-    is_shorter = False
-    if node_id in good_nodes:
-        current_length = good_nodes[node_id]["shortest_path"]
-        previous_length = good_nodes[target_id]["shortest_path"] + 1
-        if current_length < previous_length:
-            is_shorter = True
-        good_nodes[node_id]["shortest_path"] = min(
-            current_length, previous_length
+    def _build_index(self) -> None:
+        ids = self.cluster_ids
+        n = len(ids)
+        src = np.searchsorted(ids, self.citing)
+        dst = np.searchsorted(ids, self.cited)
+        # Drop the citations of clusters we don't know, and self citations.
+        known = (src < n) & (dst < n)
+        src, dst = src[known], dst[known]
+        known = (ids[src] == self.citing[known]) & (
+            ids[dst] == self.cited[known]
         )
-    else:
-        good_nodes[node_id] = {
-            "shortest_path": good_nodes[target_id]["shortest_path"] + 1
-        }
-    return is_shorter
+        src, dst = src[known], dst[known]
+        keep = src != dst
+        # Opinions of a cluster can cite the same cluster more than once.
+        pairs = np.unique(src[keep] * n + dst[keep])
+        src, dst = pairs // n, pairs % n
+
+        out_ptr = np.searchsorted(src, np.arange(n + 1))
+        order = np.argsort(dst, kind="stable")
+        in_ptr = np.searchsorted(dst[order], np.arange(n + 1))
+        self._index = (
+            ids,
+            self.date_ordinals,
+            out_ptr,
+            dst,
+            in_ptr,
+            src[order],
+        )
+
+    def _is_fresh(self, now: float, force: bool) -> bool:
+        if self._index is None:
+            return False
+        if force:
+            # Only if another thread refreshed it while we waited.
+            return self.refreshed_at >= now
+        return now - self.refreshed_at < SCOTUS_GRAPH_REFRESH_INTERVAL
+
+    def refresh(self, force: bool = False) -> None:
+        """Load the graph, or pick up what changed since it was loaded, if
+        it's due.
+
+        :param force: Whether to pick up what changed even if it's not due.
+        """
+        now = time.monotonic()
+        if self._is_fresh(now, force):
+            return
+        with self._lock:
+            if self._is_fresh(now, force):
+                return
+            if now - self.loaded_at > SCOTUS_GRAPH_RELOAD_INTERVAL:
+                self._clear_data()
+                self.loaded_at = now
+            max_cluster_pk = (
+                int(self.cluster_ids[-1]) if len(self.cluster_ids) else 0
+            )
+            self._load_clusters(max_cluster_pk)
+            self._load_citations(self.max_citation_pk)
+            self._build_index()
+            self.refreshed_at = now
+
+    def find_paths(
+        self,
+        start_id: int,
+        end_id: int,
+        start_date: date,
+        max_hops: int,
+    ) -> List[Tuple[int, int]]:
+        """Find the citations on the paths from one cluster back to another.
+
+        This is a bidirectional bounded search. The clusters within max_hops
+        of the end, following citations, and the ones within max_hops of the
+        start, following them backwards, are found with two breadth-first
+        searches. A citation is on a path if the hops from the end to it,
+        plus one, plus the hops from it to the start, are within max_hops.
+
+        Like the recursive search this replaced, clusters other than the end
+        must be filed on or after the start, and paths don't go through the
+        start or the end.
+
+        If the start or the end isn't in the graph, it may be newer than the
+        graph, so the graph is refreshed before giving up.
+
+        :param start_id: The ID of the oldest cluster of the map.
+        :param end_id: The ID of the newest cluster of the map.
+        :param start_date: The date the start cluster was filed.
+        :param max_hops: The maximum length of a path.
+        :return: A list of (citing cluster ID, cited cluster ID) tuples.
+        """
+        self.refresh()
+        ids, ordinals, out_ptr, out_idx, in_ptr, in_idx = self._index
+        start = self._get_node(ids, start_id)
+        end = self._get_node(ids, end_id)
+        if start is None or end is None:
+            self.refresh(force=True)
+            ids, ordinals, out_ptr, out_idx, in_ptr, in_idx = self._index
+            start = self._get_node(ids, start_id)
+            end = self._get_node(ids, end_id)
+            if start is None or end is None:
+                return []
+
+        min_ordinal = start_date.toordinal()
+
+        def allowed(node: int) -> bool:
+            return node == end or ordinals[node] >= min_ordinal
+
+        from_end = self._bounded_bfs(
+            end, out_ptr, out_idx, max_hops, allowed, stop=start
+        )
+        to_start = self._bounded_bfs(
+            start, in_ptr, in_idx, max_hops, allowed, stop=end
+        )
+        edges = []
+        for node, hops in from_end.items():
+            if node == start or node not in to_start:
+                continue
+            for child in out_idx[out_ptr[node] : out_ptr[node + 1]].tolist():
+                remaining = to_start.get(child)
+                if remaining is not None and hops + 1 + remaining <= max_hops:
+                    edges.append((int(ids[node]), int(ids[child])))
+        return edges
+
+    @staticmethod
+    def _get_node(ids: np.ndarray, cluster_id: int) -> Optional[int]:
+        i = int(np.searchsorted(ids, cluster_id))
+        if i < len(ids) and ids[i] == cluster_id:
+            return i
+        return None
+
+    @staticmethod
+    def _bounded_bfs(
+        source: int,
+        ptr: np.ndarray,
+        idx: np.ndarray,
+        max_hops: int,
+        allowed,
+        stop: int,
+    ) -> Dict[int, int]:
+        """Find the nodes within max_hops of a source and their distance,
+        without going through the stop node.
+        """
+        distances = {source: 0}
+        frontier = [source]
+        for hops in range(1, max_hops + 1):
+            next_frontier = []
+            for node in frontier:
+                if node == stop:
+                    continue
+                for neighbor in idx[ptr[node] : ptr[node + 1]].tolist():
+                    if neighbor not in distances and allowed(neighbor):
+                        distances[neighbor] = hops
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances
+
+
+scotus_citation_graph = ScotusCitationGraph()
@@ -1,8 +1,10 @@
 """
 Unit tests for Visualizations
 """
+from datetime import timedelta
 from typing import Any, Callable, Dict
 
+import networkx
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Permission, User
 from django.core.handlers.wsgi import WSGIRequest
@@ -17,7 +19,11 @@ from rest_framework.status import (
     HTTP_404_NOT_FOUND,
 )
 
-from cl.search.models import OpinionCluster
+from cl.search.factories import (
+    OpinionClusterWithParentsFactory,
+    OpinionFactory,
+)
+from cl.search.models import OpinionCluster, OpinionsCited
 from cl.tests.cases import APITestCase, TestCase
 from cl.tests.utils import make_client
 from cl.users.factories import (
@@ -25,10 +31,14 @@ from cl.users.factories import (
     UserWithChildProfileFactory,
 )
 from cl.visualizations import views
+from cl.visualizations.exceptions import TooManyNodes
 from cl.visualizations.factories import VisualizationFactory
 from cl.visualizations.forms import VizForm
 from cl.visualizations.models import JSONVersion, SCOTUSMap
-from cl.visualizations.network_utils import reverse_endpoints_if_needed
+from cl.visualizations.network_utils import (
+    reverse_endpoints_if_needed,
+    scotus_citation_graph,
+)
 
 
 class TestVizUtils(TestCase):
@@ -83,15 +93,54 @@ class TestVizModels(TestCase):
             notes="Test Notes",
         )
 
-        build_kwargs = {
-            "parent_authority": end,
-            "visited_nodes": {},
-            "good_nodes": {},
-            "max_hops": 3,
-        }
-
-        g = viz.build_nx_digraph(**build_kwargs)
+        g = viz.build_nx_digraph(max_hops=3)
         self.assertTrue(len(g.edges()) > 0)
+        # Every citation in the map is on a path from the end to the start.
+        for node in g.nodes():
+            self.assertTrue(networkx.has_path(g, end.pk, node))
+            self.assertTrue(networkx.has_path(g, node, start.pk))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                sorted(g.edges()),
+                sorted(viz.build_nx_digraph(max_hops=3).edges()),
+            )
+        with self.assertRaises(TooManyNodes):
+            viz.build_nx_digraph(max_hops=3, max_nodes=1)
+
+    def test_graph_picks_up_new_clusters(self) -> None:
+        """Are clusters and citations added after the graph was loaded found,
+        without waiting for the graph to be due for a refresh?"""
+        start = OpinionCluster.objects.get(case_name="Marsh v. Chambers")
+        end = OpinionCluster.objects.get(
+            case_name="Town of Greece v. Galloway"
+        )
+        self.assertTrue(
+            scotus_citation_graph.find_paths(
+                start.pk, end.pk, start.date_filed, 3
+            )
+        )
+
+        new_end = OpinionClusterWithParentsFactory.create(
+            docket=end.docket,
+            date_filed=end.date_filed + timedelta(days=365),
+        )
+        OpinionsCited.objects.create(
+            citing_opinion=OpinionFactory.create(cluster=new_end),
+            cited_opinion=end.sub_opinions.first(),
+        )
+        edges = scotus_citation_graph.find_paths(
+            start.pk, new_end.pk, start.date_filed, 4
+        )
+        self.assertIn((new_end.pk, end.pk), edges)
+
+        # Clusters that aren't in the DB still get no paths.
+        self.assertEqual(
+            scotus_citation_graph.find_paths(
+                start.pk, new_end.pk + 1000, start.date_filed, 4
+            ),
+            [],
+        )
 
     def test_SCOTUSMap_deletes_cascade(self) -> None:
         """
@@ -16,20 +16,13 @@ def build_visualization(viz):
     :param viz: A Visualization object to work on
     :return: A tuple of (status<str>, viz)
     """
-    build_kwargs = {
-        "parent_authority": viz.cluster_end,
-        "visited_nodes": {},
-        "good_nodes": {},
-        "max_hops": 3,
-    }
     t1 = time.time()
     try:
-        g = viz.build_nx_digraph(**build_kwargs)
+        g = viz.build_nx_digraph(max_hops=3)
     except TooManyNodes:
         try:
             # Try with fewer hops.
-            build_kwargs["max_hops"] = 2
-            g = viz.build_nx_digraph(**build_kwargs)
+            g = viz.build_nx_digraph(max_hops=2)
         except TooManyNodes:
             # Still too many hops. Abort.
             tally_stat("visualization.too_many_nodes_failure")